@@ -0,0 +1,171 @@
+"""
+Time of the portfolio analytics stage for large multi-account portfolios
+
+    python -m benchmarks.analytics --positions 5000 --accounts 4
+
+Measures PortfolioAnalytics.update for snapshots where only prices changed (the common case,
+reusing the account index and category columns) and where positions were added or removed
+(rebuilding them), next to the same metrics computed with plain Python loops per account. Volatility
+and beta are computed over HISTORY_DAYS of daily prices of every instrument, with the first
+instrument as benchmark, and the time to turn the daily prices into returns is measured separately
+"""
+
+import argparse
+import math
+import timeit
+from collections import defaultdict
+from datetime import date, timedelta
+
+import numpy as np
+from homeassistant.util import dt
+
+from custom_components.nordnet.analytics import PortfolioAnalytics
+from custom_components.nordnet.const import (ANALYTICS_TOP_POSITIONS,
+                                             HISTORY_DAYS,
+                                             HISTORY_TRADING_DAYS_PER_YEAR)
+from custom_components.nordnet.position import Position
+from custom_components.nordnet.snapshot import HoldingsSnapshot
+from tests.fake_nordnet import make_positions, make_price_history
+
+
+def make_closes(positions: list) -> dict:
+    """
+    Daily closes of every held instrument, like PriceHistory keeps them
+    """
+
+    today = date.today()
+    closes = {}
+
+    for instrument_id in {position.instrument_id for position in positions}:
+        prices = make_price_history(instrument_id, today - timedelta(days=HISTORY_DAYS), today - timedelta(days=1))
+
+        closes[instrument_id] = (
+            np.array([dt.utc_from_timestamp(price["time"] / 1000).date().toordinal() for price in prices], np.int64),
+            np.array([price["last"] for price in prices], np.float64),
+        )
+
+    return closes
+
+
+def python_returns(closes: dict) -> tuple:
+    """
+    Daily returns of every instrument, aligned on the days any of them traded
+    """
+
+    closes = {instrument_id: dict(zip(days.tolist(), values.tolist())) for instrument_id, (days, values) in closes.items()}
+    days = sorted(set().union(*closes.values()))
+    returns = {}
+
+    for instrument_id, instrument_closes in closes.items():
+        previous = None
+        instrument_returns = []
+
+        for day in days:
+            close = instrument_closes.get(day, previous)
+            instrument_returns.append(close / previous - 1 if previous and close is not None else 0.0)
+            previous = close
+
+        returns[instrument_id] = instrument_returns[1:]
+
+    return returns, len(days) - 1
+
+
+def python_loops(snapshot: HoldingsSnapshot, returns: dict, days: int, benchmark_id: int) -> dict:
+    """
+    Allocation, concentration, volatility and beta of every account, one position at a time
+    """
+
+    accounts = defaultdict(list)
+    for position in snapshot.positions:
+        accounts[position.account_id].append(position)
+
+    results = {}
+
+    for account_id, positions in accounts.items():
+        total = sum(position.account_market_value for position in positions)
+        weights = [position.account_market_value / total if total else 0.0 for position in positions]
+
+        allocations = {"currency": defaultdict(float), "market": defaultdict(float), "instrument_type": defaultdict(float)}
+        for position, weight in zip(positions, weights):
+            allocations["currency"][position.position_currency] += weight * 100
+            allocations["market"][position.mic or "unknown"] += weight * 100
+            allocations["instrument_type"][position.instrument.get("instrument_type") or "unknown"] += weight * 100
+
+        hhi = sum(weight * weight for weight in weights)
+
+        account_returns = [0.0] * days
+        for position, weight in zip(positions, weights):
+            for day, value in enumerate(returns.get(position.instrument_id, ())):
+                account_returns[day] += weight * value
+
+        benchmark = returns[benchmark_id]
+        account_mean = sum(account_returns) / days
+        benchmark_mean = sum(benchmark) / days
+        variance = sum((value - account_mean) ** 2 for value in account_returns) / (days - 1)
+        covariance = sum((value - account_mean) * (other - benchmark_mean) for value, other in zip(account_returns, benchmark)) / (days - 1)
+        benchmark_variance = sum((value - benchmark_mean) ** 2 for value in benchmark) / (days - 1)
+
+        results[account_id] = {
+            "hhi": hhi,
+            "effective_positions": 1 / hhi if hhi else None,
+            "top_weight": sum(sorted(weights, reverse=True)[:ANALYTICS_TOP_POSITIONS]) * 100,
+            "volatility": math.sqrt(variance * HISTORY_TRADING_DAYS_PER_YEAR) * 100,
+            "beta": covariance / benchmark_variance if benchmark_variance else None,
+            "allocation_by_currency": dict(allocations["currency"]),
+            "allocation_by_market": dict(allocations["market"]),
+            "allocation_by_instrument_type": dict(allocations["instrument_type"]),
+        }
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--positions", type=int, default=5000)
+    parser.add_argument("--accounts", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=20, help="best of this many runs")
+    args = parser.parse_args()
+
+    positions = [
+        Position(raw, "dkk")
+        for account in make_positions(args.positions, args.accounts).values()
+        for raw in account
+    ]
+
+    # two snapshots with the same positions at different prices, and one without the last position
+    snapshot = HoldingsSnapshot(positions, dt.utcnow())
+    moved = HoldingsSnapshot([position.with_market_price(position.position_market_price * 1.01) for position in positions], dt.utcnow())
+    removed = HoldingsSnapshot(positions[:-1], dt.utcnow())
+
+    closes = make_closes(positions)
+    benchmark_id = positions[0].instrument_id
+    returns, days = python_returns(closes)
+
+    def alternate(first: HoldingsSnapshot, second: HoldingsSnapshot):
+        analytics = PortfolioAnalytics()
+        analytics.update_history(closes, benchmark_id)
+        analytics.update(first)
+
+        def run():
+            analytics.update(second)
+            analytics.update(first)
+
+        return run
+
+    figures = {
+        "prices changed only": (alternate(snapshot, moved), 2),
+        "positions added/removed": (alternate(snapshot, removed), 2),
+        "python loops": (lambda: python_loops(snapshot, returns, days, benchmark_id), 1),
+        "daily returns": (lambda: PortfolioAnalytics().update_history(closes, benchmark_id), 1),
+        "python daily returns": (lambda: python_returns(closes), 1),
+    }
+
+    print(f"{args.positions} positions over {args.accounts} accounts (best of {args.repeat}):")
+
+    for name, (func, updates) in figures.items():
+        duration = min(timeit.repeat(func, number=1, repeat=args.repeat)) / updates
+        print(f"  {name + ':':<26} {duration * 1000:>6.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
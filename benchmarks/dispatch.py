@@ -0,0 +1,71 @@
+"""
+Cost of dispatching a refresh to the stock entities, before and after the holdings snapshot
+
+    python -m benchmarks.dispatch --sizes 10,100,1000
+
+Before, every entity looked up its position with Coordinator.holding_for_symbol, a linear scan
+of the raw positions, so a refresh was O(N^2) in the number of positions. Now each fetch builds
+one HoldingsSnapshot indexed by position key, and every entity looks up its position in O(1).
+The snapshot build is included in the figures after
+"""
+
+import argparse
+import timeit
+
+from homeassistant.util import dt
+
+from custom_components.nordnet.position import Position
+from custom_components.nordnet.snapshot import HoldingsSnapshot
+from tests.fake_nordnet import make_positions
+
+
+def holding_for_symbol(holdings: list, symbol: str) -> dict:
+    """
+    The lookup before the snapshot, done by every entity on every refresh
+    """
+
+    for position in holdings:
+        if position['instrument']['symbol'] == symbol:
+            return position
+
+    return None
+
+
+def dispatch_before(holdings: list, symbols: list) -> None:
+    for symbol in symbols:
+        holding_for_symbol(holdings, symbol)
+
+
+def dispatch_after(positions: list, keys: list) -> None:
+    snapshot = HoldingsSnapshot(positions, dt.utcnow())
+
+    for key in keys:
+        snapshot.by_key[key]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,100,1000", help="comma separated numbers of positions")
+    parser.add_argument("--repeat", type=int, default=5, help="best of this many runs")
+    args = parser.parse_args()
+
+    print(f"{'positions':>9} {'before':>12} {'after':>12}")
+
+    for size in (int(size) for size in args.sizes.split(",")):
+        holdings = make_positions(size)[1]
+        positions = [Position(raw, "dkk") for raw in holdings]
+
+        symbols = [raw['instrument']['symbol'] for raw in holdings]
+        keys = [position.key for position in positions]
+
+        # enough runs per timing to last about 0.2 seconds
+        number = max(1, 200000 // (size * size))
+
+        before = min(timeit.repeat(lambda: dispatch_before(holdings, symbols), number=number, repeat=args.repeat)) / number
+        after = min(timeit.repeat(lambda: dispatch_after(positions, keys), number=number, repeat=args.repeat)) / number
+
+        print(f"{size:>9} {before * 1e6:>10.1f}us {after * 1e6:>10.1f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""
+Refresh benchmark of the coordinator against the fake Nordnet API in tests/fake_nordnet.py
+
+    python -m benchmarks.refresh --sizes 10,100,1000,5000 --refreshes 20 --json results.json
+    python -m benchmarks.refresh --compare results.json
+
+Run from the repository root, with Home Assistant installed. For every portfolio size the
+coordinator refreshes against a fake API (in its own thread, so it doesn't count towards the
+event loop blocking), with one listener per position like the entities of sensor.py, and reports:
+
+* refresh: wall time per refresh, and the per stage timings of RefreshMetrics
+* loop_block: the longest time the event loop was blocked during a refresh
+* memory: peak allocations per refresh and memory retained after all refreshes, from tracemalloc
+
+--compare exits with status 1 if any timing or memory figure regressed by more than --threshold
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import tempfile
+import threading
+import tracemalloc
+from time import perf_counter
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.nordnet.const import (PORTFOLIO_CONTEXT,
+                                             RATE_LIMITER_KEY)
+from custom_components.nordnet.coordinator import Coordinator
+from custom_components.nordnet.throttle import TokenBucket
+from tests.fake_nordnet import FakeNordnet
+
+"""
+Stages of RefreshMetrics reported next to the wall time
+"""
+STAGES = ("http", "decode", "remap", "analytics", "dispatch", "total")
+
+"""
+Interval of the event loop lag probe, in seconds
+"""
+LAG_PROBE_INTERVAL = 0.001
+
+
+class FakeNordnetThread:
+    """
+    The fake API served from its own event loop, so serializing its responses doesn't block the benchmarked loop
+    """
+
+    def __init__(self, fake: FakeNordnet):
+        self.fake: FakeNordnet = fake
+        self.url: str = None
+
+        self._loop: asyncio.AbstractEventLoop = asyncio.new_event_loop()
+        self._runner = None
+        self._thread: threading.Thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+
+    def __enter__(self) -> "FakeNordnetThread":
+        self._thread.start()
+        self._runner, self.url = asyncio.run_coroutine_threadsafe(self.fake.start(), self._loop).result()
+        return self
+
+    def __exit__(self, *args) -> None:
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+class LoopLagProbe:
+    """
+    Longest delay of a short sleep, i.e. the longest time anything blocked the event loop
+    """
+
+    def __init__(self):
+        self.max_lag: float = 0.0
+        self._task: asyncio.Task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+
+        while True:
+            start = loop.time()
+            await asyncio.sleep(LAG_PROBE_INTERVAL)
+            self.max_lag = max(self.max_lag, loop.time() - start - LAG_PROBE_INTERVAL)
+
+    def start(self) -> None:
+        self.max_lag = 0.0
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> float:
+        self._task.cancel()
+
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+        return self.max_lag * 1000
+
+
+def coordinator_options(base_url: str, accounts: int) -> dict:
+    """
+    Options of a config entry for the fake API, trading around the clock
+    """
+
+    return {
+        "username": "benchmark",
+        "password": "benchmark",
+        "base_url": base_url,
+        "account_ids": ",".join(str(account_id) for account_id in range(1, accounts + 1)),
+        "trading_start_time": "00:00:00",
+        "trading_stop_time": "23:59:59",
+        "update_interval": {"hours": 0, "minutes": 1, "seconds": 0},
+        "max_update_interval": {"hours": 0, "minutes": 1, "seconds": 0},
+    }
+
+
+async def benchmark_size(size: int, args: argparse.Namespace) -> dict:
+    fake = FakeNordnet(size, args.accounts, args.latency, change_rate=args.change_rate)
+
+    with FakeNordnetThread(fake) as server, tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+
+        # the shared rate limit of 2 requests per second would dominate every figure
+        hass.data[RATE_LIMITER_KEY] = TokenBucket(10000, 10000)
+
+        coordinator = Coordinator(hass, Coordinator.map_config(coordinator_options(server.url, args.accounts)))
+
+        # the first refresh logs in and creates every position, like the first refresh after startup
+        await coordinator.async_refresh()
+        if not coordinator.last_update_success:
+            raise RuntimeError(f"Refreshing against the fake API failed: {coordinator.last_exception!r}")
+
+        # one listener per position and one per account, like the entities of sensor.py
+        notified = [0]
+
+        def listener() -> None:
+            notified[0] += 1
+
+        unsubscribe = [coordinator.async_add_listener(listener, key) for key in coordinator.data.by_key]
+        unsubscribe += [coordinator.async_add_listener(listener, PORTFOLIO_CONTEXT) for _ in range(args.accounts)]
+
+        # a second refresh warms up the rest, e.g. the trading calendar, so only steady state refreshes are measured
+        await coordinator.async_refresh()
+
+        # timings, without tracemalloc slowing everything down
+        notified[0] = 0
+        coordinator.metrics = type(coordinator.metrics)()
+        coordinator._session._metrics = coordinator.metrics
+
+        probe = LoopLagProbe()
+        durations = []
+        lags = []
+
+        for _ in range(args.refreshes):
+            probe.start()
+
+            start = perf_counter()
+            await coordinator.async_refresh()
+            durations.append((perf_counter() - start) * 1000)
+
+            lags.append(await probe.stop())
+
+        stages = {stage: coordinator.metrics.stages[stage].percentile(50) for stage in STAGES}
+        dispatched = notified[0] / args.refreshes
+
+        # allocations, in a separate pass
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        peaks = []
+
+        for _ in range(args.refreshes):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+
+            await coordinator.async_refresh()
+
+            peaks.append((tracemalloc.get_traced_memory()[1] - before) / 1024)
+
+        retained = (tracemalloc.get_traced_memory()[0] - baseline) / 1024
+        tracemalloc.stop()
+
+        for unsub in unsubscribe:
+            unsub()
+
+        await coordinator.async_close()
+        await hass.async_stop(force=True)
+
+    return {
+        "positions": size,
+        "refresh_ms": {"p50": statistics.median(durations), "max": max(durations)},
+        "stages_ms": stages,
+        "loop_block_ms": {"p50": statistics.median(lags), "max": max(lags)},
+        "memory_kib": {"peak_per_refresh": statistics.median(peaks), "retained": retained},
+        "listeners_notified_per_refresh": dispatched,
+        "requests": dict(fake.requests),
+    }
+
+
+def flatten(result: dict, prefix: str = "") -> dict:
+    """
+    Numeric figures of a result keyed by their dotted path, e.g. 'refresh_ms.p50'
+    """
+
+    flat = {}
+
+    for key, value in result.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and key != "positions":
+            flat[f"{prefix}{key}"] = value
+
+    return flat
+
+
+def compare(results: list, baseline: list, threshold: float) -> bool:
+    """
+    Print the change of every figure compared to the baseline, returns False if any regressed
+    """
+
+    baseline = {result["positions"]: flatten(result) for result in baseline}
+    ok = True
+
+    for result in results:
+        before = baseline.get(result["positions"])
+        if before is None:
+            continue
+
+        for figure, value in flatten(result).items():
+            # only timings and memory, and not figures too small to measure reliably
+            if not figure.endswith(("_ms", ".p50", ".max", ".peak_per_refresh", ".retained")) or before.get(figure) is None:
+                continue
+
+            previous = before[figure]
+            change = (value - previous) / previous if previous > 0.1 else 0.0
+            regressed = change > threshold
+
+            ok = ok and not regressed
+            flag = "  REGRESSED" if regressed else ""
+            print(f"{result['positions']:>6} {figure:<34} {previous:>10.2f} -> {value:>10.2f} ({change:+.0%}){flag}")
+
+    return ok
+
+
+def report(result: dict) -> None:
+    stages = " ".join(f"{stage}={value:.2f}" for stage, value in result["stages_ms"].items() if value is not None)
+
+    print(
+        f"{result['positions']:>6} positions: "
+        f"refresh p50 {result['refresh_ms']['p50']:.2f}ms max {result['refresh_ms']['max']:.2f}ms | "
+        f"loop blocked max {result['loop_block_ms']['max']:.2f}ms | "
+        f"peak {result['memory_kib']['peak_per_refresh']:.0f}KiB/refresh retained {result['memory_kib']['retained']:.0f}KiB | "
+        f"notified {result['listeners_notified_per_refresh']:.0f}/refresh"
+    )
+    print(f"{'':>17}stages p50 (ms): {stages}")
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,100,1000,5000", help="comma separated numbers of positions")
+    parser.add_argument("--refreshes", type=int, default=20, help="refreshes measured per size")
+    parser.add_argument("--accounts", type=int, default=2)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request by the fake API")
+    parser.add_argument("--change-rate", type=float, default=0.1, help="fraction of prices changed between refreshes")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="compare the results to a file written by --json")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative change counted as a regression")
+    args = parser.parse_args()
+
+    results = []
+
+    for size in (int(size) for size in args.sizes.split(",")):
+        result = await benchmark_size(size, args)
+        report(result)
+        results.append(result)
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(results, file, indent=4)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+
+        if not compare(results, baseline, args.threshold):
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
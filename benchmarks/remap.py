@@ -0,0 +1,121 @@
+"""
+Time and allocations of remapping positions, before and after the compact Position records
+
+    python -m benchmarks.remap --positions 1000
+
+Before, every stock entity copied its raw position and flattened it with about twenty
+inserts and deletes on every refresh, and extra_state_attributes copied the result again on
+every read. Now the coordinator remaps every position once per fetch into a Position record,
+whose attributes are a read-only view built once and shared by every read. Both variants
+remap all positions and read their attributes twice, like a state write and a template do
+"""
+
+import argparse
+import timeit
+import tracemalloc
+
+from custom_components.nordnet.position import Position
+from tests.fake_nordnet import make_positions
+
+
+def remap(input: dict, account_currency: str, stale: bool = False) -> dict:
+    """
+    NordnetStock._remap, as it was before the Position records
+    """
+
+    ncur = input['main_market_price']['currency'].lower()
+
+    input = dict(input)
+    input['position_currency'] = ncur
+    input['account_currency'] = account_currency
+    input['stale'] = stale
+
+    input['account_market_value'] = input['market_value_acc']['value']
+    input['position_market_value'] = input['market_value']['value']
+    del input['market_value_acc']
+    del input['market_value']
+
+    input['account_acquisition_price'] = input['acq_price_acc']['value']
+    input['position_acquisition_price'] = input['acq_price']['value']
+    del input['acq_price_acc']
+    del input['acq_price']
+
+    input['position_morning_price'] = input['morning_price']['value']
+    del input['morning_price']
+
+    input['position_market_price'] = input['main_market_price']['value']
+    del input['main_market_price']
+
+    input['quantity'] = input['qty']
+    del input['qty']
+
+    input['account_roi'] = input['account_market_value'] - (input['quantity'] * input['account_acquisition_price'])
+    input['account_roi_percent'] = (input['position_market_price'] - input['position_acquisition_price']) / input['position_acquisition_price'] * 100
+
+    input['account_number'] = input['accno']
+    del input['accno']
+
+    input['account_id'] = input['accid']
+    del input['accid']
+
+    del input['is_custom_gav']
+    del input['margin_percent']
+    del input['pawn_percent']
+
+    return input
+
+
+def before(holdings: list) -> list:
+    remapped = [remap(raw, "dkk") for raw in holdings]
+
+    # extra_state_attributes returned dict(self._attributes)
+    for attributes in remapped:
+        dict(attributes)
+        dict(attributes)
+
+    return remapped
+
+
+def after(holdings: list) -> list:
+    positions = [Position(raw, "dkk") for raw in holdings]
+
+    for position in positions:
+        position.attributes
+        position.attributes
+
+    return positions
+
+
+def allocations(func, holdings: list) -> tuple:
+    """
+    Memory retained by the result, and peak memory while computing it, in KiB
+    """
+
+    tracemalloc.start()
+    result = func(holdings)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    del result
+    return retained / 1024, peak / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--positions", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5, help="best of this many runs")
+    args = parser.parse_args()
+
+    holdings = make_positions(args.positions)[1]
+
+    print(f"{args.positions} positions  {'time':>9} {'retained':>10} {'peak':>10}")
+
+    for name, func in (("before", before), ("after", after)):
+        duration = min(timeit.repeat(lambda: func(holdings), number=10, repeat=args.repeat)) / 10
+        retained, peak = allocations(func, holdings)
+
+        print(f"{name:<15} {duration * 1000:>7.2f}ms {retained:>7.0f}KiB {peak:>7.0f}KiB")
+
+
+if __name__ == "__main__":
+    main()
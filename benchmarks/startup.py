@@ -0,0 +1,115 @@
+"""
+Time until the entities of an entry can be created on startup, with and without the holdings cache
+
+    python -m benchmarks.startup --positions 500 --latency 0.05,0.2,0.5
+
+Without cached holdings, the sensor platform waits for the first refresh from Nordnet API, which
+logs in first unless a stored session is still valid. With cached holdings, it only loads them
+from HA storage and refreshes in the background. Each run starts a new Home Assistant instance
+against the fake API in tests/fake_nordnet.py, the storage is prepared by a refresh beforehand
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import tempfile
+from time import perf_counter
+
+from homeassistant.core import HomeAssistant
+
+from benchmarks.refresh import FakeNordnetThread, coordinator_options
+from custom_components.nordnet.const import DOMAIN
+from custom_components.nordnet.coordinator import Coordinator
+from tests.fake_nordnet import FakeNordnet
+
+"""
+Entry id of the benchmarked entry, which names its files in HA storage
+"""
+ENTRY_ID = "benchmark"
+
+"""
+Startups measured, and the storage files removed before each of them
+"""
+SCENARIOS = (
+    ("no cache, logging in", ("session", "holdings")),
+    ("no cache, stored session", ("holdings",)),
+    ("cached holdings", ()),
+)
+
+
+async def startup(config_dir: str, options: dict) -> float:
+    """
+    Milliseconds until the sensor platform has holdings to create entities from, like its async_setup_entry
+    """
+
+    hass = HomeAssistant(config_dir)
+    coordinator = Coordinator(hass, Coordinator.map_config(options), ENTRY_ID)
+
+    start = perf_counter()
+
+    if not await coordinator.async_load_cached_holdings():
+        await coordinator.async_refresh()
+        if not coordinator.last_update_success:
+            raise RuntimeError(f"Refreshing against the fake API failed: {coordinator.last_exception!r}")
+
+    duration = (perf_counter() - start) * 1000
+
+    # stopping flushes the delayed writes of the session and the holdings cache to storage
+    await coordinator.async_close()
+    await hass.async_stop(force=True)
+
+    return duration
+
+
+async def benchmark_latency(latency: float, args: argparse.Namespace) -> dict:
+    fake = FakeNordnet(args.positions, args.accounts, latency)
+
+    with FakeNordnetThread(fake) as server, tempfile.TemporaryDirectory() as config_dir:
+        options = coordinator_options(server.url, args.accounts)
+        storage = os.path.join(config_dir, ".storage")
+
+        # a first startup stores the session and the holdings, which are copied back before each run
+        await startup(config_dir, options)
+
+        saved = os.path.join(config_dir, "saved")
+        shutil.copytree(storage, saved)
+
+        results = {}
+
+        for name, removed in SCENARIOS:
+            durations = []
+
+            for _ in range(args.repeat):
+                shutil.rmtree(storage)
+                shutil.copytree(saved, storage)
+
+                for kind in removed:
+                    os.remove(os.path.join(storage, f"{DOMAIN}.{ENTRY_ID}.{kind}"))
+
+                durations.append(await startup(config_dir, options))
+
+            results[name] = statistics.median(durations)
+
+    return results
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--positions", type=int, default=500)
+    parser.add_argument("--accounts", type=int, default=2)
+    parser.add_argument("--latency", default="0.05,0.2,0.5", help="comma separated seconds added to every request by the fake API")
+    parser.add_argument("--repeat", type=int, default=5, help="median of this many startups")
+    args = parser.parse_args()
+
+    print(f"{args.positions} positions over {args.accounts} accounts, median of {args.repeat} startups:")
+    print(f"{'latency':>9} " + " ".join(f"{name:>26}" for name, _ in SCENARIOS))
+
+    for latency in (float(latency) for latency in args.latency.split(",")):
+        results = await benchmark_latency(latency, args)
+        print(f"{latency * 1000:>7.0f}ms " + " ".join(f"{results[name]:>24.1f}ms" for name, _ in SCENARIOS))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,12 +1,21 @@
 import asyncio
 import logging
 
+import voluptuous as vol
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, ServiceCall, callback
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.typing import ConfigType
+from homeassistant.util import dt
 
-from .const import DOMAIN, PLATFORM
+from .const import (DEFAULT_BACKFILL_DAYS, DEFAULT_PROFILE_REFRESHES, DOMAIN,
+                    HOLDINGS_STORAGE_VERSION, PLATFORM,
+                    SERVICE_BACKFILL_STATISTICS, SERVICE_PROFILE_REFRESH)
 from .coordinator import Coordinator
+from .market_calendar import load_holidays
+from .sensor import stock_unique_id, symbol_stock_unique_id
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -20,6 +29,38 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
 
     hass.data[DOMAIN] = {}
 
+    async def backfill_statistics(call: ServiceCall) -> None:
+        """
+        Import the price history of all held instruments into long-term statistics, in the background
+        """
+
+        for coordinator in hass.data[DOMAIN].values():
+            if not coordinator.backfill.async_start(call.data["days"]):
+                _LOGGER.warning("Backfill of statistics is already running")
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_BACKFILL_STATISTICS,
+        backfill_statistics,
+        schema=vol.Schema({vol.Optional("days", default=DEFAULT_BACKFILL_DAYS): cv.positive_int}),
+    )
+
+    async def profile_refresh(call: ServiceCall) -> None:
+        """
+        Profile CPU and memory of the next refreshes, writing a report to the config dir
+        """
+
+        for coordinator in hass.data[DOMAIN].values():
+            if not coordinator.async_start_profiling(call.data["refreshes"]):
+                _LOGGER.warning("Profiling of refreshes is already running")
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_PROFILE_REFRESH,
+        profile_refresh,
+        schema=vol.Schema({vol.Optional("refreshes", default=DEFAULT_PROFILE_REFRESHES): cv.positive_int}),
+    )
+
     return True
 
 
@@ -33,7 +74,10 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 
     # Create coordinator for the entry, responsible for fetching data from Nordnet
     # and creating entities for each listing in the account
-    hass.data[DOMAIN][entry.entry_id] = Coordinator(hass, Coordinator.map_config(entry.options))
+    hass.data[DOMAIN][entry.entry_id] = Coordinator(hass, Coordinator.map_config(entry.options), entry.entry_id)
+
+    # holiday definitions are imported on first use, which would block the event loop in the first refresh
+    await hass.async_add_executor_job(load_holidays, dt.now().year)
 
     # When an entry is updated via HA UI we will propagate the configuration
     # changes to the Coordinator
@@ -54,7 +98,17 @@ async def update_listener(hass: HomeAssistant, entry: ConfigEntry):
 
     _LOGGER.info(f"Updating entry configuration for entry '{entry.title}'")
 
-    hass.data[DOMAIN][entry.entry_id].update_config(entry.options)
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+
+    # the recorder settings of entities are fixed when they are added, so a new attribute profile needs a reload,
+    # and so does a new reporting currency, as the unit of the total market value sensor, and a new benchmark,
+    # which adds or removes the beta sensors
+    config = Coordinator.map_config(entry.options)
+    if any(coordinator.config[key] != config[key] for key in ("attribute_profile", "reporting_currency", "benchmark_instrument_id")):
+        await hass.config_entries.async_reload(entry.entry_id)
+        return
+
+    coordinator.update_config(entry.options)
 
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry):
@@ -72,7 +126,7 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry):
     )
 
     if unload_ok:
-        hass.data[DOMAIN].pop(entry.entry_id)
+        await hass.data[DOMAIN].pop(entry.entry_id).async_close()
 
     return unload_ok
 
@@ -120,6 +174,57 @@ async def async_migrate_entry(hass, config_entry: ConfigEntry):
 
         hass.config_entries.async_update_entry(config_entry, options=new)
 
+    if config_entry.version == 4:
+        new = {**config_entry.options}
+
+        # a single entry can now cover several accounts sharing one login
+        account_id = int(new.pop("account_id"))
+        new["account_ids"] = str(account_id)
+        new["account_currencies"] = {str(account_id): new.pop("account_currency")}
+
+        # stock unique_ids are namespaced per account, since they collide across accounts
+        @callback
+        def namespace_unique_id(entity_entry: er.RegistryEntry) -> dict:
+            prefix = "nordnet_stock_"
+            if not entity_entry.unique_id.startswith(prefix):
+                return None
+
+            return {"new_unique_id": f"{prefix}{account_id}_{entity_entry.unique_id[len(prefix):]}"}
+
+        await er.async_migrate_entries(hass, config_entry.entry_id, namespace_unique_id)
+
+        config_entry.version = 5
+
+        hass.config_entries.async_update_entry(config_entry, options=new)
+
+    if config_entry.version == 5:
+        # stock unique_ids are built from the instrument id instead of the symbol, since symbols
+        # collide across markets. Symbols are mapped to instrument ids with the cached holdings,
+        # positions missing from the cache are migrated once they are fetched, see sensor.py
+        store = Store(hass, HOLDINGS_STORAGE_VERSION, f"{DOMAIN}.{config_entry.entry_id}.holdings", private=True)
+        cached = await store.async_load() or {"positions": []}
+
+        unique_ids = {}
+        for raw in cached["positions"]:
+            # the first position of a symbol had the entity, same as the old symbol lookup
+            unique_ids.setdefault(
+                symbol_stock_unique_id(raw['accid'], raw['instrument']['symbol']),
+                stock_unique_id(raw['accid'], raw['instrument']['instrument_id']),
+            )
+
+        @callback
+        def instrument_unique_id(entity_entry: er.RegistryEntry) -> dict:
+            if entity_entry.unique_id not in unique_ids:
+                return None
+
+            return {"new_unique_id": unique_ids[entity_entry.unique_id]}
+
+        await er.async_migrate_entries(hass, config_entry.entry_id, instrument_unique_id)
+
+        config_entry.version = 6
+
+        hass.config_entries.async_update_entry(config_entry)
+
     _LOGGER.info("Migration to version %s successful", config_entry.version)
 
     return True
@@ -0,0 +1,196 @@
+"""
+Incremental sync of transactions (trades, dividends, ...) and orders, emitted as HA events
+"""
+
+import asyncio
+import logging
+from datetime import date, datetime
+
+import aiohttp
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt
+
+from .const import (ACTIVITY_STORAGE_VERSION, ACTIVITY_SYNC_INTERVAL, DOMAIN,
+                    EVENT_ORDER, EVENT_TRANSACTION, ORDER_CLOSED_STATES)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ActivitySync:
+    """
+    Keeps track of new transactions and changed orders of each account
+
+    Transactions are fetched from the accounting date of the last seen transaction only, and the
+    ids seen on that date are kept to skip them, so each sync costs the same no matter how long
+    the account history is. The cursor is persisted, so transactions made while HA was down are
+    emitted on the next sync. On the very first sync the cursor starts today, without emitting
+    the existing history
+
+    Orders are diffed against the orders of the previous sync, and only open orders are kept
+    """
+
+    def __init__(self, hass: HomeAssistant, coordinator, entry_id: str):
+        self._hass: HomeAssistant = hass
+        self._coordinator = coordinator
+        self._store: Store = Store(hass, ACTIVITY_STORAGE_VERSION, f"{DOMAIN}.{entry_id}.activity", private=True)
+
+        # per account id: {"date": accounting date of the last transaction, "ids": transaction ids seen on that date}
+        self._cursors: dict = None
+
+        # per account id: the open orders by order id, None until the first sync of the account
+        self._orders: dict = {}
+
+        self._task: asyncio.Task = None
+        self._synced_at: datetime = None
+
+    def open_orders(self, account_id: int) -> list:
+        return list(self._orders.get(account_id, {}).values())
+
+    @callback
+    def async_schedule_sync(self) -> None:
+        """
+        Sync in the background, at most every ACTIVITY_SYNC_INTERVAL
+        """
+
+        if self._task is not None and not self._task.done():
+            return
+
+        if self._synced_at is not None and dt.utcnow() - self._synced_at < ACTIVITY_SYNC_INTERVAL:
+            return
+
+        self._synced_at = dt.utcnow()
+        self._task = self._hass.async_create_task(self._async_sync())
+
+    async def async_stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _async_sync(self) -> None:
+        if self._cursors is None:
+            self._cursors = {int(account_id): cursor for account_id, cursor in (await self._store.async_load() or {}).items()}
+
+        # a failing account is retried on the next sync, without holding back the other accounts
+        for account_id in self._coordinator.account_ids():
+            try:
+                await self._async_sync_transactions(account_id)
+                await self._async_sync_orders(account_id)
+
+            except (aiohttp.ClientError, asyncio.TimeoutError) as ex:
+                _LOGGER.debug(f"[activity] Syncing transactions and orders of account {account_id} failed: {ex!r}")
+
+            except Exception:
+                # e.g. a malformed transaction, which would otherwise end every sync of the account the same way
+                _LOGGER.exception(f"[activity] Syncing transactions and orders of account {account_id} failed")
+
+        self._coordinator.async_update_activity_listeners()
+
+    async def _async_sync_transactions(self, account_id: int) -> None:
+        today = dt.now().date()
+        stored = self._cursors.get(account_id)
+
+        transactions = await self._coordinator.async_get_transactions(account_id, date.fromisoformat(stored["date"]) if stored else today, today)
+
+        # don't emit the existing history of a new account
+        emit = stored is not None
+
+        seen = set(stored["ids"]) if stored else set()
+        new = [transaction for transaction in transactions if transaction["transaction_id"] not in seen]
+
+        if not new and stored is not None:
+            return
+
+        # the new cursor and events are built in full before anything is emitted or stored, so a
+        # malformed transaction leaves the cursor where it was, without emitting events twice
+        cursor = {"date": stored["date"], "ids": list(stored["ids"])} if stored else {"date": today.isoformat(), "ids": []}
+        events = []
+
+        for transaction in sorted(new, key=lambda transaction: (transaction["accounting_date"], transaction["transaction_id"])):
+            if emit:
+                events.append(self._transaction_event(account_id, transaction))
+
+            # only the ids of the latest date are needed to skip already seen transactions
+            if transaction["accounting_date"] > cursor["date"]:
+                cursor = {"date": transaction["accounting_date"], "ids": []}
+
+            if transaction["accounting_date"] == cursor["date"]:
+                cursor["ids"].append(transaction["transaction_id"])
+
+        self._cursors[account_id] = cursor
+
+        for event in events:
+            self._hass.bus.async_fire(EVENT_TRANSACTION, event)
+
+        await self._store.async_save({str(account_id): cursor for account_id, cursor in self._cursors.items()})
+
+        if emit:
+            _LOGGER.debug(f"[activity] {len(new)} new transactions in account {account_id}")
+
+    async def _async_sync_orders(self, account_id: int) -> None:
+        orders = {order["order_id"]: order for order in await self._coordinator.async_get_orders(account_id)}
+
+        # the first sync is the baseline to diff against
+        previous = self._orders.get(account_id)
+        emit = previous is not None
+        previous = previous or {}
+        events = []
+
+        for order_id, order in orders.items():
+            old = previous.get(order_id)
+
+            if old is None and order["order_state"] in ORDER_CLOSED_STATES:
+                # closed before we ever saw it open, e.g. after a restart
+                continue
+
+            if emit and (old is None or self._order_changed(old, order)):
+                events.append(self._order_event(account_id, order, "new" if old is None else "updated"))
+
+        if emit:
+            for order_id in previous.keys() - orders.keys():
+                events.append(self._order_event(account_id, previous[order_id], "removed"))
+
+        self._orders[account_id] = {order_id: order for order_id, order in orders.items() if order["order_state"] not in ORDER_CLOSED_STATES}
+
+        for event in events:
+            self._hass.bus.async_fire(EVENT_ORDER, event)
+
+    @staticmethod
+    def _order_changed(old: dict, new: dict) -> bool:
+        return old["order_state"] != new["order_state"] or old.get("traded_volume") != new.get("traded_volume")
+
+    @staticmethod
+    def _transaction_event(account_id: int, transaction: dict) -> dict:
+        instrument = transaction.get("instrument") or {}
+        amount = transaction.get("amount") or {}
+        price = transaction.get("price") or {}
+
+        return {
+            "account_id": account_id,
+            "transaction_id": transaction["transaction_id"],
+            "accounting_date": transaction["accounting_date"],
+            "type": transaction.get("transaction_type_code"),
+            "type_name": transaction.get("transaction_type_name"),
+            "symbol": instrument.get("symbol"),
+            "instrument_id": instrument.get("instrument_id"),
+            "quantity": transaction.get("quantity"),
+            "price": price.get("value"),
+            "amount": amount.get("value"),
+            "currency": amount.get("currency"),
+        }
+
+    @staticmethod
+    def _order_event(account_id: int, order: dict, change: str) -> dict:
+        price = order.get("price") or {}
+
+        return {
+            "account_id": account_id,
+            "order_id": order["order_id"],
+            "change": change,
+            "state": order["order_state"],
+            "side": order.get("side"),
+            "volume": order.get("volume"),
+            "traded_volume": order.get("traded_volume"),
+            "price": price.get("value"),
+            "currency": price.get("currency"),
+        }
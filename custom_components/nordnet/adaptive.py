@@ -0,0 +1,80 @@
+"""
+Positions update interval adapting to how much the holdings change between refreshes
+"""
+
+from collections import deque
+from datetime import timedelta
+
+from .const import (ADAPTIVE_ACTIVE_RATE, ADAPTIVE_BACKOFF, ADAPTIVE_QUIET_RATE,
+                    ADAPTIVE_WINDOW)
+
+
+class AdaptiveInterval:
+    """
+    Update interval between `minimum` and `maximum`, following the change rate of the holdings
+
+    The change rate is the fraction of positions that changed per refresh, averaged over the last
+    ADAPTIVE_WINDOW refreshes. When the latest refresh or the average is above ADAPTIVE_ACTIVE_RATE
+    the interval is halved, down to `minimum`, and while the average is below ADAPTIVE_QUIET_RATE it
+    grows by ADAPTIVE_BACKOFF, up to `maximum`. Tightening on a single busy refresh and backing off
+    only after a quiet window catches bursts of activity right away, while a quiet portfolio
+    settles at the slowest interval
+    """
+
+    def __init__(self, minimum: timedelta, maximum: timedelta):
+        self.minimum: timedelta = minimum
+        self.maximum: timedelta = max(minimum, maximum)
+        self.interval: timedelta = minimum
+
+        self._rates: deque = deque(maxlen=ADAPTIVE_WINDOW)
+
+    @property
+    def enabled(self) -> bool:
+        return self.maximum > self.minimum
+
+    @property
+    def change_rate(self) -> float:
+        if not self._rates:
+            return None
+
+        return sum(self._rates) / len(self._rates)
+
+    def record(self, changed: int, total: int) -> timedelta:
+        """
+        Record the number of positions changed by a refresh, returns the new interval
+        """
+
+        # removed positions count as changed too, so the rate can't exceed 1
+        latest = min(1.0, changed / total) if total else 0.0
+        self._rates.append(latest)
+
+        if not self.enabled:
+            return self.interval
+
+        rate = self.change_rate
+
+        if latest >= ADAPTIVE_ACTIVE_RATE or rate >= ADAPTIVE_ACTIVE_RATE:
+            self.interval = max(self.minimum, self.interval / 2)
+
+        # only back off once the whole window is quiet, not after a single quiet refresh
+        elif rate <= ADAPTIVE_QUIET_RATE and len(self._rates) == self._rates.maxlen:
+            self.interval = min(self.maximum, self.interval * ADAPTIVE_BACKOFF)
+
+        self.interval = timedelta(seconds=round(self.interval.total_seconds()))
+        return self.interval
+
+    def reset(self) -> None:
+        """
+        Start over at the fastest interval, e.g. when markets open
+        """
+
+        self._rates.clear()
+        self.interval = self.minimum
+
+    def as_dict(self) -> dict:
+        return {
+            "minimum": str(self.minimum),
+            "maximum": str(self.maximum),
+            "interval": str(self.interval),
+            "change_rate": self.change_rate,
+        }
@@ -0,0 +1,237 @@
+"""
+Portfolio analytics computed once per snapshot with NumPy, over columnar arrays of all positions
+"""
+
+from operator import attrgetter
+
+import numpy as np
+
+from .const import (ANALYTICS_TOP_POSITIONS, HISTORY_MIN_RETURNS,
+                    HISTORY_TRADING_DAYS_PER_YEAR)
+from .snapshot import HoldingsSnapshot
+
+
+class PortfolioAnalytics:
+    """
+    Allocation, concentration, volatility and beta of every account
+
+    All positions are converted into columnar arrays in a single pass, and every metric of every
+    account is computed with grouped NumPy operations (bincount over the account index), instead
+    of looping over the positions of each account per metric
+
+    * allocation (% of market value) by position currency, market and instrument type
+    * concentration: Herfindahl-Hirschman index of the weights, the effective number of
+      positions (1 / HHI) and the weight of the largest positions
+    * volatility: annualised standard deviation (in %) of the daily returns the current
+      positions would have had over the price history, see PriceHistory
+    * beta of those daily returns against the daily returns of the benchmark instrument
+
+    Returns come from daily closes in the currency of each position, so they are spaced a trading
+    day apart no matter how often holdings are refreshed, and buying or selling doesn't show up
+    as a return. Positions without price history count as if their price didn't move
+    """
+
+    def __init__(self):
+        # columns that only change when positions are added or removed, reused while only prices change
+        self._keys: list = None
+        self._accounts: list = None
+        self._account_index: np.ndarray = None
+        self._instrument_ids: np.ndarray = None
+        self._categories: dict = {}
+
+        # daily returns (days x instruments) of the price history, and the column of each instrument
+        self._returns: np.ndarray = None
+        self._columns: dict = {}
+        self._benchmark_returns: np.ndarray = None
+
+        # column in the daily returns of each position, rebuilt when positions or the history change
+        self._position_columns: np.ndarray = None
+
+        self.results: dict = {}
+
+    def update(self, snapshot: HoldingsSnapshot) -> None:
+        positions = snapshot.positions
+        count = len(positions)
+
+        if not count:
+            self.results = {}
+            return
+
+        self._update_structure(positions)
+
+        accounts = self._accounts
+        account_index = self._account_index
+
+        values = np.fromiter(map(attrgetter("account_market_value"), positions), np.float64, count)
+
+        totals = np.bincount(account_index, weights=values, minlength=len(accounts))
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            weights = np.where(totals[account_index] != 0, values / totals[account_index], 0.0)
+
+        hhi = np.bincount(account_index, weights=weights * weights, minlength=len(accounts))
+
+        allocations = {name: self._allocation(names, category_index, weights) for name, (names, category_index) in self._categories.items()}
+
+        top = self._top_weights(weights)
+        volatility, beta = self._risk(weights)
+
+        self.results = {
+            account_id: {
+                "hhi": float(hhi[i]),
+                "effective_positions": float(1 / hhi[i]) if hhi[i] else None,
+                "top_weight": float(top[i]),
+                "volatility": volatility[i],
+                "beta": beta[i],
+                "allocation_by_currency": allocations["currency"][i],
+                "allocation_by_market": allocations["market"][i],
+                "allocation_by_instrument_type": allocations["instrument_type"][i],
+            }
+            for i, account_id in enumerate(accounts)
+        }
+
+    def _update_structure(self, positions: tuple) -> None:
+        """
+        Rebuild the account index and category columns if positions were added or removed
+        """
+
+        keys = [position.key for position in positions]
+
+        # the common case, only prices changed
+        if keys == self._keys:
+            return
+
+        self._keys = keys
+        self._accounts, self._account_index = _factorize([position.account_id for position in positions])
+        self._instrument_ids = np.fromiter(map(attrgetter("instrument_id"), positions), np.int64, len(keys))
+        self._position_columns = None
+
+        self._categories = {
+            "currency": _factorize([position.position_currency for position in positions]),
+            "market": _factorize([position.mic or "unknown" for position in positions]),
+            "instrument_type": _factorize([position.instrument.get("instrument_type") or "unknown" for position in positions]),
+        }
+
+    def _allocation(self, names: list, category_index: np.ndarray, weights: np.ndarray) -> list:
+        """
+        Sum of the weights (in %) per category, for each account
+        """
+
+        accounts = len(self._accounts)
+
+        # one bin per (account, category) pair
+        sums = np.bincount(self._account_index * len(names) + category_index, weights=weights, minlength=accounts * len(names))
+        sums = sums.reshape(accounts, len(names)) * 100
+
+        return [
+            {names[j]: float(sums[i, j]) for j in np.flatnonzero(sums[i])}
+            for i in range(accounts)
+        ]
+
+    def _top_weights(self, weights: np.ndarray) -> np.ndarray:
+        """
+        Combined weight (in %) of the ANALYTICS_TOP_POSITIONS largest positions of each account
+        """
+
+        account_index = self._account_index
+        accounts = len(self._accounts)
+
+        # sorted by account, then by descending weight
+        order = np.lexsort((-weights, account_index))
+        sorted_accounts = account_index[order]
+
+        # rank of each position within its account
+        starts = np.searchsorted(sorted_accounts, np.arange(accounts))
+        rank = np.arange(len(order)) - starts[sorted_accounts]
+
+        top = rank < ANALYTICS_TOP_POSITIONS
+        return np.bincount(sorted_accounts[top], weights=weights[order][top], minlength=accounts) * 100
+
+
+    def update_history(self, closes: dict, benchmark_id: int = None) -> None:
+        """
+        Daily returns of every instrument from their daily closes, see PriceHistory
+
+        Closes are aligned on the days any of the instruments traded. An instrument that didn't
+        trade on a day, e.g. on a holiday of its exchange, keeps its previous close, so it has no
+        return that day rather than a return spanning two days the next
+        """
+
+        self._returns = None
+        self._columns = {}
+        self._benchmark_returns = None
+        self._position_columns = None
+
+        counts = [len(days) for days, _ in closes.values()]
+        if sum(counts) < 2:
+            return
+
+        days = np.concatenate([days for days, _ in closes.values()])
+        first = days.min()
+
+        # a row per calendar day, without the days none of the instruments traded on
+        prices = np.full((days.max() - first + 1, len(closes)), np.nan)
+        prices[days - first, np.repeat(np.arange(len(closes)), counts)] = np.concatenate([values for _, values in closes.values()])
+        prices = prices[~np.isnan(prices).all(axis=1)]
+
+        # forward fill, each day takes the close of the latest day the instrument traded on
+        traded = np.where(np.isnan(prices), 0, np.arange(len(prices))[:, None])
+        prices = prices[np.maximum.accumulate(traded, axis=0), np.arange(len(closes))]
+
+        # days before the first close of an instrument have no return
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returns = prices[1:] / prices[:-1] - 1
+
+        self._returns = np.nan_to_num(returns, nan=0.0, posinf=0.0, neginf=0.0)
+        self._columns = {instrument_id: column for column, instrument_id in enumerate(closes)}
+
+        if benchmark_id in self._columns:
+            self._benchmark_returns = self._returns[:, self._columns[benchmark_id]]
+
+    def _risk(self, weights: np.ndarray) -> tuple:
+        """
+        Annualised volatility (in %) and beta of the daily returns of each account at the current weights
+        """
+
+        accounts = len(self._accounts)
+
+        if self._returns is None or len(self._returns) < HISTORY_MIN_RETURNS:
+            return [None] * accounts, [None] * accounts
+
+        if self._position_columns is None:
+            self._position_columns = np.fromiter((self._columns.get(instrument_id, -1) for instrument_id in self._instrument_ids.tolist()), np.int64, len(self._instrument_ids))
+
+        columns = self._position_columns
+        known = columns >= 0
+        instruments = self._returns.shape[1]
+
+        # weight of each instrument in each account, positions of the same instrument are added up
+        exposure = np.bincount(self._account_index[known] * instruments + columns[known], weights=weights[known], minlength=accounts * instruments)
+        account_returns = self._returns @ exposure.reshape(accounts, instruments).T
+
+        volatility = account_returns.std(axis=0, ddof=1) * np.sqrt(HISTORY_TRADING_DAYS_PER_YEAR) * 100
+
+        if self._benchmark_returns is None:
+            return volatility.tolist(), [None] * accounts
+
+        benchmark = self._benchmark_returns - self._benchmark_returns.mean()
+        variance = benchmark @ benchmark
+
+        if not variance:
+            return volatility.tolist(), [None] * accounts
+
+        beta = (account_returns - account_returns.mean(axis=0)).T @ benchmark / variance
+        return volatility.tolist(), beta.tolist()
+
+
+def _factorize(values: list) -> tuple:
+    """
+    The distinct values in order of appearance, and the index of each value among them
+
+    Dict lookups, rather than np.unique, which sorts the values first
+    """
+
+    names = list(dict.fromkeys(values))
+    index = {name: i for i, name in enumerate(names)}
+
+    return names, np.fromiter(map(index.__getitem__, values), np.int64, len(values))
@@ -0,0 +1,144 @@
+"""
+Backfill of historical prices into HA long-term statistics, so new holdings have history from day one
+"""
+
+import asyncio
+import logging
+from datetime import date, timedelta
+
+import aiohttp
+from homeassistant.components.recorder.models import (StatisticData,
+                                                      StatisticMetaData)
+from homeassistant.components.recorder.statistics import \
+    async_add_external_statistics
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt
+
+from .const import (BACKFILL_BATCH_DAYS, BACKFILL_BATCH_DELAY,
+                    BACKFILL_STORAGE_VERSION, DOMAIN)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class StatisticsBackfill:
+    """
+    Imports the daily price history of held instruments as external statistics,
+    named `nordnet:instrument_{instrument_id}`
+
+    History is fetched and imported in batches of BACKFILL_BATCH_DAYS per instrument, one
+    instrument at a time with a pause between batches, so backfilling years of history for
+    hundreds of instruments doesn't flood Nordnet or the recorder
+
+    The last imported day of each instrument is persisted after every batch, so an
+    interrupted run resumes where it stopped and later runs only import the days since
+    """
+
+    def __init__(self, hass: HomeAssistant, coordinator, entry_id: str):
+        self._hass: HomeAssistant = hass
+        self._coordinator = coordinator
+        self._store: Store = Store(hass, BACKFILL_STORAGE_VERSION, f"{DOMAIN}.{entry_id}.backfill", private=True)
+        self._task: asyncio.Task = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @callback
+    def async_start(self, days: int) -> bool:
+        """
+        Start backfilling up to `days` of history in the background, returns False if already running
+        """
+
+        if self.running:
+            return False
+
+        self._task = self._hass.async_create_background_task(self._async_run(days), "nordnet statistics backfill")
+        return True
+
+    async def async_stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _async_run(self, days: int) -> None:
+        # the instruments to backfill come from the holdings, which the first refresh may not have fetched yet
+        if self._coordinator.data is None:
+            _LOGGER.warning("[backfill] No holdings fetched from Nordnet API yet, try again once the sensors have data")
+            return
+
+        try:
+            await self._async_backfill(days)
+
+        except Exception:
+            # nothing awaits the background task, so errors would otherwise go unnoticed
+            _LOGGER.exception("[backfill] Backfill of prices failed")
+
+    async def _async_backfill(self, days: int) -> None:
+        cursors = await self._store.async_load() or {}
+
+        # only import days that are over, today is still being recorded by the sensors
+        today = dt.now().date()
+        oldest = today - timedelta(days=days)
+
+        instruments = {position.instrument_id: position for position in self._coordinator.holdings()}
+        _LOGGER.info(f"[backfill] Backfilling up to {days} days of prices for {len(instruments)} instruments")
+
+        for instrument_id, position in instruments.items():
+            statistic_id = f"{DOMAIN}:instrument_{instrument_id}"
+
+            metadata = StatisticMetaData(
+                has_mean=True,
+                has_sum=False,
+                name=f"{position.name} ({position.symbol}) price",
+                source=DOMAIN,
+                statistic_id=statistic_id,
+                unit_of_measurement=position.position_currency.upper(),
+            )
+
+            last = cursors.get(statistic_id)
+            start = max(oldest, date.fromisoformat(last) + timedelta(days=1)) if last else oldest
+            imported = 0
+
+            while start < today:
+                end = min(start + timedelta(days=BACKFILL_BATCH_DAYS), today)
+
+                try:
+                    prices = await self._coordinator.async_get_price_history(instrument_id, start, end - timedelta(days=1))
+
+                except (aiohttp.ClientError, asyncio.TimeoutError) as ex:
+                    # the next run resumes from the last imported batch
+                    _LOGGER.warning(f"[backfill] Fetching price history of {position.symbol} failed, stopping backfill: {ex!r}")
+                    return
+
+                statistics = [self._statistic(price) for price in prices if price.get("last") is not None]
+                if statistics:
+                    async_add_external_statistics(self._hass, metadata, statistics)
+                    imported += len(statistics)
+
+                cursors[statistic_id] = (end - timedelta(days=1)).isoformat()
+                await self._store.async_save(cursors)
+
+                start = end
+
+                # give the recorder time to write the batch
+                await asyncio.sleep(BACKFILL_BATCH_DELAY)
+
+            _LOGGER.debug(f"[backfill] Imported {imported} daily prices of {position.symbol} as '{statistic_id}'")
+
+        _LOGGER.info("[backfill] Backfill of prices completed")
+
+    @staticmethod
+    def _statistic(price: dict) -> StatisticData:
+        """
+        Convert a daily price from Nordnet API into a statistic, starting at the top of the hour as HA requires
+        """
+
+        start = dt.utc_from_timestamp(price["time"] / 1000).replace(minute=0, second=0, microsecond=0)
+
+        return StatisticData(
+            start=start,
+            mean=price["last"],
+            min=price.get("low", price["last"]),
+            max=price.get("high", price["last"]),
+        )
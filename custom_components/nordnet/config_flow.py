@@ -13,10 +13,13 @@ from homeassistant.core import HomeAssistant, callback
 from homeassistant.data_entry_flow import FlowResult
 from homeassistant.helpers import selector
 
-from .const import (DEFAULT_ACCOUNT_ID,
+from .const import (ATTRIBUTE_PROFILES, DEFAULT_ACCOUNT_IDS,
+                    DEFAULT_ATTRIBUTE_PROFILE, DEFAULT_BASE_URL,
+                    DEFAULT_MAX_STALENESS, DEFAULT_MAX_UPDATE_INTERVAL,
+                    DEFAULT_PRICE_FEED, DEFAULT_PRICE_UPDATE_INTERVAL,
                     DEFAULT_TRADING_START_TIME, DEFAULT_TRADING_STOP_TIME,
                     DEFAULT_UPDATE_INTERVAL, DOMAIN, PLATFORM)
-from .coordinator import Coordinator
+from .coordinator import Coordinator, parse_account_ids
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -25,10 +28,19 @@ DATA_SCHEMA = vol.Schema(
     {
         vol.Required("username"): selector.TextSelector(),
         vol.Required("password"): selector.TextSelector({'type': 'password'}),
-        vol.Required("account_id", default=DEFAULT_ACCOUNT_ID): selector.NumberSelector({'mode': 'box', 'step': 1}),
+        vol.Required("account_ids", default=DEFAULT_ACCOUNT_IDS): selector.TextSelector(),
         vol.Required("trading_start_time", default=DEFAULT_TRADING_START_TIME): selector.TimeSelector(),
         vol.Required("trading_stop_time", default=DEFAULT_TRADING_STOP_TIME): selector.TimeSelector(),
         vol.Required("update_interval", default=DEFAULT_UPDATE_INTERVAL): selector.DurationSelector(),
+        vol.Required("max_update_interval", default=DEFAULT_MAX_UPDATE_INTERVAL): selector.DurationSelector(),
+        vol.Required("price_update_interval", default=DEFAULT_PRICE_UPDATE_INTERVAL): selector.DurationSelector(),
+        vol.Required("max_staleness", default=DEFAULT_MAX_STALENESS): selector.DurationSelector(),
+        vol.Required("base_url", default=DEFAULT_BASE_URL): selector.TextSelector({'type': 'url'}),
+        vol.Required("price_feed", default=DEFAULT_PRICE_FEED): selector.BooleanSelector(),
+        vol.Optional("price_feed_url"): selector.TextSelector(),
+        vol.Required("attribute_profile", default=DEFAULT_ATTRIBUTE_PROFILE): selector.SelectSelector({'options': ATTRIBUTE_PROFILES}),
+        vol.Optional("reporting_currency"): selector.TextSelector(),
+        vol.Optional("benchmark_instrument_id"): selector.TextSelector(),
     }
 )
 
@@ -37,9 +49,25 @@ async def get_account_details(hass: HomeAssistant, user_input: dict) -> tuple[di
     """
     Validate connection and credentials to Nordnet API when creating or
     updating a configuration entry
+
+    Returns the details of each account keyed by account id
     """
     try:
-        c = Coordinator(hass, Coordinator.map_config(user_input))
+        parse_account_ids(user_input["account_ids"])
+    except ValueError:
+        return None, {'account_ids': 'invalid_account_ids'}
+
+    reporting_currency = (user_input.get("reporting_currency") or "").strip()
+    if reporting_currency and not (len(reporting_currency) == 3 and reporting_currency.isalpha()):
+        return None, {'reporting_currency': 'invalid_reporting_currency'}
+
+    benchmark_instrument_id = str(user_input.get("benchmark_instrument_id") or "").strip()
+    if benchmark_instrument_id and not benchmark_instrument_id.isdigit():
+        return None, {'benchmark_instrument_id': 'invalid_benchmark_instrument_id'}
+
+    c = Coordinator(hass, Coordinator.map_config(user_input))
+
+    try:
         return await c.get_account_details(), None
 
     except aiohttp.ClientConnectionError as ex:
@@ -57,6 +85,16 @@ async def get_account_details(hass: HomeAssistant, user_input: dict) -> tuple[di
         _LOGGER.error(f'Generic Exception: {str(ex)}')
         return None, {'username': 'unknown'}
 
+    finally:
+        await c.async_close()
+
+
+def account_currencies(account_info: dict) -> dict:
+    """
+    The currency of each account, keyed by account id as a string since options are stored as JSON
+    """
+    return {str(account_id): info['account_currency'].lower() for account_id, info in account_info.items()}
+
 
 def enrich_schema(user_input: dict) -> vol.Schema:
     if user_input is None:
@@ -81,7 +119,7 @@ def enrich_schema(user_input: dict) -> vol.Schema:
 
 
 class NordnetConfigFlow(ConfigFlow, domain=DOMAIN):
-    VERSION = 4
+    VERSION = 6
 
     CONNECTION_CLASS = CONN_CLASS_CLOUD_POLL
 
@@ -97,7 +135,7 @@ class NordnetConfigFlow(ConfigFlow, domain=DOMAIN):
         if user_input is not None:
             account_info, errors = await get_account_details(self.hass, user_input)
             if not errors:
-                user_input['account_currency'] = account_info['account_currency'].lower()
+                user_input['account_currencies'] = account_currencies(account_info)
                 return self.async_create_entry(title=user_input['username'], data={}, options=user_input)
 
         return self.async_show_form(step_id="user", data_schema=enrich_schema(user_input), errors=errors)
@@ -114,7 +152,7 @@ class NordnetOptionsFlowHandler(OptionsFlow):
         if user_input is not None:
             account_info, errors = await get_account_details(self.hass, user_input)
             if not errors:
-                user_input['account_currency'] = account_info['account_currency'].lower()
+                user_input['account_currencies'] = account_currencies(account_info)
                 return self.async_create_entry(title=user_input['username'], data=user_input)
 
         schema = enrich_schema(user_input or self.config_entry.options)
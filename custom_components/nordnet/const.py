@@ -1,24 +1,68 @@
 """Constants for the Nordnet integration."""
 
+from datetime import timedelta
+
 DOMAIN = "nordnet"
 PLATFORM = "sensor"
 
+SERVICE_BACKFILL_STATISTICS = "backfill_statistics"
+SERVICE_PROFILE_REFRESH = "profile_refresh"
+
+EVENT_TRANSACTION = "nordnet_transaction"
+EVENT_ORDER = "nordnet_order"
+
 ########################
 # config flow
 ########################
 
-DEFAULT_ACCOUNT_ID = 1
+DEFAULT_ACCOUNT_IDS = "1"
 
 # Covers most of the European and American markets
 DEFAULT_TRADING_START_TIME = "09:00:00"
 DEFAULT_TRADING_STOP_TIME = "23:00:00"
 
+# Base URL of the Nordnet website and API, e.g. nordnet.se for Swedish customers
+DEFAULT_BASE_URL = "https://www.nordnet.dk"
+
 DEFAULT_UPDATE_INTERVAL = {
     "hours": 0,
     "minutes": 1,
     "seconds": 0
 }
 
+# Slowest the positions are refreshed while holdings barely change, equal to 'update_interval' disables adapting it
+DEFAULT_MAX_UPDATE_INTERVAL = {
+    "hours": 0,
+    "minutes": 5,
+    "seconds": 0
+}
+
+# Poll only the prices of held instruments between the full positions polls, zero disables it
+DEFAULT_PRICE_UPDATE_INTERVAL = {
+    "hours": 0,
+    "minutes": 0,
+    "seconds": 15
+}
+
+# How long entities keep showing the last good data while refreshes fail, before they become unavailable
+DEFAULT_MAX_STALENESS = {
+    "hours": 0,
+    "minutes": 30,
+    "seconds": 0
+}
+
+# Which attributes stock sensors have, see ATTRIBUTE_PROFILES
+DEFAULT_ATTRIBUTE_PROFILE = "full"
+
+# Stream live prices between polls, off by default since it keeps a connection open
+DEFAULT_PRICE_FEED = False
+
+# Currency (e.g. EUR) all holdings and accounts are also converted into, empty disables it
+DEFAULT_REPORTING_CURRENCY = ""
+
+# Nordnet instrument id (e.g. of an index fund) the beta of accounts is computed against, empty disables it
+DEFAULT_BENCHMARK_INSTRUMENT_ID = ""
+
 ########################
 # Coordinator
 ########################
@@ -36,3 +80,254 @@ The number of seconds requesting data from Nordnet API can take
 before the request is canceled
 """
 UPDATE_TIMEOUT = 10  # seconds
+
+"""
+Listener context of the portfolio entities, notified when any position changed
+"""
+PORTFOLIO_CONTEXT = "portfolio"
+
+"""
+Incremental updates of the account totals before they are summed again from scratch,
+so rounding errors of adding and subtracting market values don't accumulate
+"""
+PORTFOLIO_RECOMPUTE_UPDATES = 1000
+
+"""
+Upper bound on how long to sleep while all markets are closed, so changes to holdings
+made outside trading hours are still picked up eventually
+"""
+MAX_CLOSED_INTERVAL = timedelta(hours=6)
+
+"""
+Version of the cached holdings in HA storage, and how long (seconds) to coalesce
+writes of the cache so it isn't rewritten on every single refresh
+"""
+HOLDINGS_STORAGE_VERSION = 1
+HOLDINGS_SAVE_DELAY = 60
+
+"""
+Number of recent refreshes the timing percentiles are computed over
+"""
+METRICS_WINDOW = 500
+
+"""
+Attribute profiles of the stock sensors
+
+* full: every value of the position, including the nested instrument metadata
+* compact: flat instrument ids instead of the nested instrument, and values changing with the
+  price split out into a market price sensor per position, so the recorded attributes of the
+  stock sensor only change when e.g. the quantity does, and are stored only once
+* numeric: like compact, but only numeric values, e.g. for exporting metrics
+"""
+ATTRIBUTE_PROFILE_FULL = "full"
+ATTRIBUTE_PROFILE_COMPACT = "compact"
+ATTRIBUTE_PROFILE_NUMERIC = "numeric"
+ATTRIBUTE_PROFILES = [ATTRIBUTE_PROFILE_FULL, ATTRIBUTE_PROFILE_COMPACT, ATTRIBUTE_PROFILE_NUMERIC]
+
+"""
+Number of largest positions the 'top_weight' concentration metric of an account is computed over
+"""
+ANALYTICS_TOP_POSITIONS = 5
+
+"""
+Number of recent price samples per instrument the intraday window average and volatility are computed over
+"""
+INTRADAY_WINDOW = 60
+
+########################
+# Throttling
+########################
+
+"""
+Requests per second (and burst size) allowed towards Nordnet API, shared by all config entries
+"""
+RATE_LIMIT_PER_SECOND = 2
+RATE_LIMIT_BURST = 5
+RATE_LIMITER_KEY = f"{DOMAIN}_rate_limiter"
+
+"""
+Attempts per refresh on transient errors (429, 5xx and timeouts), and the
+base and max delay (seconds) of the exponential backoff between attempts
+"""
+RETRY_ATTEMPTS = 3
+RETRY_BACKOFF_BASE = 1
+RETRY_BACKOFF_MAX = 30
+
+"""
+Consecutive failed refreshes before requests to Nordnet API are stopped, and how
+long to wait before probing if Nordnet is back
+"""
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_TIMEOUT = timedelta(minutes=5)
+CIRCUIT_BREAKER_KEY = f"{DOMAIN}_circuit_breaker"
+
+########################
+# Adaptive polling
+########################
+
+"""
+Number of recent refreshes the change rate (fraction of positions changed per refresh) is averaged over
+"""
+ADAPTIVE_WINDOW = 5
+
+"""
+Change rates above which the positions interval is halved, and below which it backs off
+"""
+ADAPTIVE_ACTIVE_RATE = 0.2
+ADAPTIVE_QUIET_RATE = 0.02
+
+"""
+Factor the positions interval grows by per quiet refresh
+"""
+ADAPTIVE_BACKOFF = 1.5
+
+########################
+# Session
+########################
+
+"""
+Renew the login session this long before it expires
+"""
+SESSION_RENEW_AHEAD = timedelta(minutes=5)
+
+"""
+Max number of connections to keep open to Nordnet, and how long (seconds) idle
+connections are kept alive for reuse between refreshes
+"""
+CONNECTION_POOL_LIMIT = 4
+CONNECTION_KEEPALIVE_TIMEOUT = 120
+
+"""
+Version of the persisted session cookies in HA storage
+"""
+SESSION_STORAGE_VERSION = 1
+
+########################
+# Transactions and orders
+########################
+
+"""
+Listener context of the entities showing orders, notified after each sync of transactions and orders
+"""
+ACTIVITY_CONTEXT = "activity"
+
+"""
+Minimum time between syncs of transactions and orders, they piggyback on the positions refreshes
+"""
+ACTIVITY_SYNC_INTERVAL = timedelta(minutes=5)
+
+"""
+Version of the transactions cursor in HA storage
+"""
+ACTIVITY_STORAGE_VERSION = 1
+
+"""
+Order states of orders that are no longer open
+"""
+ORDER_CLOSED_STATES = frozenset({"DELETED", "FILLED", "EXPIRED"})
+
+########################
+# Statistics backfill
+########################
+
+"""
+Default number of days of history to backfill
+"""
+DEFAULT_BACKFILL_DAYS = 365
+
+"""
+Days of history fetched and imported per request, and seconds to pause between
+batches so the recorder isn't flooded
+"""
+BACKFILL_BATCH_DAYS = 365
+BACKFILL_BATCH_DELAY = 1
+
+"""
+Version of the backfill progress in HA storage
+"""
+BACKFILL_STORAGE_VERSION = 1
+
+########################
+# Price history
+########################
+
+"""
+Calendar days of daily closing prices the volatility and beta of accounts are computed over
+"""
+HISTORY_DAYS = 90
+
+"""
+Trading days per year, to annualise the volatility of daily returns
+"""
+HISTORY_TRADING_DAYS_PER_YEAR = 252
+
+"""
+Minimum number of daily returns before volatility and beta are computed
+"""
+HISTORY_MIN_RETURNS = 10
+
+"""
+How long to wait before fetching the price history again after a failure
+"""
+HISTORY_RETRY_DELAY = timedelta(minutes=15)
+
+########################
+# Exchange rates
+########################
+
+"""
+Daily euro foreign exchange reference rates of the ECB, all currencies in a single request
+"""
+FX_RATES_URL = "https://www.ecb.europa.eu/stats/eurofxref/eurofxref-daily.xml"
+FX_RATES_KEY = f"{DOMAIN}_fx_rates"
+
+"""
+How long exchange rates are cached, and how long before they expire they are refreshed
+in the background, so refreshes don't wait for them
+"""
+FX_TTL = timedelta(hours=1)
+FX_REFRESH_AHEAD = timedelta(minutes=10)
+
+"""
+Seconds to wait for the exchange rates, and how long to wait before trying again after a failure
+"""
+FX_TIMEOUT = 10
+FX_RETRY_DELAY = timedelta(minutes=5)
+
+########################
+# Profiling
+########################
+
+"""
+Default number of refreshes to profile, and the number of functions and allocations in the report
+"""
+DEFAULT_PROFILE_REFRESHES = 3
+PROFILE_TOP_FUNCTIONS = 50
+PROFILE_TOP_ALLOCATIONS = 30
+
+"""
+Longest time a profile keeps running, the report is written with the refreshes profiled so far
+"""
+PROFILE_TIMEOUT = timedelta(minutes=30)
+
+"""
+Number of profilers tracing memory allocations, shared by all config entries
+"""
+PROFILE_TRACING_KEY = f"{DOMAIN}_profile_tracing"
+
+########################
+# Price feed
+########################
+
+"""
+Seconds to wait for the price feed to connect, and for any message (including heartbeats)
+before the connection is considered dead and reconnected
+"""
+FEED_CONNECT_TIMEOUT = 10
+FEED_READ_TIMEOUT = 30
+
+"""
+Seconds to collect price ticks before applying them, so a burst of ticks
+results in a single snapshot and a single state write per entity
+"""
+FEED_FLUSH_DELAY = 1
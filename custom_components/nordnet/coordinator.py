@@ -3,19 +3,48 @@ The coordinatator is repsonsible for talking to Nordnet API and signal entities
 to update their state and attributes
 """
 
+import asyncio
+import hashlib
 import logging
-import random
-from datetime import datetime, time, timedelta
+from contextlib import nullcontext
+from datetime import date, datetime, time, timedelta
+from itertools import chain
 from typing import TypedDict
 
 import aiohttp
 import async_timeout
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.aiohttp_client import async_create_clientsession
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.update_coordinator import (DataUpdateCoordinator,
+                                                      UpdateFailed)
 from homeassistant.util import dt
-
-from .const import DEFAULT_HEADERS, UPDATE_TIMEOUT
+from homeassistant.util.json import json_loads
+
+from .activity import ActivitySync
+from .adaptive import AdaptiveInterval
+from .analytics import PortfolioAnalytics
+from .backfill import StatisticsBackfill
+from .const import (ACTIVITY_CONTEXT, DEFAULT_ATTRIBUTE_PROFILE, DEFAULT_BASE_URL,
+                    DEFAULT_BENCHMARK_INSTRUMENT_ID, DEFAULT_HEADERS, DEFAULT_MAX_STALENESS,
+                    DEFAULT_MAX_UPDATE_INTERVAL, DEFAULT_PRICE_FEED,
+                    DEFAULT_PRICE_UPDATE_INTERVAL, DEFAULT_REPORTING_CURRENCY,
+                    DOMAIN, HOLDINGS_SAVE_DELAY, HOLDINGS_STORAGE_VERSION,
+                    MAX_CLOSED_INTERVAL, PORTFOLIO_CONTEXT, PROFILE_TIMEOUT,
+                    RETRY_ATTEMPTS, UPDATE_TIMEOUT)
+from .feed import PriceFeed
+from .fx import FxRates, ReportingValues, get_fx_rates
+from .history import PriceHistory
+from .intraday import IntradayStats
+from .market_calendar import TradingCalendar
+from .metrics import RefreshMetrics
+from .portfolio import PortfolioTotals
+from .position import Position
+from .profiler import RefreshProfiler
+from .session import NordnetSession
+from .snapshot import HoldingsSnapshot
+from .throttle import (BREAKER_HALF_OPEN, backoff_delay, get_circuit_breaker,
+                       get_rate_limiter, is_transient)
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -26,32 +55,122 @@ class CoordinatorConfig(TypedDict):
     """
     username: str
     password: str
-    account_id: int
-    account_currency: str
+    base_url: str
+    account_ids: list[int]
+    account_currencies: dict[int, str]
     trading_start_time: time
     trading_stop_time: time
     session_lifetime: timedelta
     update_interval: timedelta
+    max_update_interval: timedelta
+    price_update_interval: timedelta
+    price_feed: bool
+    price_feed_url: str
+    attribute_profile: str
+    max_staleness: timedelta
+    reporting_currency: str
+    benchmark_instrument_id: int
 
 
 class Coordinator(DataUpdateCoordinator):
     """
     The coordinator is responsible for fetching data from the Nordnet API
     and make it available to the entities that gets created from each holding
-    in tthe configured Nordnet account
+    in tthe configured Nordnet accounts
+
+    All accounts share a single login session, and are fetched concurrently
     """
 
-    def __init__(self, hass: HomeAssistant, config: CoordinatorConfig):
+    def __init__(self, hass: HomeAssistant, config: CoordinatorConfig, entry_id: str = None):
         _LOGGER.debug("Creating Nordnet holdings coordinator")
 
         super().__init__(hass, _LOGGER, name="nordnet", update_interval=config["update_interval"])
 
         self.config: CoordinatorConfig = config
+        self.calendar: TradingCalendar = TradingCalendar(config["trading_start_time"], config["trading_stop_time"])
 
         self._hass: HomeAssistant = hass
-        self._holdings: dict = None
-        self._session: aiohttp.ClientSession = None
-        self._session_created_at: datetime = None
+
+        # per stage timings and counters, see diagnostics.py
+        self.metrics: RefreshMetrics = RefreshMetrics()
+
+        # set by the 'profile_refresh' service, and removed again once the report is written
+        self._profiler: RefreshProfiler = None
+        self._unsub_profiling_timeout = None
+        self._entry_id: str = entry_id
+
+        # shared by all coordinators, so entries don't hit Nordnet in lockstep or while it's down
+        self._limiter = get_rate_limiter(hass)
+        self._breaker = get_circuit_breaker(hass)
+
+        # when the next refresh is scheduled, so the session is only renewed when a refresh needs it
+        self._next_refresh_at: datetime = None
+
+        # the login session is only persisted for config entries, not during config flow validation
+        store_key = f"{DOMAIN}.{entry_id}.session" if entry_id else None
+        self._session = NordnetSession(hass, config["base_url"], config["username"], config["password"], config["session_lifetime"],
+                                       self.metrics, store_key, self.next_refresh_at)
+
+        # imports price history into long-term statistics, see the 'backfill_statistics' service
+        self.backfill: StatisticsBackfill = StatisticsBackfill(hass, self, entry_id) if entry_id else None
+
+        # new transactions and changed orders, synced after positions refreshes
+        self.activity: ActivitySync = ActivitySync(hass, self, entry_id) if entry_id else None
+
+        # last good holdings, used to create entities on startup before the first fetch
+        self._holdings_store: Store = Store(hass, HOLDINGS_STORAGE_VERSION, f"{DOMAIN}.{entry_id}.holdings", private=True) if entry_id else None
+
+        # position keys changed by the latest refresh, None means notify every listener
+        self._changed_keys: frozenset = None
+        self._last_dispatch_success: bool = False
+
+        # positions interval between 'update_interval' and 'max_update_interval', following how
+        # much changed since the previous positions refresh, including prices applied in between
+        self._adaptive: AdaptiveInterval = AdaptiveInterval(config["update_interval"], config["max_update_interval"])
+        self._price_changed_keys: set = set()
+
+        # aggregates per account, updated from the positions changed by each refresh
+        self._portfolios: dict = {}
+
+        # intraday price statistics per instrument id, sampled whenever the price changed
+        self._intraday: dict = {}
+
+        # allocation, concentration, volatility and beta per account, computed once per snapshot
+        self._analytics: PortfolioAnalytics = PortfolioAnalytics()
+
+        # daily closes of the held instruments, which volatility and beta are computed from
+        self.history: PriceHistory = PriceHistory(hass, self) if entry_id else None
+
+        # holdings converted into the reporting currency, once per snapshot or change of exchange rates
+        self._fx: FxRates = get_fx_rates(hass) if config["reporting_currency"] else None
+        self._fx_rates: dict = None
+        self._reporting: ReportingValues = None
+
+        # account currencies are refreshed from Nordnet API on the first fetch
+        self._account_currencies: dict = dict(config["account_currencies"])
+        self._account_info_fetched: bool = False
+
+        # the live positions of each account, reused for accounts whose payload didn't change
+        self._account_positions: dict = {}
+
+        # fingerprint of the last positions payload per account, to skip decoding unchanged responses
+        self._positions_etag: dict = {}
+        self._positions_fingerprint: dict = {}
+        self._positions_size: dict = {}
+        self._payload_stats: dict = {"hits": 0, "misses": 0, "bytes_skipped": 0}
+
+        # time of the last successful request to Nordnet API, even if nothing changed
+        self._last_fetched_at: datetime = None
+
+        # live prices between polls, started after the first successful fetch
+        self._feed: PriceFeed = None
+        self._configure_feed()
+
+        # the fast price polls between the full positions polls
+        self._unsub_price_poll = None
+
+        # while refreshes fail, notifies the entities once the data gets older than max_staleness
+        self._unsub_staleness = None
 
     def update_config(self, config: dict) -> None:
         """
@@ -63,53 +182,497 @@ class Coordinator(DataUpdateCoordinator):
 
         # update internal configuration
         self.config = Coordinator.map_config(config)
+        self.calendar = TradingCalendar(self.config["trading_start_time"], self.config["trading_stop_time"])
+
+        # the configured accounts may have changed, so fetch everything from scratch
+        self._account_currencies = dict(self.config["account_currencies"])
+        self._account_info_fetched = False
+        self._account_positions = {}
+        self._portfolios = {account_id: totals for account_id, totals in self._portfolios.items() if account_id in self.config["account_ids"]}
+        self._analytics = PortfolioAnalytics()
+        if self.history is not None:
+            self._analytics.update_history(self.history.closes, self.config["benchmark_instrument_id"])
+
+        self._adaptive = AdaptiveInterval(self.config["update_interval"], self.config["max_update_interval"])
+        self._price_changed_keys = set()
+        self._positions_etag = {}
+        self._positions_fingerprint = {}
+        self._positions_size = {}
 
         # force creation of a new HTTP session
-        self._session = None
+        self._session.update_credentials(self.config["base_url"], self.config["username"], self.config["password"], self.config["session_lifetime"])
+
+        # the feed and price polls are restarted on next fetch, with the new session
+        if self._feed is not None:
+            self._hass.async_create_task(self._feed.async_stop())
+
+        self._configure_feed()
+        self._cancel_price_poll()
 
         # property in parent DataUpdateCoordinator
-        self.update_interval = self.config["update_interval"]
+        self.update_interval = self._adaptive.interval
+
+    async def async_close(self) -> None:
+        """
+        Stop background work and release HTTP connections, called when the config entry is unloaded
+        """
+
+        if self._feed is not None:
+            await self._feed.async_stop()
+
+        self._cancel_price_poll()
+        self._cancel_staleness_check()
+        self._stop_profiling(write_report=False)
+
+        if self.backfill is not None:
+            await self.backfill.async_stop()
+
+        if self.activity is not None:
+            await self.activity.async_stop()
+
+        if self.history is not None:
+            await self.history.async_stop()
+
+        await self._session.async_close()
+
+    def connection_stats(self) -> dict:
+        """
+        Open HTTP connections towards Nordnet API
+        """
+
+        return self._session.connection_stats()
+
+    def diagnostics(self) -> dict:
+        """
+        Internal state and refresh metrics, used by diagnostics.py
+        """
+
+        return {
+            "positions": len(self.data) if self.data is not None else None,
+            "stale": self.data.stale if self.data is not None else None,
+            "markets": sorted(self.data.mics) if self.data is not None else [],
+            "last_fetched_at": self._last_fetched_at.isoformat() if self._last_fetched_at else None,
+            "update_interval": str(self.update_interval),
+            "adaptive_interval": self._adaptive.as_dict(),
+            "last_update_success": self.last_update_success,
+            "last_error": str(self.last_exception) if self.last_exception is not None else None,
+            "data_age": str(self.data_age()),
+            "circuit_breaker": self.circuit_breaker_state(),
+            "price_feed": self.feed_state(),
+            "fx_rates": self._fx.as_dict() if self._fx is not None else None,
+            "price_history": self.history.as_dict() if self.history is not None else None,
+            "unconverted_currencies": sorted(self._reporting.unconverted) if self._reporting is not None else [],
+            "metrics": self.metrics.as_dict(),
+            "payload": self.payload_stats(),
+            "connections": self.connection_stats(),
+        }
+
+    def _configure_feed(self) -> None:
+        self._feed = None
+
+        if self.config["price_feed"]:
+            self._feed = PriceFeed(self._hass, self._session, self._apply_prices, self.config["price_feed_url"])
+
+    def feed_state(self) -> str:
+        if self._feed is None:
+            return "disabled"
+
+        if self._feed.unavailable:
+            return "unavailable"
+
+        return "connected" if self._feed.connected else "disconnected"
+
+    def data_age(self) -> timedelta:
+        """
+        Time since the holdings were last fetched from Nordnet API, or loaded from the cache
+        """
+
+        fetched_at = self._last_fetched_at or (self.data.fetched_at if self.data is not None else None)
+        if fetched_at is None:
+            return None
 
-    def account_currency(self)->str:
-        return self.config['account_currency']
+        return dt.now() - fetched_at
+
+    def is_data_usable(self) -> bool:
+        """
+        Entities keep serving the last good holdings while refreshes fail, until they are older than max_staleness
+        """
 
-    def holdings(self) -> dict:
+        if self.data is None:
+            return False
+
+        if self.last_update_success:
+            return True
+
+        age = self.data_age()
+        return age is not None and age <= self.config["max_staleness"]
+
+    async def _async_refresh(self, *args, **kwargs) -> None:
+        """
+        Overriding parent func, which only notifies entities on the first of several failed
+        refreshes in a row. Entities are notified on every failed refresh instead, so the age
+        of the data keeps updating, and once more when it gets older than max_staleness, in
+        case no refresh happens until then (e.g. all markets closed)
+        """
+
+        was_failing = not self.last_update_success
+
+        await super()._async_refresh(*args, **kwargs)
+
+        if self.last_update_success:
+            self._cancel_staleness_check()
+            return
+
+        if was_failing:
+            self.async_update_listeners()
+
+        self._schedule_staleness_check()
+
+    @callback
+    def _schedule_staleness_check(self) -> None:
+        if self._unsub_staleness is not None:
+            return
+
+        age = self.data_age()
+        if age is None or age > self.config["max_staleness"]:
+            return
+
+        # a second late, so the data is past max_staleness when entities check it
+        delay = (self.config["max_staleness"] - age).total_seconds() + 1
+        self._unsub_staleness = async_call_later(self._hass, delay, self._async_staleness_expired)
+
+    @callback
+    def _cancel_staleness_check(self) -> None:
+        if self._unsub_staleness is not None:
+            self._unsub_staleness()
+            self._unsub_staleness = None
+
+    @callback
+    def _async_staleness_expired(self, _now: datetime) -> None:
+        self._unsub_staleness = None
+
+        if not self.last_update_success:
+            _LOGGER.warning(f"Holdings are older than {self.config['max_staleness']}, entities are unavailable until a refresh succeeds")
+            self.async_update_listeners()
+
+    def staleness_attributes(self) -> dict:
+        """
+        Age of the data and the error of the last refresh while refreshes fail, empty otherwise so
+        the attributes don't change (and get recorded) on every refresh
+        """
+
+        if self.last_update_success:
+            return {}
+
+        age = self.data_age()
+
+        return {
+            "data_age": round(age.total_seconds()) if age is not None else None,
+            "last_error": str(self.last_exception) if self.last_exception is not None else None,
+        }
+
+    def account_ids(self) -> list:
+        return self.config['account_ids']
+
+    def account_currency(self, account_id: int)->str:
+        return self._account_currencies.get(account_id)
+
+    def payload_stats(self) -> dict:
+        """
+        Counters for positions payloads that was unchanged and skipped decoding
+        """
+
+        total = self._payload_stats["hits"] + self._payload_stats["misses"]
+
+        return {
+            **self._payload_stats,
+            "hit_rate": self._payload_stats["hits"] / total if total else 0.0,
+        }
+
+    async def async_load_cached_holdings(self) -> bool:
+        """
+        Load the holdings saved by the last successful fetch into a stale snapshot,
+        so entities can be created on startup without waiting for Nordnet API
+
+        Returns False if there is no cache to load
+        """
+
+        if self._holdings_store is None:
+            return False
+
+        data = await self._holdings_store.async_load()
+        if data is None:
+            _LOGGER.debug("No cached holdings found")
+            return False
+
+        positions = (
+            Position(raw, self.account_currency(raw['accid']), stale=True)
+            for raw in data["positions"]
+            if raw['accid'] in self.account_ids()
+        )
+
+        self.data = HoldingsSnapshot(positions, dt.parse_datetime(data["fetched_at"]), stale=True)
+        self._update_portfolios(None, self.data, None)
+        self._analytics.update(self.data)
+
+        _LOGGER.debug(f"Loaded {len(self.data)} cached holdings fetched at {self.data.fetched_at}")
+        return True
+
+    @callback
+    def _save_cached_holdings(self, snapshot: HoldingsSnapshot) -> None:
+        """
+        Save the positions in the Nordnet API format, so the cache doesn't depend on how positions are remapped
         """
-        Return the full raw holdings response from Nordnet
+
+        if self._holdings_store is None:
+            return
+
+        # converted lazily, only when the delayed write actually happens
+        self._holdings_store.async_delay_save(lambda: {
+            "fetched_at": snapshot.fetched_at.isoformat(),
+            "positions": [position.to_raw() for position in snapshot.positions],
+        }, HOLDINGS_SAVE_DELAY)
+
+    def portfolios(self) -> dict:
+        """
+        Return the aggregates of each account, keyed by account id
+        """
+
+        return self._portfolios
+
+    def portfolio(self, account_id: int) -> PortfolioTotals:
+        return self._portfolios.get(account_id)
+
+    @callback
+    def _update_portfolios(self, previous: HoldingsSnapshot, snapshot: HoldingsSnapshot, changed: frozenset) -> None:
+        """
+        Apply the changed positions to the account aggregates, or rebuild them
+        from scratch when there's no previous snapshot to diff against
+        """
+
+        # positions of accounts removed in the options are still in the previous (or cached)
+        # snapshot, and must not bring back the totals of those accounts when they're removed
+        account_ids = set(self.config["account_ids"])
+
+        if changed is None:
+            self._portfolios = {}
+            for position in snapshot.positions:
+                if position.account_id in account_ids:
+                    self._portfolio_for(position).apply(None, position)
+
+            return
+
+        # position keys include the account id, so old and new always belong to the same account
+        for key in changed:
+            old = previous.by_key.get(key)
+            new = snapshot.by_key.get(key)
+
+            if (new or old).account_id in account_ids:
+                self._portfolio_for(new or old).apply(old, new)
+
+    @callback
+    def _apply_prices(self, prices: dict) -> None:
+        """
+        Apply new market prices, keyed by instrument id, to the live positions and
+        notify only the entities whose position changed
+
+        Prices come from either the price feed or the fast price polls
+
+        Market values and ROI are recomputed locally, quantities and acquisition
+        prices are kept from the last positions fetch
+        """
+
+        # stale or failed snapshots are replaced by the next positions fetch
+        if self.data is None or self.data.stale or not self.last_update_success:
+            return
+
+        changed = set()
+
+        for account_id, positions in self._account_positions.items():
+            if not any(position.instrument_id in prices for position in positions):
+                continue
+
+            updated = []
+            for position in positions:
+                price = prices.get(position.instrument_id)
+
+                if price is not None and price != position.position_market_price:
+                    position = position.with_market_price(price)
+                    changed.add(position.key)
+
+                updated.append(position)
+
+            self._account_positions[account_id] = tuple(updated)
+
+        if not changed:
+            return
+
+        # counted towards the change rate of the next positions refresh
+        self._price_changed_keys.update(changed)
+
+        with self.metrics.timer("remap"):
+            snapshot = HoldingsSnapshot(chain.from_iterable(self._account_positions.get(account_id, ()) for account_id in self.account_ids()), self.data.fetched_at)
+
+            changed = frozenset(changed)
+            self._update_portfolios(self.data, snapshot, changed)
+            self._record_prices(snapshot, changed)
+
+        # before converting, which asks for every listener to be notified if the exchange rates changed
+        self._changed_keys = changed
+
+        with self.metrics.timer("analytics"):
+            self._analytics.update(snapshot)
+            self._update_reporting(snapshot)
+
+        _LOGGER.debug(f"Applied new prices to {len(changed)} of {len(snapshot)} positions")
+
+        # set directly, async_set_updated_data() would postpone the next positions fetch
+        self.data = snapshot
+        self.async_update_listeners()
+
+    def analytics(self, account_id: int) -> dict:
+        return self._analytics.results.get(account_id)
+
+    def reporting(self) -> ReportingValues:
+        """
+        Holdings in the reporting currency, None if it isn't configured or exchange rates are missing
+        """
+
+        return self._reporting
+
+    def _update_reporting(self, snapshot: HoldingsSnapshot) -> None:
+        """
+        Convert all positions into the reporting currency in a single pass, if the snapshot or the exchange rates changed
+        """
+
+        if self._fx_rates is None:
+            return
+
+        if self._reporting is not None and self._reporting.snapshot is snapshot and self._reporting.rates is self._fx_rates:
+            return
+
+        # new rates change the converted value of every position
+        if self._reporting is not None and self._reporting.rates is not self._fx_rates:
+            self._changed_keys = None
+
+        self._reporting = ReportingValues(snapshot, self._fx_rates, self.config["reporting_currency"])
+
+        if self._reporting.unconverted:
+            _LOGGER.debug(f"No exchange rates of {sorted(self._reporting.unconverted)}, positions in them are not converted")
+
+    def intraday(self, instrument_id: int) -> IntradayStats:
+        return self._intraday.get(instrument_id)
+
+    @callback
+    def _record_prices(self, snapshot: HoldingsSnapshot, changed: frozenset) -> None:
+        """
+        Add a price sample for the changed positions, or all positions when changed is None
+        """
+
+        today = dt.now().date()
+        positions = snapshot.positions if changed is None else (snapshot.by_key.get(key) for key in changed)
+        removed = changed is None
+
+        for position in positions:
+            if position is None:
+                removed = True
+                continue
+
+            stats = self._intraday.get(position.instrument_id)
+            if stats is None:
+                stats = self._intraday[position.instrument_id] = IntradayStats()
+
+            # e.g. quantity changes, or the same instrument held in several accounts
+            if stats.day == today and stats.last == position.position_market_price:
+                continue
+
+            stats.add(position.position_market_price, today)
+
+        # forget instruments that are no longer held
+        if removed:
+            held = {position.instrument_id for position in snapshot.positions}
+            for instrument_id in self._intraday.keys() - held:
+                del self._intraday[instrument_id]
+
+    def _portfolio_for(self, position: Position) -> PortfolioTotals:
+        portfolio = self._portfolios.get(position.account_id)
+
+        if portfolio is None:
+            portfolio = self._portfolios[position.account_id] = PortfolioTotals(position.account_id, position.account_currency)
+
+        return portfolio
+
+    def holdings(self) -> tuple:
+        """
+        Return all positions from the latest Nordnet response
 
         Used on startup to creator sensors for all holdings in the account
         """
 
-        return self._holdings
+        return self.data.positions
 
-    def holding_for_symbol(self, symbol) -> dict:
+    def holding_for_symbol(self, symbol) -> Position:
         """
         Find the position associated with a specific trading symbol.
+        """
+
+        return self.data.by_symbol.get(symbol)
+
+    def holding(self, key: tuple) -> Position:
+        """
+        Find the position associated with a position key (account id, instrument id).
         Used in sensor.py to check for new data
         """
 
-        for position in self._holdings:
-            if position['instrument']['symbol'] == symbol:
-                return position
+        return self.data.by_key.get(key)
+
+    async def get_account_details(self) -> dict:
+        """
+        Fetch the details of all configured accounts concurrently, keyed by account id
+        """
+
+        return await self._async_fetch_account_details(await self._session.async_get())
+
+    async def _async_fetch_account_details(self, session: aiohttp.ClientSession) -> dict:
+        details = await asyncio.gather(*(self._async_fetch_account_info(session, account_id) for account_id in self.account_ids()))
 
-        return None
+        return dict(zip(self.account_ids(), details))
+
+    async def _async_fetch_account_info(self, session: aiohttp.ClientSession, account_id: int) -> dict:
+        await self._limiter.acquire()
+
+        async with session.get(f"{self.config['base_url']}/api/2/accounts/{account_id}/info", headers=DEFAULT_HEADERS) as response:
+            response.raise_for_status()
+
+            data = await response.json()
+            return data[0]
+
+    async def _async_update_account_currencies(self, session: aiohttp.ClientSession) -> None:
+        """
+        Refresh the currency of each account, in case it changed since the entry was configured
+        """
 
-    async def get_account_details(self)->dict:
-        session = await self._authenticated_session()
-        response = await session.get(f"https://www.nordnet.dk/api/2/accounts/{self.config['account_id']}/info", headers=DEFAULT_HEADERS)
-        response.raise_for_status()
+        for account_id, info in (await self._async_fetch_account_details(session)).items():
+            self._account_currencies[account_id] = info['account_currency'].lower()
 
-        data = await response.json()
-        return data[0]
+        self._account_info_fetched = True
 
     async def _handle_refresh_interval(self, _now: datetime) -> None:
         """
         Overriding parent func to prevent any calls to _async_update_data outside trading windows
         as it will be a lot more spammy in logs, and will advertly always "succeed" outside trading windows
         making error tracking pretty hard
+
+        The interval until the next refresh is also decided here, so we sleep until
+        the first of our markets opens rather than polling a closed market
         """
 
+        self.update_interval = self._next_update_interval()
+
         if self._should_make_request() is False:
+            # start the next trading session at the fastest interval
+            self._adaptive.reset()
+
             self._debounced_refresh.async_cancel()
             self._schedule_refresh()
 
@@ -117,9 +680,250 @@ class Coordinator(DataUpdateCoordinator):
 
         return await super()._handle_refresh_interval(_now)
 
-    async def _async_update_data(self, is_retry: bool = False) -> None:
+    @callback
+    def _schedule_refresh(self) -> None:
+        """
+        Overriding parent func to remember when the next refresh happens
+        """
+
+        super()._schedule_refresh()
+
+        if self._unsub_refresh is not None and self.update_interval is not None:
+            self._next_refresh_at = dt.utcnow() + self.update_interval
+        else:
+            self._next_refresh_at = None
+
+    def next_refresh_at(self) -> datetime:
+        # the parent unschedules refreshes without telling, e.g. when the last entity is removed
+        if self._unsub_refresh is None:
+            return None
+
+        return self._next_refresh_at
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """
+        Overriding parent func to only notify entities whose position changed since the
+        previous snapshot, so unchanged positions don't write state on every refresh
+
+        Entities register their position key as listener context (see sensor.py), portfolio
+        entities are notified when any position changed, and listeners without a context
+        are always notified. After the first refresh or a failed refresh
+        every listener is notified so availability is kept in sync
+        """
+
+        changed = self._changed_keys
+        self._changed_keys = None
+
+        full_dispatch = changed is None or not self.last_update_success or not self._last_dispatch_success
+        self._last_dispatch_success = self.last_update_success
+
+        with self.metrics.timer("dispatch"):
+            if full_dispatch:
+                super().async_update_listeners()
+                return
+
+            for update_callback, context in list(self._listeners.values()):
+                if context is None or context in changed or (context == PORTFOLIO_CONTEXT and changed):
+                    update_callback()
+
+    @callback
+    def async_update_history(self) -> None:
+        """
+        Recompute volatility and beta from the price history, which is fetched separately from positions
+        """
+
+        self._analytics.update_history(self.history.closes, self.config["benchmark_instrument_id"])
+
+        if self.data is None:
+            return
+
+        self._analytics.update(self.data)
+
+        for update_callback, context in list(self._listeners.values()):
+            if context == PORTFOLIO_CONTEXT:
+                update_callback()
+
+    def _history_instrument_ids(self, snapshot: HoldingsSnapshot) -> set:
+        instrument_ids = {position.instrument_id for position in snapshot.positions}
+
+        if self.config["benchmark_instrument_id"] is not None:
+            instrument_ids.add(self.config["benchmark_instrument_id"])
+
+        return instrument_ids
+
+    @callback
+    def async_update_activity_listeners(self) -> None:
+        """
+        Notify the entities showing transactions and orders, which are synced separately from positions
+        """
+
+        for update_callback, context in list(self._listeners.values()):
+            if context == ACTIVITY_CONTEXT:
+                update_callback()
+
+    async def _async_update_data(self) -> HoldingsSnapshot:
         """
         Called by Home Assistant every config['update_interval'] in sensor.py to refresh data
+
+        The returned snapshot is stored in self.data by the parent DataUpdateCoordinator
+        """
+
+        self.metrics.increment("refreshes")
+
+        # a half open breaker lets this refresh through as the single probe
+        probe = self._breaker.state == BREAKER_HALF_OPEN
+
+        if not self._breaker.allow_request():
+            self.metrics.increment("failures")
+            raise UpdateFailed(f"Nordnet API seems to be down, not sending any requests (circuit breaker is {self._breaker.state})")
+
+        rates = self._fx_rates
+
+        try:
+            # cached, only the first refresh (or one after the rates expired) waits for a request
+            if self._fx is not None:
+                rates = await self._fx.async_get()
+
+            with self.metrics.timer("total"), self._profile_refresh():
+                snapshot = await self._async_fetch_holdings_with_backoff()
+
+        except Exception as ex:
+            self.metrics.increment("failures")
+
+            # only transient errors count towards Nordnet being down, not e.g. bad credentials
+            if is_transient(ex):
+                self._breaker.record_failure()
+            else:
+                self._breaker.record_success()
+
+            raise
+
+        except BaseException:
+            # cancelled, e.g. on unload. A probe that never finished must not keep the breaker from probing again
+            if probe:
+                self._breaker.release_probe()
+
+            raise
+
+        finally:
+            self._finish_profiling()
+
+        self._breaker.record_success()
+        self._adapt_update_interval(snapshot)
+
+        # only replaced together with converting the new snapshot, so prices applied while the
+        # positions were fetched don't convert with them first and dispatch only the changed prices
+        self._fx_rates = rates
+        self._update_reporting(snapshot)
+
+        if self._feed is not None:
+            self._feed.async_update_subscriptions(snapshot)
+
+        if self._unsub_price_poll is None:
+            self._schedule_price_poll()
+
+        if self.activity is not None:
+            self.activity.async_schedule_sync()
+
+        if self.history is not None:
+            self.history.async_schedule_fetch(self._history_instrument_ids(snapshot))
+
+        return snapshot
+
+    @callback
+    def async_start_profiling(self, refreshes: int) -> bool:
+        """
+        Profile the next refreshes, returns False if already profiling
+        """
+
+        if self._profiler is not None:
+            return False
+
+        _LOGGER.warning(f"Profiling the next {refreshes} refreshes of Nordnet entry {self._entry_id}")
+
+        self._profiler = RefreshProfiler(self._hass, self._entry_id, refreshes)
+
+        # allocations are traced until the report is written, so don't wait forever for refreshes
+        self._unsub_profiling_timeout = async_call_later(self._hass, PROFILE_TIMEOUT, self._async_profiling_timed_out)
+        return True
+
+    def _profile_refresh(self):
+        """
+        Context profiling the current refresh, if profiling was requested
+        """
+
+        if self._profiler is None:
+            return nullcontext()
+
+        return self._profiler.profile()
+
+    @callback
+    def _finish_profiling(self) -> None:
+        """
+        Write the report and turn profiling off again after the last profiled refresh
+        """
+
+        if self._profiler is None or not self._profiler.done:
+            return
+
+        self._stop_profiling(write_report=True)
+
+    @callback
+    def _async_profiling_timed_out(self, _now: datetime) -> None:
+        self._unsub_profiling_timeout = None
+
+        if self._profiler is None:
+            return
+
+        _LOGGER.warning(f"Profiling of Nordnet entry {self._entry_id} timed out after {PROFILE_TIMEOUT}, writing the report of the refreshes profiled so far")
+
+        # a refresh in progress finishes profiling itself once it's done
+        self._profiler.expire()
+        if not self._profiler.active:
+            self._stop_profiling(write_report=True)
+
+    @callback
+    def _stop_profiling(self, write_report: bool) -> None:
+        if self._unsub_profiling_timeout is not None:
+            self._unsub_profiling_timeout()
+            self._unsub_profiling_timeout = None
+
+        if self._profiler is None:
+            return
+
+        profiler, self._profiler = self._profiler, None
+
+        if write_report:
+            self._hass.async_create_task(profiler.async_write_report())
+        else:
+            profiler.discard()
+
+    def circuit_breaker_state(self) -> str:
+        return self._breaker.state
+
+    async def _async_fetch_holdings_with_backoff(self) -> HoldingsSnapshot:
+        """
+        Retry transient errors (429, 5xx and timeouts) with exponential backoff and jitter
+        """
+
+        for attempt in range(RETRY_ATTEMPTS):
+            try:
+                return await self._async_fetch_holdings()
+
+            except Exception as ex:
+                if not is_transient(ex) or attempt == RETRY_ATTEMPTS - 1:
+                    raise
+
+                delay = backoff_delay(attempt, ex)
+                _LOGGER.warning(f"Transient error from Nordnet API, retrying in {delay:.1f}s: {ex!r}")
+
+                self.metrics.increment("retries")
+                await asyncio.sleep(delay)
+
+    async def _async_fetch_holdings(self, is_retry: bool = False) -> HoldingsSnapshot:
+        """
+        Fetch the positions of all accounts and build a new snapshot from them
         """
 
         _LOGGER.debug("Refreshing data from Nordnet API")
@@ -127,143 +931,320 @@ class Coordinator(DataUpdateCoordinator):
         async with async_timeout.timeout(UPDATE_TIMEOUT):
             try:
                 _LOGGER.debug("Getting HTTP session")
-                session = await self._authenticated_session()
+                with self.metrics.timer("session"):
+                    session = await self._session.async_get()
 
-                _LOGGER.debug(f"Requesting stock positions from Nordnet API for account {self.config['account_id']}")
-                response = await session.get(f"https://www.nordnet.dk/api/2/accounts/{self.config['account_id']}/positions", headers=DEFAULT_HEADERS)
-                response.raise_for_status()
+                account_ids = self.account_ids()
+                _LOGGER.debug(f"Requesting stock positions from Nordnet API for accounts {account_ids}")
+
+                # fetch all accounts concurrently, along with the account details on the first fetch
+                validators = {}
+                requests = [self._async_fetch_positions(session, account_id, validators) for account_id in account_ids]
+                if not self._account_info_fetched:
+                    requests.append(self._async_update_account_currencies(session))
+
+                with self.metrics.timer("http"):
+                    bodies = dict(zip(account_ids, await asyncio.gather(*requests)))
+
+                self._last_fetched_at = dt.now()
+
+                if all(body is None for body in bodies.values()):
+                    # nothing changed, keep the current snapshot and don't wake any entities
+                    self._changed_keys = frozenset()
+                    _LOGGER.debug(f"Stock positions unchanged since last refresh (payload stats: {self.payload_stats()})")
+                    return self.data
+
+                # only decode and remap the accounts whose payload changed
+                self.metrics.payload_bytes.add(sum(len(body) for body in bodies.values() if body is not None))
+
+                with self.metrics.timer("decode"):
+                    decoded = {account_id: json_loads(body) for account_id, body in bodies.items() if body is not None}
+
+                with self.metrics.timer("remap"):
+                    for account_id, raw_positions in decoded.items():
+                        currency = self.account_currency(account_id)
+                        self._account_positions[account_id] = tuple(Position(raw, currency) for raw in raw_positions)
+
+                    snapshot = HoldingsSnapshot(chain.from_iterable(self._account_positions[account_id] for account_id in account_ids), self._last_fetched_at)
+
+                    # replacing a stale snapshot must notify every entity to clear their stale marker
+                    changed = None
+                    if self.data is not None and not self.data.stale:
+                        changed = snapshot.changed_keys(self.data)
+                        _LOGGER.debug(f"{len(changed)} of {len(snapshot)} positions changed since last refresh")
+
+                    self._changed_keys = changed
+                    self._update_portfolios(self.data, snapshot, changed)
+                    self._record_prices(snapshot, changed)
+
+                # only payloads that made it into a snapshot count as unchanged on the next fetch, so
+                # a payload failing to decode or remap keeps failing the refreshes instead of being skipped
+                for account_id, (etag, fingerprint, size) in validators.items():
+                    self._positions_etag[account_id] = etag
+                    self._positions_fingerprint[account_id] = fingerprint
+                    self._positions_size[account_id] = size
 
-                self._holdings = await response.json()
+                with self.metrics.timer("analytics"):
+                    self._analytics.update(snapshot)
+
+                if changed != frozenset():
+                    self._save_cached_holdings(snapshot)
 
                 if is_retry:
                     _LOGGER.info("Retry successful! Updated stock positions from Nordnet API")
-                    return
+                    return snapshot
 
-                _LOGGER.debug("Successfully updated stock positions from Nordnet API")
+                _LOGGER.debug(f"Successfully updated stock positions from Nordnet API (connections: {self.connection_stats()})")
+                return snapshot
 
             except aiohttp.ClientResponseError as ex:
                 """
                 If we see authentication error, reset the session so we can create a fresh session
                 and retry the update
                 """
-                if is_retry is False and (ex.status > 400 and ex.status < 500):
+                if is_retry is False and (ex.status > 400 and ex.status < 500) and ex.status != 429:
                     _LOGGER.warn(f"Authentication error, retrying with fresh login session: {ex}")
-                    self._session = None
-                    return await self._async_update_data(is_retry=True)
+                    self.metrics.increment("retries")
+                    self._session.invalidate()
+                    return await self._async_fetch_holdings(is_retry=True)
 
                 raise ex
 
 
-    def _should_make_request(self) -> bool:
+    async def _async_fetch_positions(self, session: aiohttp.ClientSession, account_id: int, validators: dict) -> bytes:
         """
-        Check if we should make a Nordnet API request for Stock holdings
-        If we're outside trading hours for example, there will be no changes to the underlying data
-        so we might as well not hit their API at all to not abuse their service
+        Fetch the raw positions payload of an account, returning None if it's unchanged since the last fetch
+
+        Unchanged payloads are detected by ETag (if Nordnet sends one) or by a fingerprint of
+        the body, so they never get decoded or remapped. The ETag, fingerprint and size of a
+        changed payload are added to `validators`, to be kept once the snapshot is built
         """
 
-        # If we never requested data from Nordnet, like after a restart, always fetch it
-        if self._holdings == None:
-            _LOGGER.debug("No local holdings found, will query Nordnet API")
-            return True
+        headers = dict(DEFAULT_HEADERS)
 
-        # inside trading hours, go forth and request Nordnet
-        if self._inside_trading_window():
-            _LOGGER.debug(f"Within trade window, will query Nordnet API")
-            return True
+        # positions loaded from the cache are stale, and must always be replaced by live ones
+        can_skip = account_id in self._account_positions
+        if can_skip and self._positions_etag.get(account_id) is not None:
+            headers["If-None-Match"] = self._positions_etag[account_id]
 
-        # outside trading hours, we will update once in a while to keep things... fresh
-        if self._outside_trading_window_probability():
-            _LOGGER.debug(
-                f"Not inside trading hours ({self.config['trading_start_time']} - {self.config['trading_stop_time']}), but will query Nordnet API anyway")
-            return True
+        await self._limiter.acquire()
 
-        # outside trading hours, no dice
-        _LOGGER.debug(
-            f"Not inside trading hours ({self.config['trading_start_time']} - {self.config['trading_stop_time']}), will not query Nordnet API")
-        return False
+        async with session.get(f"{self.config['base_url']}/api/2/accounts/{account_id}/positions", headers=headers) as response:
+            if can_skip and response.status == 304:
+                self._payload_hit(self._positions_size[account_id])
+                return None
+
+            response.raise_for_status()
+            body = await response.read()
+
+        fingerprint = hashlib.blake2b(body, digest_size=16).digest()
+        if can_skip and fingerprint == self._positions_fingerprint.get(account_id):
+            self._payload_hit(len(body))
+            return None
+
+        validators[account_id] = (response.headers.get("ETag"), fingerprint, len(body))
+        self._payload_stats["misses"] += 1
+
+        return body
+
+    @callback
+    def _schedule_price_poll(self) -> None:
+        interval = self.config["price_update_interval"]
+
+        if interval:
+            self._unsub_price_poll = async_call_later(self._hass, interval, self._async_poll_prices)
+
+    @callback
+    def _cancel_price_poll(self) -> None:
+        if self._unsub_price_poll is not None:
+            self._unsub_price_poll()
+            self._unsub_price_poll = None
+
+    async def _async_poll_prices(self, _now: datetime) -> None:
+        """
+        The fast tier of refreshes, fetching only the prices of held instruments
+
+        Quantities, acquisition prices and accounts rarely change, so they are left to
+        the slower positions polls and market values are recomputed from the new prices
+        """
+
+        self._unsub_price_poll = None
+
+        try:
+            if self._should_poll_prices():
+                with self.metrics.timer("prices"):
+                    self._apply_prices(await self._async_fetch_prices())
 
-    def _outside_trading_window_probability(self) -> bool:
+        except (aiohttp.ClientError, asyncio.TimeoutError) as ex:
+            # the positions poll takes care of retries and the circuit breaker
+            _LOGGER.debug(f"Polling prices from Nordnet API failed: {ex!r}")
+
+        finally:
+            self._schedule_price_poll()
+
+    def _should_poll_prices(self) -> bool:
         """
-        Just a slight randomizer for doing fewer Nordnet API requests outside trading windows
+        Only poll prices between healthy positions polls, while any of our markets are open
+        and the price feed isn't already streaming them
         """
 
-        return random.randint(0, 10) == 5
+        if self.data is None or self.data.stale or not self.data.positions or not self.last_update_success:
+            return False
+
+        if self._feed is not None and self._feed.connected:
+            return False
+
+        if self.circuit_breaker_state() != "closed":
+            return False
+
+        return self.calendar.is_open(self.data.mics, dt.now())
 
-    async def _authenticated_session(self) -> aiohttp.ClientSession:
+    async def _async_fetch_prices(self) -> dict:
         """
-        Returns a HTTP Session containing all required Cookies for a making authenticated
-        api requests to the Nordnet API
+        Fetch the last price of all held instruments in a single request, keyed by instrument id
         """
-        _LOGGER.debug("Called _get_session")
 
-        if self._has_valid_session():
-            _LOGGER.debug(f"Returning existing HTTP session")
-            return self._session
+        instrument_ids = ",".join(str(instrument_id) for instrument_id in sorted({position.instrument_id for position in self.data.positions}))
 
-        _LOGGER.debug(f"[session] Creating new HTTP session")
+        async with async_timeout.timeout(UPDATE_TIMEOUT):
+            session = await self._session.async_get()
 
-        session = async_create_clientsession(self._hass)
+            await self._limiter.acquire()
 
-        # Setting cookies prior to login by visiting login page
-        _LOGGER.debug("[session] requesting website login page")
-        async with session.get('https://www.nordnet.dk/logind') as response:
-            _LOGGER.debug("[session] checking website login response")
-            response.raise_for_status()
+            async with session.get(f"{self.config['base_url']}/api/2/instruments/price/{instrument_ids}", headers=DEFAULT_HEADERS) as response:
+                response.raise_for_status()
+                body = await response.read()
 
-            # read the resposne but discard it
-            await response.text()
-            _LOGGER.debug("[session] website login OK")
+        self.metrics.payload_bytes.add(len(body))
 
-        # Actual login
-        _LOGGER.debug("[session] requesting API bastic auth login")
-        async with session.post('https://www.nordnet.dk/api/2/authentication/basic/login',
-                                data={'username': self.config["username"], 'password': self.config["password"]},
-                                headers=DEFAULT_HEADERS) as response:
-            _LOGGER.debug("[session] checking API basic auth login reaponse")
-            response.raise_for_status()
+        return {
+            price['instrument_id']: price['last']['price']
+            for price in json_loads(body)
+            if price.get('last') and price['last'].get('price') is not None
+        }
 
-            # read the response but discard it
-            await response.text()
-            _LOGGER.debug("[session] API bastic auth login OK")
+    async def async_get_price_history(self, instrument_id: int, start: date, end: date) -> list:
+        """
+        Fetch the daily prices ('time' in ms, 'open', 'high', 'low' and 'last') of an instrument between two days
+        """
 
-        self._session = session
-        self._session_created_at = dt.now()
+        params = {"from": start.isoformat(), "to": end.isoformat()}
+        histories = await self._async_get_json(f"/api/2/instruments/historical/prices/{instrument_id}", params)
 
-        _LOGGER.debug("[session] Returning the new HTTP session")
-        return self._session
+        return [price for history in histories for price in history.get('prices', [])]
 
-    def _has_valid_session(self) -> bool:
+    async def async_get_transactions(self, account_id: int, start: date, end: date) -> list:
         """
-        Check if the HTTP session has expired and needs renewal
+        Fetch the transactions of an account with an accounting date between two days
         """
 
-        # if we don't have a session, force creation of a new one
-        if self._session is None:
-            return False
+        params = {"from": start.isoformat(), "to": end.isoformat()}
+        return await self._async_get_json(f"/api/2/accounts/{account_id}/transactions", params)
+
+    async def async_get_orders(self, account_id: int) -> list:
+        """
+        Fetch the orders of an account, including orders filled or deleted today
+        """
+
+        return await self._async_get_json(f"/api/2/accounts/{account_id}/orders")
+
+    async def _async_get_json(self, path: str, params: dict = None):
+        """
+        Rate limited GET request to Nordnet API outside of the refresh cycle
+        """
+
+        async with async_timeout.timeout(UPDATE_TIMEOUT):
+            session = await self._session.async_get()
 
-        # check the age of the session and compare with our session max age
-        age = dt.now() - self._session_created_at
-        return age < self.config["session_lifetime"]
+            await self._limiter.acquire()
 
-    def _inside_trading_window(self) -> bool:
+            async with session.get(f"{self.config['base_url']}{path}", params=params, headers=DEFAULT_HEADERS) as response:
+                response.raise_for_status()
+                body = await response.read()
+
+        return json_loads(body)
+
+    def _payload_hit(self, size: int) -> None:
+        self._payload_stats["hits"] += 1
+        self._payload_stats["bytes_skipped"] += size
+
+    def _should_make_request(self) -> bool:
         """
-        Check if we're within the trading window
+        Check if we should make a Nordnet API request for Stock holdings
+        If all markets we hold positions in are closed, there will be no changes to the underlying data
+        so we might as well not hit their API at all to not abuse their service
         """
 
+        # If we never requested data from Nordnet, like after a restart, always fetch it
+        if self.data is None or self.data.stale:
+            _LOGGER.debug("No live holdings found, will query Nordnet API")
+            return True
+
         now = dt.now()
 
-        # trading doesn't happen on Saturday or Sunday, hardcoding this for now
-        # since I'm not having any stocks outside EU and US trading hours
-        day_of_week = now.strftime('%A')
-        if day_of_week in ['Saturday', 'Sunday']:
-            _LOGGER.debug(f"{day_of_week} is not a trading day, skipping...")
-            return False
+        # inside trading hours of any of our markets, go forth and request Nordnet
+        if self.calendar.is_open(self.data.mics, now):
+            _LOGGER.debug(f"Within trade window of {sorted(self.data.mics)}, will query Nordnet API")
+            return True
 
-        # Trading is open between 09:00 and 23:00 in Europe/Copenhagen
-        if not self.config["trading_start_time"] <= now.time() < self.config["trading_stop_time"]:
-            return False
+        # a market closed since our last fetch, request Nordnet once more to get the closing prices
+        if self.calendar.closed_between(self.data.mics, self._last_fetched_at, now):
+            _LOGGER.debug("A market closed since last update, will query Nordnet API for closing prices")
+            return True
 
-        return True
+        # all markets are closed, no dice
+        _LOGGER.debug(f"All markets {sorted(self.data.mics)} are closed, will not query Nordnet API")
+        return False
+
+    def _adapt_update_interval(self, snapshot: HoldingsSnapshot) -> None:
+        """
+        Adapt the positions interval to the fraction of positions changed since the previous positions
+        refresh, and apply it to the next refresh already
+        """
+
+        changed = self._changed_keys
+        applied, self._price_changed_keys = self._price_changed_keys, set()
+
+        # the first live snapshot has nothing to compare against
+        if changed is None:
+            return
+
+        previous = self._adaptive.interval
+        interval = self._adaptive.record(len(changed | applied), len(snapshot))
+
+        if interval != previous:
+            _LOGGER.debug(f"Change rate of holdings is {self._adaptive.change_rate:.1%}, positions interval is now {interval}")
+
+        self.update_interval = self._next_update_interval()
+
+    def update_interval_seconds(self) -> float:
+        """
+        The effective interval until the next positions refresh
+        """
+
+        return self.update_interval.total_seconds()
+
+    def _next_update_interval(self) -> timedelta:
+        """
+        The adaptive update interval while any of our markets are open,
+        otherwise the time until the first of them opens again
+        """
+
+        interval = self.config["update_interval"]
+
+        if self.data is None or self.data.stale:
+            return interval
+
+        now = dt.now()
+        if self.calendar.is_open(self.data.mics, now):
+            return self._adaptive.interval
+
+        next_open = self.calendar.next_open(self.data.mics, now)
+        if next_open is None:
+            return MAX_CLOSED_INTERVAL
+
+        _LOGGER.debug(f"Markets are closed, next market opens at {next_open}")
+        return min(max(interval, next_open - now), MAX_CLOSED_INTERVAL)
 
     @staticmethod
     def map_config(input: dict) -> CoordinatorConfig:
@@ -273,17 +1254,45 @@ class Coordinator(DataUpdateCoordinator):
 
         config = dict(input)
 
-        config["account_id"] = int(config["account_id"])
+        config["base_url"] = config.get("base_url", DEFAULT_BASE_URL).rstrip("/")
+
+        config["account_ids"] = parse_account_ids(config["account_ids"])
+
+        # stored with string keys, since the options are serialized as JSON
+        config["account_currencies"] = {int(k): v for k, v in config.get("account_currencies", {}).items()}
 
         config["trading_start_time"] = time.fromisoformat(config["trading_start_time"])
         config["trading_stop_time"] = time.fromisoformat(config["trading_stop_time"])
 
         config["update_interval"] = duration_to_timedelta(config["update_interval"])
+        config["max_update_interval"] = duration_to_timedelta(config.get("max_update_interval", DEFAULT_MAX_UPDATE_INTERVAL))
+        config["price_update_interval"] = duration_to_timedelta(config.get("price_update_interval", DEFAULT_PRICE_UPDATE_INTERVAL))
         config["session_lifetime"] = timedelta(minutes=55) # sessions expire after 1h
 
+        config["price_feed"] = config.get("price_feed", DEFAULT_PRICE_FEED)
+        config["price_feed_url"] = config.get("price_feed_url") or None
+        config["attribute_profile"] = config.get("attribute_profile", DEFAULT_ATTRIBUTE_PROFILE)
+        config["max_staleness"] = duration_to_timedelta(config.get("max_staleness", DEFAULT_MAX_STALENESS))
+        config["reporting_currency"] = (config.get("reporting_currency") or DEFAULT_REPORTING_CURRENCY).strip().lower() or None
+
+        benchmark_instrument_id = str(config.get("benchmark_instrument_id") or DEFAULT_BENCHMARK_INSTRUMENT_ID).strip()
+        config["benchmark_instrument_id"] = int(benchmark_instrument_id) if benchmark_instrument_id else None
+
         return config
 
 
+def parse_account_ids(x: str) -> list[int]:
+    """
+    Converts a comma separated list of account ids into a list of ints, raising ValueError if invalid
+    """
+
+    account_ids = list(dict.fromkeys(int(account_id) for account_id in str(x).split(",") if account_id.strip()))
+    if not account_ids:
+        raise ValueError("At least one account id is required")
+
+    return account_ids
+
+
 def duration_to_timedelta(x: dict) -> timedelta:
     """
     Converts the HA 'duration' selector into a Python timedelta
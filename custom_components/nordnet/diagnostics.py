@@ -0,0 +1,21 @@
+"""
+Diagnostics download for a Nordnet config entry
+See https://developers.home-assistant.io/docs/core/integration_diagnostics
+"""
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+
+TO_REDACT = {"username", "password"}
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict:
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+
+    return {
+        "options": async_redact_data(dict(entry.options), TO_REDACT),
+        "coordinator": coordinator.diagnostics(),
+    }
@@ -0,0 +1,242 @@
+"""
+Streaming of live prices from Nordnet's public feed, applied between the slower positions polls
+"""
+
+import asyncio
+import json
+import logging
+from typing import Callable
+
+import aiohttp
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.util.json import json_loads
+from homeassistant.util.ssl import client_context
+from yarl import URL
+
+from .const import FEED_CONNECT_TIMEOUT, FEED_FLUSH_DELAY, FEED_READ_TIMEOUT
+from .session import NordnetSession
+from .snapshot import HoldingsSnapshot
+from .throttle import backoff_delay
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class FeedError(Exception):
+    """
+    The feed refused the login
+    """
+
+
+class FeedUnavailableError(Exception):
+    """
+    The Nordnet login didn't return a feed address, so there is nothing to connect to
+    """
+
+
+class PriceFeed:
+    """
+    Keeps a connection to the public feed open, subscribed to the price of every held instrument
+
+    The feed speaks newline delimited JSON: a 'login' command with the session key of the
+    HTTP session, 'subscribe' / 'unsubscribe' commands per instrument (market id and identifier
+    of its tradable), after which 'price' messages are pushed as the price changes
+
+    Price ticks are collected for FEED_FLUSH_DELAY seconds and handed to `on_prices` keyed by
+    instrument id. Dropped connections are reconnected with backoff until the feed is stopped
+    """
+
+    def __init__(self, hass: HomeAssistant, session: NordnetSession, on_prices: Callable[[dict], None], url: str = None):
+        self._hass: HomeAssistant = hass
+        self._session: NordnetSession = session
+        self._on_prices: Callable[[dict], None] = on_prices
+
+        # overrides the feed address from the login response, e.g. 'tcp://localhost:9000' for a local feed
+        self._url: str = url
+
+        # instrument ids per subscribed (market id, identifier)
+        self._subscriptions: dict = {}
+
+        self._task: asyncio.Task = None
+        self._writer: asyncio.StreamWriter = None
+        self._pending: dict = {}
+        self._unsub_flush: asyncio.TimerHandle = None
+
+        self.connected: bool = False
+
+        # set when there is no feed to connect to, prices are then polled instead
+        self.unavailable: bool = False
+
+    @callback
+    def async_update_subscriptions(self, snapshot: HoldingsSnapshot) -> None:
+        """
+        Subscribe to the instruments held in the snapshot, starting the feed on the first call,
+        and again on later calls if it gave up
+        """
+
+        subscriptions = {}
+        for position in snapshot.positions:
+            tradables = position.instrument.get('tradables')
+            if not tradables:
+                continue
+
+            subscription = (tradables[0]['market_id'], str(tradables[0]['identifier']))
+            subscriptions.setdefault(subscription, set()).add(position.instrument_id)
+
+        added = subscriptions.keys() - self._subscriptions.keys()
+        removed = self._subscriptions.keys() - subscriptions.keys()
+        self._subscriptions = subscriptions
+
+        # not started yet, or given up as the login had no feed address, which a later login may have
+        if self._task is None or self._task.done():
+            self._task = self._hass.async_create_background_task(self._async_run(), "nordnet price feed")
+            return
+
+        # subscriptions of a new connection are sent when it logs in
+        if self.connected and (added or removed):
+            _LOGGER.debug(f"[feed] Subscribing to {len(added)} and unsubscribing from {len(removed)} instruments")
+
+            for market_id, identifier in added:
+                self._send("subscribe", {"t": "price", "m": market_id, "i": identifier})
+
+            for market_id, identifier in removed:
+                self._send("unsubscribe", {"t": "price", "m": market_id, "i": identifier})
+
+    async def async_stop(self) -> None:
+        if self._unsub_flush is not None:
+            self._unsub_flush.cancel()
+            self._unsub_flush = None
+
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+        self._pending = {}
+
+    async def _async_run(self) -> None:
+        """
+        Connect to the feed, and reconnect with backoff whenever the connection is lost
+        """
+
+        attempt = 0
+
+        while True:
+            try:
+                await self._async_stream()
+
+            except FeedUnavailableError as ex:
+                # logging in again every few seconds won't make a feed address appear, so wait
+                # for the next positions refresh to start the feed again
+                if not self.unavailable:
+                    _LOGGER.warning(f"[feed] Price feed disabled, polling prices instead: {ex}")
+
+                self.connected = False
+                self.unavailable = True
+                return
+
+            except FeedError as ex:
+                # a login rejected by the feed is most likely an expired session key
+                _LOGGER.warning(f"[feed] Price feed rejected the login, renewing the session: {ex}")
+                self._session.invalidate()
+
+            except (OSError, asyncio.TimeoutError, ValueError, aiohttp.ClientError) as ex:
+                # includes failed logins to Nordnet API while fetching the session key
+                _LOGGER.warning(f"[feed] Price feed connection lost: {ex!r}")
+
+            if self.connected:
+                attempt = 0
+
+            self.connected = False
+
+            delay = backoff_delay(attempt)
+            attempt += 1
+
+            _LOGGER.debug(f"[feed] Reconnecting to price feed in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def _async_stream(self) -> None:
+        details = await self._session.async_get_feed_details()
+        host, port, encrypted = self._endpoint(details)
+
+        _LOGGER.debug(f"[feed] Connecting to price feed at {host}:{port}")
+
+        reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=client_context() if encrypted else None),
+            FEED_CONNECT_TIMEOUT,
+        )
+
+        try:
+            self._send("login", {"session_key": details["session_key"], "service": "NEXTAPI"})
+
+            for market_id, identifier in self._subscriptions:
+                self._send("subscribe", {"t": "price", "m": market_id, "i": identifier})
+
+            while True:
+                line = await asyncio.wait_for(reader.readline(), FEED_READ_TIMEOUT)
+                if not line:
+                    raise ConnectionResetError("Price feed closed the connection")
+
+                try:
+                    message = json_loads(line)
+                    self._handle_message(message)
+
+                except (ValueError, TypeError, AttributeError, KeyError) as ex:
+                    # a single garbled message doesn't justify reconnecting
+                    _LOGGER.debug(f"[feed] Ignoring malformed price feed message {line[:200]!r}: {ex!r}")
+
+        finally:
+            self._writer.close()
+            self._writer = None
+
+    def _endpoint(self, details: dict) -> tuple:
+        """
+        The host, port and whether to use TLS for the feed connection
+        """
+
+        if self._url:
+            url = URL(self._url)
+            return url.host, url.port, url.scheme in ("tls", "ssl")
+
+        feed = details.get("public_feed")
+        if not feed or not details.get("session_key"):
+            raise FeedUnavailableError("Nordnet login did not return a price feed address")
+
+        return feed["hostname"], feed["port"], feed.get("encrypted", True)
+
+    def _send(self, cmd: str, args: dict) -> None:
+        self._writer.write(json.dumps({"cmd": cmd, "args": args}).encode() + b"\n")
+
+    @callback
+    def _handle_message(self, message: dict) -> None:
+        message_type = message.get("type")
+
+        if message_type == "err":
+            raise FeedError(message.get("data", {}).get("msg", "Price feed returned an error"))
+
+        # the first message after login, feed is alive
+        if not self.connected:
+            _LOGGER.debug(f"[feed] Streaming prices of {len(self._subscriptions)} instruments")
+            self.connected = True
+            self.unavailable = False
+
+        if message_type != "price":
+            return
+
+        data = message["data"]
+        price = data.get("last")
+        instrument_ids = self._subscriptions.get((data.get("m"), str(data.get("i"))))
+
+        if price is None or not instrument_ids:
+            return
+
+        for instrument_id in instrument_ids:
+            self._pending[instrument_id] = price
+
+        if self._unsub_flush is None:
+            self._unsub_flush = self._hass.loop.call_later(FEED_FLUSH_DELAY, self._flush)
+
+    @callback
+    def _flush(self) -> None:
+        self._unsub_flush = None
+
+        prices, self._pending = self._pending, {}
+        self._on_prices(prices)
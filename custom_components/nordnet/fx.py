@@ -0,0 +1,216 @@
+"""
+Exchange rates, and conversion of holdings into a single reporting currency
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from xml.etree import ElementTree
+
+import aiohttp
+import async_timeout
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.util import dt
+
+from .const import (FX_RATES_KEY, FX_RATES_URL, FX_REFRESH_AHEAD,
+                    FX_RETRY_DELAY, FX_TIMEOUT, FX_TTL)
+from .snapshot import HoldingsSnapshot
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class FxRates:
+    """
+    Euro foreign exchange reference rates of the ECB, shared by all config entries
+
+    Every currency comes in a single small request, cached for FX_TTL. In the last
+    FX_REFRESH_AHEAD of the TTL the rates are refreshed in the background while the cached
+    rates keep being served, so refreshes only wait for rates the very first time. If the ECB
+    can't be reached the last rates keep being used, they only change once a day anyway
+    """
+
+    def __init__(self, hass: HomeAssistant):
+        self._hass: HomeAssistant = hass
+
+        # units of each currency per euro, only replaced when a rate actually changed
+        self.rates: dict = None
+        self.date: str = None
+        self.fetched_at: datetime = None
+
+        self._failed_at: datetime = None
+        self._task: asyncio.Task = None
+
+    async def async_get(self) -> dict:
+        """
+        The cached rates, waiting for them only if they expired
+        """
+
+        now = dt.utcnow()
+        age = now - self.fetched_at if self.fetched_at is not None else None
+
+        if age is None or age >= FX_TTL:
+            if self._can_fetch(now):
+                # shielded, a refresh timing out must not cancel the fetch shared with other entries
+                await asyncio.shield(self._refresh())
+
+        elif age >= FX_TTL - FX_REFRESH_AHEAD and self._can_fetch(now):
+            self._refresh()
+
+        return self.rates
+
+    def _can_fetch(self, now: datetime) -> bool:
+        # a failed fetch is only retried after FX_RETRY_DELAY, not on every refresh
+        return self._failed_at is None or now - self._failed_at >= FX_RETRY_DELAY
+
+    def _refresh(self) -> asyncio.Task:
+        """
+        Fetch the rates in the background, joining an already running fetch
+        """
+
+        if self._task is None or self._task.done():
+            self._task = self._hass.async_create_background_task(self._async_fetch(), "nordnet exchange rates")
+
+        return self._task
+
+    async def _async_fetch(self) -> None:
+        try:
+            async with async_timeout.timeout(FX_TIMEOUT):
+                response = await async_get_clientsession(self._hass).get(FX_RATES_URL)
+                response.raise_for_status()
+                body = await response.read()
+
+            rates, date = self._parse(body)
+
+        except (aiohttp.ClientError, asyncio.TimeoutError, ElementTree.ParseError, ValueError) as ex:
+            fallback = f"using the rates of {self.date}" if self.rates else "retrying later"
+            _LOGGER.warning(f"Fetching exchange rates failed, {fallback}: {ex!r}")
+
+            self._failed_at = dt.utcnow()
+            return
+
+        self.fetched_at = dt.utcnow()
+        self._failed_at = None
+
+        # keep the same dict while rates are unchanged, so conversions aren't redone every hour
+        if rates != self.rates:
+            _LOGGER.debug(f"Updated exchange rates of {len(rates)} currencies from {date}")
+            self.rates = rates
+            self.date = date
+
+    @staticmethod
+    def _parse(body: bytes) -> tuple:
+        """
+        Rates (per euro) keyed by lower case currency, and the date they are from
+        """
+
+        rates = {"eur": 1.0}
+        date = None
+
+        for cube in ElementTree.fromstring(body).iter():
+            if "currency" in cube.attrib:
+                rates[cube.attrib["currency"].lower()] = float(cube.attrib["rate"])
+            elif "time" in cube.attrib:
+                date = cube.attrib["time"]
+
+        if len(rates) == 1:
+            raise ValueError("No exchange rates in response")
+
+        return rates, date
+
+    def as_dict(self) -> dict:
+        return {
+            "date": self.date,
+            "fetched_at": self.fetched_at.isoformat() if self.fetched_at else None,
+            "currencies": sorted(self.rates) if self.rates else [],
+        }
+
+
+def get_fx_rates(hass: HomeAssistant) -> FxRates:
+    """
+    The exchange rates shared by all Nordnet coordinators
+    """
+
+    return hass.data.setdefault(FX_RATES_KEY, FxRates(hass))
+
+
+class ReportingValues:
+    """
+    Every position and account of a snapshot converted into the reporting currency, in a single
+    pass per snapshot, so entities only read their precomputed values
+
+    Market values and ROI are converted from the account currency, and the market price from
+    the currency of the position. Positions in currencies without a rate are left out
+    """
+
+    def __init__(self, snapshot: HoldingsSnapshot, rates: dict, currency: str):
+        self.snapshot: HoldingsSnapshot = snapshot
+        self.rates: dict = rates
+        self.currency: str = currency
+
+        # per position key, and per account id
+        self.positions: dict = {}
+        self.accounts: dict = {}
+
+        self.market_value: float = 0.0
+        self.cost: float = 0.0
+        self.unconverted: set = set()
+
+        target = rates.get(currency)
+
+        # conversion factor per currency, resolved once per snapshot
+        factors = {currency: 1.0}
+
+        def factor(source: str) -> float:
+            if source not in factors:
+                factors[source] = target / rates[source] if target and rates.get(source) else None
+
+            return factors[source]
+
+        accounts = {}
+
+        for position in snapshot.positions:
+            account_factor = factor(position.account_currency)
+            position_factor = factor(position.position_currency)
+
+            if account_factor is None or position_factor is None:
+                self.unconverted.add(position.account_currency if account_factor is None else position.position_currency)
+                continue
+
+            market_value = position.account_market_value * account_factor
+            cost = position.quantity * position.account_acquisition_price * account_factor
+
+            self.positions[position.key] = {
+                "reporting_currency": currency,
+                "reporting_market_value": market_value,
+                "reporting_market_price": position.position_market_price * position_factor,
+                "reporting_roi": market_value - cost,
+            }
+
+            totals = accounts.get(position.account_id)
+            if totals is None:
+                totals = accounts[position.account_id] = [0.0, 0.0]
+
+            totals[0] += market_value
+            totals[1] += cost
+
+        for account_id, (market_value, cost) in accounts.items():
+            self.accounts[account_id] = {
+                "reporting_currency": currency,
+                "reporting_market_value": market_value,
+                "reporting_roi": market_value - cost,
+            }
+
+            self.market_value += market_value
+            self.cost += cost
+
+    @property
+    def roi(self) -> float:
+        return self.market_value - self.cost
+
+    @property
+    def roi_percent(self) -> float:
+        if not self.cost:
+            return None
+
+        return self.roi / self.cost * 100
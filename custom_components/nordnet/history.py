@@ -0,0 +1,113 @@
+"""
+Daily closing prices of the held instruments, which the volatility and beta of accounts are computed from
+"""
+
+import asyncio
+import logging
+from datetime import date, datetime, timedelta
+
+import aiohttp
+import numpy as np
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.util import dt
+
+from .const import HISTORY_DAYS, HISTORY_RETRY_DELAY
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class PriceHistory:
+    """
+    Keeps the daily closing prices of the last HISTORY_DAYS of every held instrument, and of the
+    benchmark instrument
+
+    Only days that are over are fetched, so the history of an instrument is fetched once a day,
+    one instrument at a time through the shared rate limiter, and instruments bought since only
+    cost a request for their own history. A failed fetch keeps the history fetched so far, and is
+    retried after HISTORY_RETRY_DELAY
+    """
+
+    def __init__(self, hass: HomeAssistant, coordinator):
+        self._hass: HomeAssistant = hass
+        self._coordinator = coordinator
+
+        # per instrument id: arrays of the days (as ordinals) and their closes
+        self.closes: dict = {}
+
+        # the day whose history was fetched, and the instruments fetched for it
+        self._day: date = None
+        self._fetched: set = set()
+
+        self._task: asyncio.Task = None
+        self._failed_at: datetime = None
+
+    @callback
+    def async_schedule_fetch(self, instrument_ids: set) -> None:
+        """
+        Fetch the history of the instruments not fetched today in the background
+        """
+
+        if self._task is not None and not self._task.done():
+            return
+
+        if self._failed_at is not None and dt.utcnow() - self._failed_at < HISTORY_RETRY_DELAY:
+            return
+
+        today = dt.now().date()
+        if today != self._day:
+            self._day = today
+            self._fetched = set()
+
+        missing = instrument_ids - self._fetched
+        if not missing:
+            return
+
+        self._task = self._hass.async_create_background_task(self._async_fetch(today, missing, instrument_ids), "nordnet price history")
+
+    async def async_stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _async_fetch(self, today: date, missing: set, instrument_ids: set) -> None:
+        # instruments no longer held are forgotten
+        closes = {instrument_id: self.closes[instrument_id] for instrument_id in instrument_ids & self.closes.keys()}
+        changed = len(closes) != len(self.closes)
+
+        try:
+            for instrument_id in sorted(missing):
+                history = await self._coordinator.async_get_price_history(instrument_id, today - timedelta(days=HISTORY_DAYS), today - timedelta(days=1))
+                prices = [price for price in history if price.get("last")]
+
+                closes[instrument_id] = (
+                    np.array([dt.as_local(dt.utc_from_timestamp(price["time"] / 1000)).date().toordinal() for price in prices], np.int64),
+                    np.array([price["last"] for price in prices], np.float64),
+                )
+
+                self._fetched.add(instrument_id)
+                changed = True
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as ex:
+            _LOGGER.debug(f"[history] Fetching price history failed, retrying in {HISTORY_RETRY_DELAY}: {ex!r}")
+            self._failed_at = dt.utcnow()
+
+        except Exception:
+            # nothing awaits the background task, so errors would otherwise go unnoticed
+            _LOGGER.exception("[history] Fetching price history failed")
+            self._failed_at = dt.utcnow()
+
+        else:
+            self._failed_at = None
+            _LOGGER.debug(f"[history] Fetched the price history of {len(missing)} instruments")
+
+        # whatever was fetched before a failure is used right away
+        if changed:
+            self.closes = closes
+            self._coordinator.async_update_history()
+
+    def as_dict(self) -> dict:
+        return {
+            "day": self._day.isoformat() if self._day else None,
+            "instruments": len(self.closes),
+            "failed_at": self._failed_at.isoformat() if self._failed_at else None,
+        }
@@ -0,0 +1,138 @@
+"""
+Rolling intraday statistics per instrument, kept in memory so they don't require recorder history queries
+"""
+
+import math
+from array import array
+from datetime import date
+
+from .const import INTRADAY_WINDOW
+
+
+class IntradayStats:
+    """
+    Price samples of a single instrument for the current day
+
+    The most recent `size` samples live in fixed-size arrays used as ring buffers, with running
+    sums updated as samples are added and evicted, so every statistic is O(1) per sample and
+    memory is bounded no matter how long HA runs
+
+    * high, low and average price of the day
+    * average price and volatility (standard deviation of returns, in %) over the window
+    """
+
+    __slots__ = (
+        "day",
+        "high",
+        "low",
+        "last",
+        "_size",
+        "_prices",
+        "_returns",
+        "_index",
+        "_count",
+        "_price_sum",
+        "_return_sum",
+        "_return_sum_sq",
+        "_day_sum",
+        "_day_count",
+    )
+
+    def __init__(self, size: int = INTRADAY_WINDOW):
+        self._size: int = size
+        self._prices: array = array('d', bytes(8 * size))
+        self._returns: array = array('d', bytes(8 * size))
+
+        self._reset(None)
+
+    def _reset(self, day: date) -> None:
+        self.day: date = day
+        self.high: float = None
+        self.low: float = None
+        self.last: float = None
+
+        self._index: int = 0
+        self._count: int = 0
+        self._price_sum: float = 0.0
+        self._return_sum: float = 0.0
+        self._return_sum_sq: float = 0.0
+        self._day_sum: float = 0.0
+        self._day_count: int = 0
+
+    def add(self, price: float, day: date) -> None:
+        """
+        Add a price sample, starting over when the day changes
+        """
+
+        if day != self.day:
+            self._reset(day)
+
+        # the first sample of the day has no return
+        change = (price - self.last) / self.last if self.last else 0.0
+
+        # evict the oldest sample once the buffer is full
+        if self._count == self._size:
+            evicted = self._returns[self._index]
+            self._price_sum -= self._prices[self._index]
+            self._return_sum -= evicted
+            self._return_sum_sq -= evicted * evicted
+        else:
+            self._count += 1
+
+        self._prices[self._index] = price
+        self._returns[self._index] = change
+        self._index = (self._index + 1) % self._size
+
+        self._price_sum += price
+        self._return_sum += change
+        self._return_sum_sq += change * change
+
+        self._day_sum += price
+        self._day_count += 1
+
+        self.high = price if self.high is None else max(self.high, price)
+        self.low = price if self.low is None else min(self.low, price)
+        self.last = price
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def average(self) -> float:
+        if not self._day_count:
+            return None
+
+        return self._day_sum / self._day_count
+
+    @property
+    def window_average(self) -> float:
+        if not self._count:
+            return None
+
+        return self._price_sum / self._count
+
+    @property
+    def volatility(self) -> float:
+        if self._count < 2:
+            return None
+
+        mean = self._return_sum / self._count
+
+        # running sums can drift slightly below zero on flat prices
+        variance = max(0.0, self._return_sum_sq / self._count - mean * mean)
+
+        return math.sqrt(variance) * 100
+
+    def attributes(self, morning_price: float) -> dict:
+        """
+        The statistics as entity attributes, with the change of the last price since the morning price
+        """
+
+        return {
+            "intraday_high": self.high,
+            "intraday_low": self.low,
+            "intraday_average": self.average,
+            "intraday_window_average": self.window_average,
+            "intraday_volatility": self.volatility,
+            "intraday_change_percent": (self.last - morning_price) / morning_price * 100 if morning_price and self.last is not None else None,
+        }
@@ -0,0 +1,253 @@
+"""
+Trading hours, holidays and half days for the markets Nordnet positions are listed on
+
+Used by the coordinator to only query Nordnet API while at least one market
+we hold positions in is open, and to schedule the next refresh for when the
+first of them opens again
+"""
+
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from typing import Callable, Iterable, NamedTuple
+
+import holidays
+from dateutil.easter import easter
+from homeassistant.util import dt
+
+
+class Market(NamedTuple):
+    """
+    Regular trading session for a market, in the local time of the market
+    """
+    name: str
+    timezone: str
+    open: time
+    close: time
+    closed_days: Callable[[int], set]
+    half_days: Callable[[int], dict]
+
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    first = date(year, month, 1)
+    return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+
+
+def _public_holidays(country: str, *extra: tuple) -> Callable[[int], set]:
+    """
+    National public holidays plus a set of fixed (month, day) closures
+    """
+
+    def closed_days(year: int) -> set:
+        days = set(holidays.country_holidays(country, years=year).keys())
+        days.update(date(year, month, day) for month, day in extra)
+        return days
+
+    return closed_days
+
+
+def _exchange_closed_days(*extra: tuple, easter_offsets: tuple = (-2, 1)) -> Callable[[int], set]:
+    """
+    Closures of an exchange that trades on some national holidays: fixed (month, day)
+    closures, plus days relative to Easter Sunday (Good Friday and Easter Monday by default)
+    """
+
+    def closed_days(year: int) -> set:
+        days = {date(year, month, day) for month, day in extra}
+        days.update(easter(year) + timedelta(days=offset) for offset in easter_offsets)
+        return days
+
+    return closed_days
+
+
+def _helsinki_closed_days(year: int) -> set:
+    # Nasdaq Helsinki trades on Epiphany and Ascension Day, but closes on Midsummer Eve (the Friday between 19 and 25 June)
+    days = _exchange_closed_days((1, 1), (5, 1), (12, 6), (12, 24), (12, 25), (12, 26), (12, 31))(year)
+    days.add(date(year, 6, 19) + timedelta(days=(4 - date(year, 6, 19).weekday()) % 7))
+    return days
+
+
+def _copenhagen_closed_days(year: int) -> set:
+    # Nasdaq Copenhagen also closes the day after Ascension Day
+    days = _public_holidays("DK", (6, 5), (12, 24), (12, 31))(year)
+    days.add(easter(year) + timedelta(days=40))
+    return days
+
+
+def _stockholm_half_days(year: int) -> dict:
+    # Nasdaq Stockholm closes 13:00 on the day before some holidays
+    ascension = easter(year) + timedelta(days=39)
+    return {
+        date(year, 1, 5): time(13, 0),
+        easter(year) - timedelta(days=3): time(13, 0),
+        date(year, 4, 30): time(13, 0),
+        ascension - timedelta(days=1): time(13, 0),
+    }
+
+
+def _nyse_closed_days(year: int) -> set:
+    return set(holidays.financial_holidays("NYSE", years=year).keys())
+
+
+def _nyse_half_days(year: int) -> dict:
+    # regular trading closes 13:00 on these days, and the extended session 17:00
+    half_days = {
+        date(year, 7, 3): time(17, 0),
+        _nth_weekday(year, 11, 3, 4) + timedelta(days=1): time(17, 0),
+        date(year, 12, 24): time(17, 0),
+    }
+
+    # July 3rd is only a half day when Independence Day isn't observed on it
+    if date(year, 7, 3) in _nyse_closed_days(year):
+        del half_days[date(year, 7, 3)]
+
+    return half_days
+
+
+def _no_half_days(_year: int) -> dict:
+    return {}
+
+
+_COPENHAGEN = Market("Nasdaq Copenhagen", "Europe/Copenhagen", time(9, 0), time(17, 0), _copenhagen_closed_days, _no_half_days)
+_STOCKHOLM = Market("Nasdaq Stockholm", "Europe/Stockholm", time(9, 0), time(17, 30), _public_holidays("SE", (12, 24), (12, 31)), _stockholm_half_days)
+_HELSINKI = Market("Nasdaq Helsinki", "Europe/Helsinki", time(10, 0), time(18, 30), _helsinki_closed_days, _no_half_days)
+_OSLO = Market("Oslo Børs", "Europe/Oslo", time(9, 0), time(16, 20), _public_holidays("NO", (12, 24), (12, 31)), _no_half_days)
+
+# Xetra trades on most German holidays, e.g. Ascension Day, Whit Monday and the Day of German Unity
+_XETRA = Market("Xetra", "Europe/Berlin", time(9, 0), time(17, 30), _exchange_closed_days((1, 1), (5, 1), (12, 24), (12, 25), (12, 26), (12, 31)), _no_half_days)
+
+# US markets including pre-market and after-hours trading, since Nordnet shows those prices too
+_US = Market("US", "America/New_York", time(4, 0), time(20, 0), _nyse_closed_days, _nyse_half_days)
+
+"""
+Markets by their ISO 10383 Market Identifier Code (the 'mic' of a tradable in Nordnet API)
+"""
+MARKETS = {
+    "XCSE": _COPENHAGEN,
+    "FNDK": _COPENHAGEN,
+    "XSTO": _STOCKHOLM,
+    "FNSE": _STOCKHOLM,
+    "XNGM": _STOCKHOLM,
+    "XHEL": _HELSINKI,
+    "FNFI": _HELSINKI,
+    "XOSL": _OSLO,
+    "XOAS": _OSLO,
+    "MERK": _OSLO,
+    "XETR": _XETRA,
+    "XNAS": _US,
+    "XNYS": _US,
+    "ARCX": _US,
+    "BATS": _US,
+}
+
+
+def load_holidays(year: int) -> None:
+    """
+    Compute the closures of every market for a year and the next, which imports the holiday
+    definitions of each country on first use. Too slow for the event loop, so it's run in the
+    executor before the calendar is first used
+    """
+
+    for market in set(MARKETS.values()):
+        for y in (year, year + 1):
+            _closed_days(market, y)
+            _half_days(market, y)
+
+
+@lru_cache(maxsize=64)
+def _closed_days(market: Market, year: int) -> frozenset:
+    return frozenset(market.closed_days(year))
+
+
+@lru_cache(maxsize=64)
+def _half_days(market: Market, year: int) -> dict:
+    return market.half_days(year)
+
+
+class TradingCalendar:
+    """
+    Answers whether any of a set of markets is open, and when the next one opens
+
+    Markets not in MARKETS fall back to the trading window configured in HA UI,
+    Monday to Friday in the timezone configured in HA
+    """
+
+    def __init__(self, fallback_open: time, fallback_close: time):
+        self._fallback = Market("Configured trading window", None, fallback_open, fallback_close, lambda _year: set(), _no_half_days)
+
+    def market(self, mic: str) -> Market:
+        return MARKETS.get(mic, self._fallback)
+
+    def is_open(self, mics: Iterable[str], now: datetime) -> bool:
+        """
+        Check if any of the markets is within a trading session right now
+        """
+
+        for market in self._markets(mics):
+            session = self._session(market, now.astimezone(self._timezone(market)).date())
+            if session is not None and session[0] <= now < session[1]:
+                return True
+
+        return False
+
+    def closed_between(self, mics: Iterable[str], start: datetime, end: datetime) -> bool:
+        """
+        Check if any of the markets closed a trading session in (start, end], used to
+        make one last refresh after a market closes to catch the closing prices
+        """
+
+        for market in self._markets(mics):
+            day = end.astimezone(self._timezone(market)).date()
+            for offset in range(2):
+                session = self._session(market, day - timedelta(days=offset))
+                if session is not None and start < session[1] <= end:
+                    return True
+
+        return False
+
+    def next_open(self, mics: Iterable[str], now: datetime, horizon: int = 14) -> datetime:
+        """
+        Find the earliest start of a trading session after now across all markets,
+        or None if none of them opens within the horizon (in days)
+        """
+
+        earliest = None
+
+        for market in self._markets(mics):
+            today = now.astimezone(self._timezone(market)).date()
+
+            for offset in range(horizon):
+                session = self._session(market, today + timedelta(days=offset))
+                if session is None or session[1] <= now:
+                    continue
+
+                start = max(session[0], now)
+                if earliest is None or start < earliest:
+                    earliest = start
+                break
+
+        return earliest
+
+    def _markets(self, mics: Iterable[str]) -> set:
+        return {self.market(mic) for mic in mics} or {self._fallback}
+
+    def _timezone(self, market: Market):
+        if market.timezone is None:
+            return dt.DEFAULT_TIME_ZONE
+
+        return dt.get_time_zone(market.timezone)
+
+    def _session(self, market: Market, day: date) -> tuple:
+        """
+        The (open, close) datetimes of the trading session on a given local day, or None if closed
+        """
+
+        if day.weekday() >= 5 or day in _closed_days(market, day.year):
+            return None
+
+        close = _half_days(market, day.year).get(day, market.close)
+        tz = self._timezone(market)
+
+        return (
+            datetime.combine(day, market.open, tzinfo=tz),
+            datetime.combine(day, close, tzinfo=tz),
+        )
@@ -0,0 +1,100 @@
+"""
+Rolling timings and counters for the refresh cycle, exposed via diagnostics and diagnostic sensors
+"""
+
+from collections import deque
+from contextlib import contextmanager
+from time import perf_counter
+
+from .const import METRICS_WINDOW
+
+"""
+The stages of a refresh, in the order they happen, and the duration of the lightweight price polls
+"""
+STAGES = ("session", "http", "decode", "remap", "analytics", "dispatch", "total", "prices")
+
+
+class RollingHistogram:
+    """
+    The most recent samples of a measurement, with percentiles computed on read
+
+    Memory is bounded by the window size no matter how long HA runs
+    """
+
+    def __init__(self, size: int = METRICS_WINDOW):
+        self._samples: deque = deque(maxlen=size)
+
+    def add(self, value: float) -> None:
+        self._samples.append(value)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, percent: float) -> float:
+        if not self._samples:
+            return None
+
+        return _percentile(sorted(self._samples), percent)
+
+    def as_dict(self) -> dict:
+        if not self._samples:
+            return {"count": 0}
+
+        ordered = sorted(self._samples)
+
+        return {
+            "count": len(ordered),
+            "p50": _percentile(ordered, 50),
+            "p95": _percentile(ordered, 95),
+            "p99": _percentile(ordered, 99),
+            "max": ordered[-1],
+        }
+
+
+def _percentile(ordered: list, percent: float) -> float:
+    # nearest-rank percentile of already sorted samples
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+class RefreshMetrics:
+    """
+    Per stage durations (in milliseconds), payload sizes and counters for a coordinator
+    """
+
+    def __init__(self):
+        self.stages: dict = {stage: RollingHistogram() for stage in STAGES}
+        self.logins: RollingHistogram = RollingHistogram()
+        self.payload_bytes: RollingHistogram = RollingHistogram()
+        self.counters: dict = {"refreshes": 0, "failures": 0, "logins": 0, "retries": 0}
+
+    @contextmanager
+    def timer(self, stage: str):
+        """
+        Record the duration of the wrapped block as a sample of the given stage
+        """
+
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[stage].add((perf_counter() - start) * 1000)
+
+    @contextmanager
+    def login_timer(self):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.logins.add((perf_counter() - start) * 1000)
+            self.counters["logins"] += 1
+
+    def increment(self, counter: str) -> None:
+        self.counters[counter] += 1
+
+    def as_dict(self) -> dict:
+        return {
+            "counters": dict(self.counters),
+            "stages_ms": {stage: histogram.as_dict() for stage, histogram in self.stages.items()},
+            "login_ms": self.logins.as_dict(),
+            "payload_bytes": self.payload_bytes.as_dict(),
+        }
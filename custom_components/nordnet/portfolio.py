@@ -0,0 +1,113 @@
+"""
+Account level aggregates over all positions, maintained incrementally from
+the positions that changed between two snapshots
+"""
+
+import math
+
+from .const import PORTFOLIO_RECOMPUTE_UPDATES
+from .position import Position
+
+
+class PortfolioTotals:
+    """
+    Market value, ROI and currency exposure of a single Nordnet account
+
+    Instead of summing every position on every refresh, the contribution of a changed
+    position is subtracted and the new one added, so a refresh costs O(changed positions)
+
+    Adding and subtracting floats accumulates rounding errors, so the totals are recomputed
+    exactly every PORTFOLIO_RECOMPUTE_UPDATES updates, and when the last position is removed
+    """
+
+    def __init__(self, account_id: int, account_currency: str):
+        self.account_id: int = account_id
+        self.account_currency: str = account_currency
+
+        self.market_value: float = 0.0
+        self.cost: float = 0.0
+        self.currency_exposure: dict = {}
+
+        # number of positions per currency, so currencies no longer held are dropped
+        self._currency_positions: dict = {}
+
+        # account market value, cost and position currency per instrument id, used for
+        # position weights and to recompute the totals from
+        self._positions: dict = {}
+
+        # incremental updates since the totals were last recomputed
+        self._updates: int = 0
+
+    @property
+    def roi(self) -> float:
+        return self.market_value - self.cost
+
+    @property
+    def roi_percent(self) -> float:
+        if not self.cost:
+            return None
+
+        return self.roi / self.cost * 100
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def apply(self, old: Position, new: Position) -> None:
+        """
+        Replace the contribution of a position, old is None for added positions
+        and new is None for removed positions
+        """
+
+        if old is not None:
+            self._add(old, -1)
+            del self._positions[old.instrument_id]
+
+        if new is not None:
+            self._add(new, 1)
+            self._positions[new.instrument_id] = (new.account_market_value, new.quantity * new.account_acquisition_price, new.position_currency)
+
+        self._updates += 1
+
+        if not self._positions or self._updates >= PORTFOLIO_RECOMPUTE_UPDATES:
+            self._recompute()
+
+    def _add(self, position: Position, sign: int) -> None:
+        self.market_value += sign * position.account_market_value
+        self.cost += sign * position.quantity * position.account_acquisition_price
+
+        currency = position.position_currency
+        count = self._currency_positions.get(currency, 0) + sign
+
+        if count == 0:
+            del self._currency_positions[currency]
+            del self.currency_exposure[currency]
+            return
+
+        self._currency_positions[currency] = count
+        self.currency_exposure[currency] = self.currency_exposure.get(currency, 0.0) + sign * position.account_market_value
+
+    def _recompute(self) -> None:
+        """
+        Sum every position again, with exact summation, dropping the accumulated rounding errors
+        """
+
+        self._updates = 0
+
+        values = {}
+        for value, _, currency in self._positions.values():
+            values.setdefault(currency, []).append(value)
+
+        self.market_value = math.fsum(value for value, _, _ in self._positions.values())
+        self.cost = math.fsum(cost for _, cost, _ in self._positions.values())
+        self.currency_exposure = {currency: math.fsum(currency_values) for currency, currency_values in values.items()}
+        self._currency_positions = {currency: len(currency_values) for currency, currency_values in values.items()}
+
+    def weights(self) -> dict:
+        """
+        Share of the account market value (in %) per instrument id, symbols aren't unique across markets
+        """
+
+        if not self.market_value:
+            return {}
+
+        return {instrument_id: value / self.market_value * 100 for instrument_id, (value, _, _) in self._positions.items()}
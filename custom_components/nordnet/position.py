@@ -0,0 +1,250 @@
+"""
+Compact record of a single Nordnet position, remapped once per fetch by the coordinator
+"""
+
+from types import MappingProxyType
+from typing import Mapping
+
+from .const import (ATTRIBUTE_PROFILE_COMPACT, ATTRIBUTE_PROFILE_FULL,
+                    ATTRIBUTE_PROFILE_NUMERIC)
+
+
+class Position:
+    """
+    A position from the Nordnet API, flattened where possible to ease use in templates,
+    and allow the 'datadog' integration to emit metrics for all the numeric values automatically
+
+    Also adds some basic ROI attributes that are kinda best-effort based on the
+    data made available via the API response
+    """
+
+    __slots__ = (
+        "key",
+        "instrument",
+        "instrument_id",
+        "symbol",
+        "name",
+        "mic",
+        "account_id",
+        "account_number",
+        "account_currency",
+        "position_currency",
+        "quantity",
+        "account_market_value",
+        "account_acquisition_price",
+        "account_roi",
+        "account_roi_percent",
+        "position_market_value",
+        "position_acquisition_price",
+        "position_market_price",
+        "position_morning_price",
+        "stale",
+        "_attributes",
+        "_attributes_profile",
+    )
+
+    # fields exposed as entity attributes, and compared to detect changes
+    ATTRIBUTES = (
+        "instrument",
+        "account_id",
+        "account_number",
+        "quantity",
+        "account_currency",
+        "account_acquisition_price",
+        "account_market_value",
+        "account_roi",
+        "account_roi_percent",
+        "position_currency",
+        "position_acquisition_price",
+        "position_market_price",
+        "position_market_value",
+        "position_morning_price",
+        "stale",
+    )
+
+    def __init__(self, raw: dict, account_currency: str, stale: bool = False):
+        """
+        Remap the raw Nordnet API position in a single pass, without copying the raw dict
+        """
+
+        instrument = raw['instrument']
+
+        # the nested instrument is shared with the raw response, not copied
+        self.instrument: dict = instrument
+        self.instrument_id: int = instrument['instrument_id']
+        self.symbol: str = instrument['symbol']
+        self.name: str = instrument['name']
+
+        tradables = instrument.get('tradables')
+        self.mic: str = tradables[0]['mic'] if tradables else None
+
+        self.account_id: int = raw['accid']
+        self.account_number: int = raw['accno']
+        self.account_currency: str = account_currency
+
+        # instruments can be held in several accounts, so positions are identified by both
+        self.key: tuple = (self.account_id, self.instrument_id)
+
+        # the native currency of the position (e.g. USD, NOK, SEK)
+        # not to be confused with the account currency
+        self.position_currency: str = raw['main_market_price']['currency'].lower()
+
+        self.quantity: float = raw['qty']
+
+        # (account) market value and acquisition price
+        self.account_market_value: float = raw['market_value_acc']['value']
+        self.account_acquisition_price: float = raw['acq_price_acc']['value']
+
+        # position values, in the native currency of the position
+        self.position_market_value: float = raw['market_value']['value']
+        self.position_acquisition_price: float = raw['acq_price']['value']
+        self.position_market_price: float = raw['main_market_price']['value']
+        self.position_morning_price: float = raw['morning_price']['value']
+
+        self.stale: bool = stale
+
+        # entity attributes of the attribute profile of the entry, built on first read. An entry
+        # only uses a single profile, so a single view is kept rather than a dict of them
+        self._attributes: Mapping = None
+        self._attributes_profile: str = None
+
+        self._compute_roi()
+
+    def _compute_roi(self) -> None:
+        # compute Return On Investment (in account currency)
+        self.account_roi = self.account_market_value - (self.quantity * self.account_acquisition_price)
+
+        # compute Return On Investment %
+        if self.position_acquisition_price:
+            self.account_roi_percent = (self.position_market_price - self.position_acquisition_price) / self.position_acquisition_price * 100
+        else:
+            self.account_roi_percent = None
+
+    @property
+    def attributes(self) -> Mapping:
+        return self.attributes_for(ATTRIBUTE_PROFILE_FULL)
+
+    def attributes_for(self, profile: str) -> Mapping:
+        """
+        Read-only view of the entity attributes of an attribute profile, built once
+        per position and shared by every read
+        """
+
+        if self._attributes_profile != profile:
+            self._attributes = MappingProxyType(self._build_attributes(profile))
+            self._attributes_profile = profile
+
+        return self._attributes
+
+    def _build_attributes(self, profile: str) -> dict:
+        # values changing with the price are split out of the compact and numeric profiles, see price_attributes()
+        if profile == ATTRIBUTE_PROFILE_COMPACT:
+            return {
+                "instrument_id": self.instrument_id,
+                "symbol": self.symbol,
+                "isin_code": self.instrument.get('isin_code'),
+                "mic": self.mic,
+                "account_id": self.account_id,
+                "account_number": self.account_number,
+                "quantity": self.quantity,
+                "account_currency": self.account_currency,
+                "account_acquisition_price": self.account_acquisition_price,
+                "position_currency": self.position_currency,
+                "position_acquisition_price": self.position_acquisition_price,
+                "stale": self.stale,
+            }
+
+        if profile == ATTRIBUTE_PROFILE_NUMERIC:
+            return {
+                "instrument_id": self.instrument_id,
+                "account_id": self.account_id,
+                "account_number": self.account_number,
+                "quantity": self.quantity,
+                "account_acquisition_price": self.account_acquisition_price,
+                "position_acquisition_price": self.position_acquisition_price,
+            }
+
+        return {
+            "instrument": self.instrument,
+            "account_id": self.account_id,
+            "account_number": self.account_number,
+            "quantity": self.quantity,
+            "account_currency": self.account_currency,
+            "account_acquisition_price": self.account_acquisition_price,
+            "account_market_value": self.account_market_value,
+            "account_roi": self.account_roi,
+            "account_roi_percent": self.account_roi_percent,
+            "position_currency": self.position_currency,
+            "position_acquisition_price": self.position_acquisition_price,
+            "position_market_price": self.position_market_price,
+            "position_market_value": self.position_market_value,
+            "position_morning_price": self.position_morning_price,
+            "stale": self.stale,
+        }
+
+    def price_attributes(self) -> dict:
+        """
+        The values changing with the market price, attributes of the market price sensor in the
+        compact and numeric profiles. The account market value is the state of the stock sensor
+        """
+
+        return {
+            "account_roi": self.account_roi,
+            "account_roi_percent": self.account_roi_percent,
+            "position_market_value": self.position_market_value,
+            "position_morning_price": self.position_morning_price,
+        }
+
+    def to_raw(self) -> dict:
+        """
+        Convert back into the Nordnet API format, used for the holdings cache in HA storage
+        """
+
+        currency = self.position_currency.upper()
+
+        return {
+            'accid': self.account_id,
+            'accno': self.account_number,
+            'instrument': self.instrument,
+            'qty': self.quantity,
+            'main_market_price': {'currency': currency, 'value': self.position_market_price},
+            'morning_price': {'currency': currency, 'value': self.position_morning_price},
+            'market_value': {'currency': currency, 'value': self.position_market_value},
+            'acq_price': {'currency': currency, 'value': self.position_acquisition_price},
+            'market_value_acc': {'currency': self.account_currency.upper(), 'value': self.account_market_value},
+            'acq_price_acc': {'currency': self.account_currency.upper(), 'value': self.account_acquisition_price},
+        }
+
+    def with_market_price(self, price: float) -> "Position":
+        """
+        Copy of the position at a new market price, e.g. from the price feed
+
+        Market values are scaled by the price change, so the account market value
+        keeps the exchange rate of the last positions fetch
+        """
+
+        position = object.__new__(Position)
+        for slot in self.__slots__:
+            setattr(position, slot, getattr(self, slot))
+
+        if self.position_market_price:
+            change = price / self.position_market_price
+            position.account_market_value = self.account_market_value * change
+            position.position_market_value = self.position_market_value * change
+        else:
+            position.position_market_value = self.quantity * price
+
+        position.position_market_price = price
+        position._attributes = None
+        position._attributes_profile = None
+        position._compute_roi()
+
+        return position
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Position):
+            return NotImplemented
+
+        return all(getattr(self, key) == getattr(other, key) for key in self.ATTRIBUTES)
+
+    __hash__ = None
@@ -0,0 +1,158 @@
+"""
+On-demand profiling of refreshes, see the 'profile_refresh' service
+"""
+
+import cProfile
+import io
+import logging
+import pstats
+import tracemalloc
+from contextlib import contextmanager
+
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt
+
+from .const import (PROFILE_TOP_ALLOCATIONS, PROFILE_TOP_FUNCTIONS,
+                    PROFILE_TRACING_KEY)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class AllocationTracing:
+    """
+    Reference count of the profilers tracing memory allocations, shared by all config entries
+
+    Tracing is started by the first profiler and stopped once the last one is done, so profiling
+    several entries at once doesn't stop tracing under the others. Tracing started by someone
+    else, e.g. the 'profiler' integration, is never stopped
+    """
+
+    def __init__(self):
+        self._users: int = 0
+        self._started: bool = False
+
+    def acquire(self) -> None:
+        if self._users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started = True
+
+        self._users += 1
+
+    def release(self) -> None:
+        self._users -= 1
+
+        if self._users == 0 and self._started:
+            tracemalloc.stop()
+            self._started = False
+
+
+def get_allocation_tracing(hass: HomeAssistant) -> AllocationTracing:
+    """
+    The allocation tracing shared by all Nordnet profilers
+    """
+
+    return hass.data.setdefault(PROFILE_TRACING_KEY, AllocationTracing())
+
+
+class RefreshProfiler:
+    """
+    CPU profile and memory allocations of the next `refreshes` refreshes of a coordinator
+
+    The CPU profile covers everything running in the event loop while a refresh is in
+    progress, so other integrations can show up in it too. Allocations are traced from
+    the moment profiling starts until the report is written or the profiler is discarded
+    """
+
+    def __init__(self, hass: HomeAssistant, name: str, refreshes: int):
+        self._hass: HomeAssistant = hass
+        self._name: str = name
+        self._profile: cProfile.Profile = cProfile.Profile()
+        self._remaining: int = refreshes
+        self._refreshes: int = refreshes
+        self._profiled: int = 0
+
+        # true while a refresh is being profiled
+        self.active: bool = False
+
+        self._tracing: AllocationTracing = get_allocation_tracing(hass)
+        self._tracing.acquire()
+        self._released: bool = False
+
+    @property
+    def done(self) -> bool:
+        return self._remaining <= 0
+
+    def expire(self) -> None:
+        """
+        Stop after the refresh in progress, if any, e.g. when no refreshes happen within PROFILE_TIMEOUT
+        """
+
+        self._remaining = 0
+
+    @contextmanager
+    def profile(self):
+        try:
+            self._profile.enable()
+        except ValueError:
+            # only one profiler can be active at a time, e.g. when refreshes of several entries overlap
+            _LOGGER.debug("Another profiler is active, refresh is not profiled")
+            self._remaining -= 1
+            yield
+            return
+
+        self.active = True
+        try:
+            yield
+        finally:
+            self._profile.disable()
+            self.active = False
+            self._remaining -= 1
+            self._profiled += 1
+
+    def discard(self) -> None:
+        """
+        Stop tracing allocations without writing a report, e.g. when the config entry is unloaded
+        """
+
+        if not self._released:
+            self._released = True
+            self._tracing.release()
+
+    async def async_write_report(self) -> str:
+        """
+        Write the report to the config dir, returns the path of the report
+        """
+
+        path = self._hass.config.path(f"nordnet_profile_{self._name}_{dt.now().strftime('%Y%m%d_%H%M%S')}")
+
+        # taking the allocation snapshot and formatting the report are too slow for the event loop.
+        # Tracing is only released afterwards, so other profilers can't stop it during the snapshot
+        try:
+            await self._hass.async_add_executor_job(self._write_report, path)
+        finally:
+            self.discard()
+
+        cpu_profile = f" (and {path}.prof for e.g. snakeviz)" if self._profiled else ""
+        _LOGGER.warning(f"Profile of {self._profiled} of {self._refreshes} refreshes written to {path}.txt{cpu_profile}")
+        return path
+
+    def _write_report(self, path: str) -> None:
+        # tracing can still be stopped by someone else, e.g. the 'profiler' integration
+        allocations = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+
+        report = io.StringIO()
+        report.write(f"CPU profile of {self._profiled} of {self._refreshes} refreshes, by cumulative time\n\n")
+
+        if self._profiled:
+            self._profile.dump_stats(f"{path}.prof")
+            pstats.Stats(self._profile, stream=report).sort_stats(pstats.SortKey.CUMULATIVE).print_stats(PROFILE_TOP_FUNCTIONS)
+
+        report.write("\nLargest memory allocations, by line\n\n")
+        if allocations is None:
+            report.write("Memory allocations were not traced, tracing was stopped outside of Nordnet\n")
+        else:
+            for stat in allocations.statistics("lineno")[:PROFILE_TOP_ALLOCATIONS]:
+                report.write(f"{stat}\n")
+
+        with open(f"{path}.txt", "w") as file:
+            file.write(report.getvalue())
@@ -5,39 +5,214 @@ import logging
 from homeassistant.components.sensor import SensorEntity
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.entity import Entity, EntityCategory
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
-from .const import DOMAIN, PLATFORM
+from .const import (ACTIVITY_CONTEXT, ATTRIBUTE_PROFILE_FULL,
+                    ATTRIBUTE_PROFILE_NUMERIC, DOMAIN, PLATFORM,
+                    PORTFOLIO_CONTEXT)
+from .position import Position
+from .snapshot import HoldingsSnapshot
 
 _LOGGER = logging.getLogger(__name__)
 
 
+def stock_unique_id(account_id: int, instrument_id: int) -> str:
+    """
+    Unique id of the stock sensor of a position, symbols aren't used since they collide across markets
+    """
+
+    return f"nordnet_stock_{account_id}_{instrument_id}"
+
+
+def price_unique_id(account_id: int, instrument_id: int) -> str:
+    """
+    Unique id of the market price sensor of a position, in the compact and numeric attribute profiles
+    """
+
+    return f"nordnet_price_{account_id}_{instrument_id}"
+
+
+def numeric_attributes(attributes: dict) -> dict:
+    """
+    Only the numeric (or missing) values, for the numeric attribute profile
+    """
+
+    return {
+        key: value
+        for key, value in attributes.items()
+        if value is None or (isinstance(value, (int, float)) and not isinstance(value, bool))
+    }
+
+
+def symbol_stock_unique_id(account_id: int, symbol: str) -> str:
+    """
+    Unique id stock sensors had before config entry version 6, built from the symbol
+    """
+
+    return "nordnet_stock_{}_{}".format(account_id, symbol.replace(' ', '_')).lower()
+
+
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities):
     _LOGGER.debug(f"async_setup_entry called for entry '{entry.title}' (sensor.py)")
 
     coordinator = hass.data[DOMAIN][entry.entry_id]
 
-    await coordinator.async_config_entry_first_refresh()
+    if await coordinator.async_load_cached_holdings():
+        # create entities from the cached holdings right away, and fetch live data in the background
+        hass.async_create_task(coordinator.async_refresh())
+    else:
+        await coordinator.async_config_entry_first_refresh()
+
+    entities = NordnetEntities(hass, coordinator, async_add_entities)
+
+    # registered before any entity, so new and sold positions are handled before entities are notified
+    entry.async_on_unload(coordinator.async_add_listener(entities.async_sync, PORTFOLIO_CONTEXT))
+
+    entities.async_sync()
+    async_add_entities([NordnetRefreshLatency(entry.entry_id, coordinator)])
+
+    if coordinator.config["reporting_currency"]:
+        async_add_entities([NordnetReportingTotal(entry.entry_id, coordinator)])
+
+
+class NordnetEntities:
+    """
+    Keeps the position and portfolio entities in sync with the holdings
+
+    On every refresh where a position changed, entities are added in one batch for
+    new positions (and accounts), and entities of sold positions are removed, without
+    reloading the config entry
+    """
+
+    def __init__(self, hass: HomeAssistant, coordinator, async_add_entities):
+        self._hass: HomeAssistant = hass
+        self._coordinator = coordinator
+        self._async_add_entities = async_add_entities
+
+        self._stocks: dict = {}
+        self._prices: dict = {}
+        self._portfolios: dict = {}
+        self._orders: dict = {}
+        self._snapshot: HoldingsSnapshot = None
+
+    @callback
+    def async_sync(self) -> None:
+        snapshot = self._coordinator.data
+
+        if snapshot is None or snapshot is self._snapshot:
+            return
+
+        self._snapshot = snapshot
+
+        sensors = []
+
+        # the compact and numeric profiles split the values changing with the price out into a sensor of their own
+        split = self._coordinator.config["attribute_profile"] != ATTRIBUTE_PROFILE_FULL
+        stock_class = NordnetCompactStock if split else NordnetStock
+
+        for key in snapshot.by_key.keys() - self._stocks.keys():
+            sensor = self._stocks[key] = stock_class(snapshot.by_key[key], self._coordinator)
+            sensors.append(sensor)
+
+            self._async_migrate_unique_id(snapshot.by_key[key], sensor.unique_id)
+
+            _LOGGER.debug(f"Created sensor '{sensor.unique_id}'")
+
+            if split:
+                sensor = self._prices[key] = NordnetStockPrice(snapshot.by_key[key], self._coordinator)
+                sensors.append(sensor)
+
+                _LOGGER.debug(f"Created sensor '{sensor.unique_id}'")
 
-    sensors = []
-    for holding in coordinator.holdings():
-        sensor = NordnetStock(dict(holding), coordinator)
-        sensors.append(sensor)
+        account_ids = set(self._coordinator.account_ids())
 
-        _LOGGER.debug(f"Created sensor '{sensor.unique_id}'")
+        # only configured accounts, the snapshot can still hold positions of removed accounts
+        for account_id in (self._coordinator.portfolios().keys() & account_ids) - self._portfolios.keys():
+            self._portfolios[account_id] = [NordnetPortfolio(account_id, metric, self._coordinator) for metric in NordnetPortfolio.METRICS]
+            self._portfolios[account_id].extend(NordnetPortfolioAnalytics(account_id, metric, self._coordinator) for metric in NordnetPortfolioAnalytics.metrics(self._coordinator))
+            sensors.extend(self._portfolios[account_id])
 
-    async_add_entities(sensors, True)
+            _LOGGER.debug(f"Created portfolio sensors for account {account_id}")
+
+        if self._coordinator.activity is not None:
+            for account_id in account_ids - self._orders.keys():
+                sensor = self._orders[account_id] = NordnetOpenOrders(account_id, self._coordinator)
+                sensors.append(sensor)
+
+                _LOGGER.debug(f"Created sensor '{sensor.unique_id}'")
+
+        # only live holdings tell that a position was sold
+        if not snapshot.stale:
+            for key in self._stocks.keys() - snapshot.by_key.keys():
+                self._async_retire(self._stocks.pop(key))
+
+                if key in self._prices:
+                    self._async_retire(self._prices.pop(key))
+
+        # accounts can be removed in the options, accounts without positions keep their sensors
+        for account_id in self._portfolios.keys() - account_ids:
+            for sensor in self._portfolios.pop(account_id):
+                self._async_retire(sensor)
+
+        for account_id in self._orders.keys() - account_ids:
+            self._async_retire(self._orders.pop(account_id))
+
+        # entities already have their data, no need to refresh each one before adding it
+        if sensors:
+            self._async_add_entities(sensors)
+
+    @callback
+    def _async_migrate_unique_id(self, position: Position, unique_id: str) -> None:
+        """
+        Move the entity of a position from its symbol based unique_id, for positions that
+        weren't in the cached holdings when the config entry was migrated to version 6
+        """
+
+        registry = er.async_get(self._hass)
+
+        entity_id = registry.async_get_entity_id(PLATFORM, DOMAIN, symbol_stock_unique_id(position.account_id, position.symbol))
+        if entity_id is None or registry.async_get_entity_id(PLATFORM, DOMAIN, unique_id) is not None:
+            return
+
+        _LOGGER.info(f"Migrating unique_id of '{entity_id}' to '{unique_id}'")
+        registry.async_update_entity(entity_id, new_unique_id=unique_id)
+
+    @callback
+    def _async_retire(self, entity: Entity) -> None:
+        """
+        Remove the entity from HA and the entity registry
+        """
+
+        _LOGGER.info(f"Removing sensor '{entity.unique_id}', no longer held")
+
+        if entity.registry_entry is not None:
+            er.async_get(self._hass).async_remove(entity.entity_id)
+        elif entity.hass is not None:
+            self._hass.async_create_task(entity.async_remove(force_remove=True))
 
 
 class NordnetStock(CoordinatorEntity, SensorEntity):
 
-    def __init__(self, holding, coordinator):
-        super().__init__(coordinator)
+    def __init__(self, position: Position, coordinator):
+        # the position key is used as listener context, so the coordinator
+        # only wakes this entity when its position changed
+        super().__init__(coordinator, context=position.key)
+
+        self._position = position
+        self._profile = coordinator.config["attribute_profile"]
+        self._name = f"Stock price for {position.name} ({position.symbol})"
+        self._unique_id = stock_unique_id(position.account_id, position.instrument_id)
+        self._key = position.key
 
-        self._attributes = self._remap(holding)
-        self._name = f"Stock price for {self._attributes['instrument']['name']} ({self._attributes['instrument']['symbol']})"
-        self._unique_id = "nordnet_stock_{}".format(self._attributes['instrument']['symbol'].replace(' ', '_')).lower()
-        self._symbol = self._attributes['instrument']['symbol']
+        # attributes merged with intraday stats, staleness and reporting values, built on
+        # the first read after each update instead of on every read
+        self._attributes = None
+
+        # names would collide across accounts holding the same instrument
+        if len(coordinator.account_ids()) > 1:
+            self._name = f"{self._name} in account {position.account_id}"
 
     @property
     def name(self):
@@ -49,19 +224,57 @@ class NordnetStock(CoordinatorEntity, SensorEntity):
 
     @property
     def state(self):
-        return self._attributes['account_market_value']
+        return self._position.account_market_value
 
     @property
     def state_class(self):
         return "measurement"
 
+    @property
+    def available(self):
+        return self.coordinator.is_data_usable()
+
     @property
     def extra_state_attributes(self):
-        return dict(self._attributes)
+        if self._attributes is None:
+            self._attributes = self._merge_attributes()
+
+        return self._attributes
+
+    def _merge_attributes(self):
+        """
+        Everything merged into the attributes only changes when the coordinator notifies this
+        entity: prices and intraday stats with the position, staleness on failed refreshes,
+        and reporting values on full updates
+        """
+
+        stats = self.coordinator.intraday(self._position.instrument_id)
+        staleness = self.coordinator.staleness_attributes()
+        reporting = self.coordinator.reporting()
+
+        # converted once per snapshot by the coordinator, for all positions
+        converted = reporting.positions.get(self._key) if reporting is not None else None
+
+        attributes = self._position.attributes_for(self._profile)
+
+        # read-only view shared with the position record, no copy per read
+        if stats is None and not staleness and converted is None:
+            return attributes
+
+        attributes = dict(attributes)
+
+        if stats is not None:
+            attributes.update(stats.attributes(self._position.position_morning_price))
+
+        if converted is not None:
+            attributes.update(converted)
+
+        attributes.update(staleness)
+        return attributes
 
     @property
     def native_unit_of_measurement(self):
-        return self.coordinator.account_currency().upper()
+        return self._position.account_currency.upper()
 
     @property
     def device_class(self):
@@ -81,72 +294,425 @@ class NordnetStock(CoordinatorEntity, SensorEntity):
         Called by the coordinater every time there are new data fetched from Nordnet API
         """
 
-        new = self.coordinator.holding_for_symbol(self._symbol)
+        new = self.coordinator.holding(self._key)
         if new is None:
-            _LOGGER.error(f"Could not find any new data for {self.unique_id}")
+            # the position was sold, the entity is being removed
             return
 
-        self._attributes = self._remap(new)
+        self._position = new
+        self._attributes = None
         self.async_write_ha_state()
 
-    def _remap(self, input) -> dict:
-        """
-        Change the raw Nordnet API response into a more flat dictionary where possible
-        to ease use in templates, and allow the 'datadog' integration to emit metrics
-        for all the numeric values automatically
 
-        Also adds some basic ROI attributes that are kinda best-effort based on the
-        data made available via the API response
-        """
+class NordnetCompactStock(NordnetStock):
+    """
+    Stock sensor of the compact and numeric attribute profiles
+
+    The values changing with the price are attributes of the NordnetStockPrice sensor of the
+    position instead, so the attributes of this sensor only change when e.g. the quantity
+    does, and the recorder stores them once instead of on every refresh
+    """
+
+    def _merge_attributes(self):
+        attributes = self._position.attributes_for(self._profile)
+        staleness = self.coordinator.staleness_attributes()
+
+        if not staleness:
+            return attributes
+
+        attributes = {**attributes, **staleness}
+
+        if self._profile == ATTRIBUTE_PROFILE_NUMERIC:
+            return numeric_attributes(attributes)
+
+        return attributes
+
+
+class NordnetStockPrice(NordnetStock):
+    """
+    Market price of a position in the compact and numeric attribute profiles, with the values
+    changing along with it (ROI, market value, intraday statistics and reporting values) as
+    attributes. Only these few values are stored by the recorder on every price change, and
+    their history is kept
+    """
+
+    def __init__(self, position: Position, coordinator):
+        super().__init__(position, coordinator)
+
+        self._name = f"Market price for {position.name} ({position.symbol})"
+        self._unique_id = price_unique_id(position.account_id, position.instrument_id)
+
+        if len(coordinator.account_ids()) > 1:
+            self._name = f"{self._name} in account {position.account_id}"
+
+    @property
+    def state(self):
+        return self._position.position_market_price
+
+    @property
+    def native_unit_of_measurement(self):
+        return self._position.position_currency.upper()
+
+    @property
+    def icon(self):
+        return "mdi:chart-line"
+
+    def _merge_attributes(self):
+        stats = self.coordinator.intraday(self._position.instrument_id)
+        reporting = self.coordinator.reporting()
+        converted = reporting.positions.get(self._key) if reporting is not None else None
+
+        attributes = self._position.price_attributes()
+
+        if stats is not None:
+            attributes.update(stats.attributes(self._position.position_morning_price))
+
+        if converted is not None:
+            attributes.update(converted)
+
+        attributes.update(self.coordinator.staleness_attributes())
+
+        if self._profile == ATTRIBUTE_PROFILE_NUMERIC:
+            return numeric_attributes(attributes)
+
+        return attributes
+
+
+class NordnetPortfolio(CoordinatorEntity, SensorEntity):
+    """
+    Account level aggregate maintained by the coordinator, replacing template
+    sensors that iterate every stock entity on every state change
+    """
+
+    METRICS = {
+        "market_value": "market value",
+        "roi": "ROI",
+        "roi_percent": "ROI percent",
+    }
+
+    def __init__(self, account_id: int, metric: str, coordinator):
+        # notified by the coordinator whenever any position changed
+        super().__init__(coordinator, context=PORTFOLIO_CONTEXT)
+
+        self._account_id = account_id
+        self._metric = metric
+        self._name = f"Nordnet account {account_id} {self.METRICS[metric]}"
+        self._unique_id = f"nordnet_portfolio_{account_id}_{metric}"
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def unique_id(self):
+        return self._unique_id
+
+    @property
+    def available(self):
+        return self.coordinator.is_data_usable() and self.coordinator.portfolio(self._account_id) is not None
+
+    @property
+    def state(self):
+        return getattr(self.coordinator.portfolio(self._account_id), self._metric)
+
+    @property
+    def state_class(self):
+        return "measurement"
+
+    @property
+    def extra_state_attributes(self):
+        portfolio = self.coordinator.portfolio(self._account_id)
+
+        if self._metric != "market_value":
+            return {"account_id": self._account_id, **self.coordinator.staleness_attributes()}
+
+        reporting = self.coordinator.reporting()
+
+        return {
+            "account_id": self._account_id,
+            "circuit_breaker": self.coordinator.circuit_breaker_state(),
+            "update_interval": self.coordinator.update_interval_seconds(),
+            "positions": len(portfolio),
+            "currency_exposure": dict(portfolio.currency_exposure),
+            "weights": portfolio.weights(),
+            **((reporting.accounts.get(self._account_id) or {}) if reporting is not None else {}),
+        }
+
+    @property
+    def native_unit_of_measurement(self):
+        if self._metric == "roi_percent":
+            return "%"
+
+        # the totals are gone while e.g. the account is being removed, keep the unit of the account
+        portfolio = self.coordinator.portfolio(self._account_id)
+        currency = portfolio.account_currency if portfolio is not None else self.coordinator.account_currency(self._account_id)
 
-        # the native currency of the position (e.g. USD, NOK, SEK)
-        # not to be confused with the account currency
-        ncur = input['main_market_price']['currency'].lower()
+        return currency.upper() if currency else None
 
-        # make a copy before modifying it
-        input = dict(input)
-        input['position_currency'] = ncur
-        input['account_currency'] = self.coordinator.account_currency()
+    @property
+    def device_class(self):
+        if self._metric == "roi_percent":
+            return None
+
+        return "monetary"
+
+    @property
+    def icon(self):
+        return "mdi:chart-line" if self._metric == "roi_percent" else "mdi:cash-multiple"
+
+
+class NordnetReportingTotal(CoordinatorEntity, SensorEntity):
+    """
+    Market value of all accounts of the entry in the reporting currency, with the ROI and
+    the market value of each account as attributes
+    """
+
+    def __init__(self, entry_id: str, coordinator):
+        # notified by the coordinator whenever any position changed
+        super().__init__(coordinator, context=PORTFOLIO_CONTEXT)
+
+        self._currency = coordinator.config["reporting_currency"]
+        self._name = f"Nordnet total market value ({coordinator.config['username']})"
+        self._unique_id = f"nordnet_total_market_value_{entry_id}"
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def unique_id(self):
+        return self._unique_id
+
+    @property
+    def available(self):
+        return self.coordinator.is_data_usable() and self.coordinator.reporting() is not None
+
+    @property
+    def state(self):
+        return self.coordinator.reporting().market_value
+
+    @property
+    def state_class(self):
+        return "measurement"
+
+    @property
+    def extra_state_attributes(self):
+        reporting = self.coordinator.reporting()
+
+        return {
+            **self.coordinator.staleness_attributes(),
+            "roi": reporting.roi,
+            "roi_percent": reporting.roi_percent,
+            "accounts": {account_id: values["reporting_market_value"] for account_id, values in reporting.accounts.items()},
+            "unconverted_currencies": sorted(reporting.unconverted),
+        }
+
+    @property
+    def native_unit_of_measurement(self):
+        return self._currency.upper()
+
+    @property
+    def device_class(self):
+        return "monetary"
+
+    @property
+    def icon(self):
+        return "mdi:cash-multiple"
+
+
+class NordnetPortfolioAnalytics(CoordinatorEntity, SensorEntity):
+    """
+    Concentration, volatility and beta of an account, computed by the coordinator once per snapshot
+    """
+
+    METRICS = {
+        "concentration": "concentration",
+        "volatility": "volatility",
+        "beta": "beta",
+    }
+
+    @classmethod
+    def metrics(cls, coordinator) -> list:
+        # beta is only computed against a configured benchmark
+        return [metric for metric in cls.METRICS if metric != "beta" or coordinator.config["benchmark_instrument_id"] is not None]
+
+    def __init__(self, account_id: int, metric: str, coordinator):
+        # notified by the coordinator whenever any position changed
+        super().__init__(coordinator, context=PORTFOLIO_CONTEXT)
+
+        self._account_id = account_id
+        self._metric = metric
+        self._name = f"Nordnet account {account_id} {self.METRICS[metric]}"
+        self._unique_id = f"nordnet_portfolio_{account_id}_{metric}"
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def unique_id(self):
+        return self._unique_id
+
+    @property
+    def available(self):
+        return self.coordinator.is_data_usable() and self.coordinator.analytics(self._account_id) is not None
+
+    @property
+    def state(self):
+        analytics = self.coordinator.analytics(self._account_id)
+
+        # Herfindahl-Hirschman index, on the usual 0 - 10.000 scale
+        if self._metric == "concentration":
+            return round(analytics["hhi"] * 10000)
+
+        return analytics[self._metric]
+
+    @property
+    def state_class(self):
+        return "measurement"
+
+    @property
+    def extra_state_attributes(self):
+        analytics = self.coordinator.analytics(self._account_id)
+
+        if self._metric == "beta":
+            return {"account_id": self._account_id, "benchmark_instrument_id": self.coordinator.config["benchmark_instrument_id"], **self.coordinator.staleness_attributes()}
+
+        if self._metric == "volatility":
+            return {"account_id": self._account_id, **self.coordinator.staleness_attributes()}
+
+        return {
+            "account_id": self._account_id,
+            "effective_positions": analytics["effective_positions"],
+            "top_weight": analytics["top_weight"],
+            "allocation_by_currency": analytics["allocation_by_currency"],
+            "allocation_by_market": analytics["allocation_by_market"],
+            "allocation_by_instrument_type": analytics["allocation_by_instrument_type"],
+        }
+
+    @property
+    def native_unit_of_measurement(self):
+        return "%" if self._metric == "volatility" else None
+
+    @property
+    def icon(self):
+        if self._metric == "beta":
+            return "mdi:scale-balance"
+
+        return "mdi:chart-bell-curve" if self._metric == "volatility" else "mdi:chart-pie"
+
+
+class NordnetOpenOrders(CoordinatorEntity, SensorEntity):
+    """
+    Number of open orders in an account, with the orders as attributes
+
+    Changes to orders and new transactions are also fired as 'nordnet_order' and 'nordnet_transaction' events
+    """
+
+    def __init__(self, account_id: int, coordinator):
+        # notified after every sync of transactions and orders
+        super().__init__(coordinator, context=ACTIVITY_CONTEXT)
+
+        self._account_id = account_id
+        self._name = f"Nordnet account {account_id} open orders"
+        self._unique_id = f"nordnet_orders_{account_id}"
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def unique_id(self):
+        return self._unique_id
+
+    @property
+    def state(self):
+        return len(self.coordinator.activity.open_orders(self._account_id))
+
+    @property
+    def state_class(self):
+        return "measurement"
 
-        # (account) market value
-        input['account_market_value'] = input['market_value_acc']['value']
-        input['position_market_value'] = input['market_value']['value']
-        del input['market_value_acc']
-        del input['market_value']
+    @property
+    def available(self):
+        return self.coordinator.is_data_usable()
 
-        # acquisition price
-        input['account_acquisition_price'] = input['acq_price_acc']['value']
-        input['position_acquisition_price'] = input['acq_price']['value']
-        del input['acq_price_acc']
-        del input['acq_price']
+    @property
+    def extra_state_attributes(self):
+        return {
+            "account_id": self._account_id,
+            "orders": [
+                {
+                    "order_id": order["order_id"],
+                    "state": order["order_state"],
+                    "side": order.get("side"),
+                    "volume": order.get("volume"),
+                    "traded_volume": order.get("traded_volume"),
+                    "price": (order.get("price") or {}).get("value"),
+                }
+                for order in self.coordinator.activity.open_orders(self._account_id)
+            ],
+            **self.coordinator.staleness_attributes(),
+        }
 
-        # morning price
-        input['position_morning_price'] = input['morning_price']['value']
-        del input['morning_price']
+    @property
+    def icon(self):
+        return "mdi:clipboard-list-outline"
 
-        # main_market_price
-        input['position_market_price'] = input['main_market_price']['value']
-        del input['main_market_price']
 
-        # rename qty field
-        input['quantity'] = input['qty']
-        del input['qty']
+class NordnetRefreshLatency(CoordinatorEntity, SensorEntity):
+    """
+    p95 duration of refreshes from Nordnet API, with the p95 of each stage as attributes
 
-        # compute Return On Investment (in account currency)
-        input['account_roi'] = input['account_market_value'] - (input['quantity'] * input['account_acquisition_price'])
+    Disabled by default, enable it to watch refresh latency in production
+    """
 
-        # compute Return On Investment %
-        input['account_roi_percent'] = (input['position_market_price'] - input['position_acquisition_price']) / input['position_acquisition_price'] * 100
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
 
-        input['account_number'] = input['accno']
-        del input['accno']
+    def __init__(self, entry_id: str, coordinator):
+        super().__init__(coordinator)
 
-        input['account_id'] = input['accid']
-        del input['accid']
+        self._name = f"Nordnet refresh latency ({coordinator.config['username']})"
+        self._unique_id = f"nordnet_refresh_latency_{entry_id}"
 
-        # cleanup things we don't care about
-        del input['is_custom_gav']
-        del input['margin_percent']
-        del input['pawn_percent']
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def unique_id(self):
+        return self._unique_id
+
+    @property
+    def state(self):
+        p95 = self.coordinator.metrics.stages["total"].percentile(95)
+        return round(p95, 1) if p95 is not None else None
 
-        return input
+    @property
+    def state_class(self):
+        return "measurement"
+
+    @property
+    def native_unit_of_measurement(self):
+        return "ms"
+
+    @property
+    def available(self):
+        return self.coordinator.is_data_usable()
+
+    @property
+    def extra_state_attributes(self):
+        metrics = self.coordinator.metrics
+
+        attributes = {f"{stage}_p95": histogram.percentile(95) for stage, histogram in metrics.stages.items()}
+        attributes.update(metrics.counters)
+        attributes["circuit_breaker"] = self.coordinator.circuit_breaker_state()
+        attributes["update_interval"] = self.coordinator.update_interval_seconds()
+        attributes.update(self.coordinator.staleness_attributes())
+
+        return attributes
+
+    @property
+    def icon(self):
+        return "mdi:timer-outline"
@@ -0,0 +1,426 @@
+"""
+The session manager is responsible for logging in to Nordnet and keeping the
+authenticated HTTP session alive across refreshes and Home Assistant restarts
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from http.cookies import SimpleCookie
+from typing import Callable
+
+import aiohttp
+from homeassistant.const import EVENT_HOMEASSISTANT_CLOSE
+from homeassistant.core import Event, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_point_in_utc_time
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt
+from homeassistant.util.ssl import client_context
+from yarl import URL
+
+from .const import (CONNECTION_KEEPALIVE_TIMEOUT, CONNECTION_POOL_LIMIT,
+                    DEFAULT_HEADERS, SESSION_RENEW_AHEAD,
+                    SESSION_STORAGE_VERSION)
+from .metrics import RefreshMetrics
+from .throttle import get_rate_limiter
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class NordnetSession:
+    """
+    Owns the authenticated HTTP session for a single set of Nordnet credentials
+
+    * cookies are persisted in HA storage so a restart can reuse a still valid session
+    * concurrent callers needing a login share a single in-flight login
+    * the session is renewed in the background before it expires when a refresh is due
+      before then, so the login doesn't happen on the refresh path
+    * all sessions share one bounded keep-alive connection pool, and superseded
+      sessions are closed so they don't leak sockets
+    """
+
+    def __init__(self, hass: HomeAssistant, base_url: str, username: str, password: str, session_lifetime: timedelta,
+                 metrics: RefreshMetrics, store_key: str = None, next_request_at: Callable[[], datetime] = None):
+        self._hass: HomeAssistant = hass
+        self._metrics: RefreshMetrics = metrics
+        self._limiter = get_rate_limiter(hass)
+        self._base_url: str = base_url
+        self._username: str = username
+        self._password: str = password
+        self._session_lifetime: timedelta = session_lifetime
+
+        # config flow validation runs without a config entry and does not persist anything
+        self._store: Store = Store(hass, SESSION_STORAGE_VERSION, store_key, private=True) if store_key else None
+        self._restored: bool = False
+
+        self._connector: aiohttp.TCPConnector = None
+        self._unsub_close = None
+        self._session: aiohttp.ClientSession = None
+        self._session_created_at: datetime = None
+
+        # session key and public feed address from the login response, used by the price feed
+        self._feed_details: dict = None
+
+        self._login_task: asyncio.Task = None
+        self._unsub_renewal = None
+
+        # when the next refresh is scheduled, None if none is. Without it the session is always renewed
+        self._next_request_at: Callable[[], datetime] = next_request_at
+
+        # bumped by invalidate(), so callers waiting for a cancelled login know to log in again
+        self._generation: int = 0
+
+    @callback
+    def update_credentials(self, base_url: str, username: str, password: str, session_lifetime: timedelta) -> None:
+        """
+        Update credentials made in HA UI, forcing a new login on next request
+        """
+
+        self._base_url = base_url
+        self._username = username
+        self._password = password
+        self._session_lifetime = session_lifetime
+
+        self.invalidate()
+
+    @callback
+    def invalidate(self) -> None:
+        """
+        Throw away the current session (and the persisted copy) so the next request logs in again
+        """
+
+        _LOGGER.debug("[session] Invalidating HTTP session")
+
+        # a login still in flight may use the old credentials, and must not replace the session afterwards
+        self._generation += 1
+        if self._login_task is not None:
+            self._login_task.cancel()
+            self._login_task = None
+
+        self._replace_session(None)
+        self._session_created_at = None
+        self._feed_details = None
+        self._cancel_renewal()
+
+        if self._store is not None:
+            self._hass.async_create_task(self._store.async_remove())
+
+    async def async_close(self) -> None:
+        """
+        Stop background renewal and close the session and all pooled connections,
+        called when the config entry is unloaded
+        """
+
+        self._cancel_renewal()
+
+        if self._login_task is not None:
+            self._login_task.cancel()
+
+        self._replace_session(None)
+
+        if self._unsub_close is not None:
+            self._unsub_close()
+            self._unsub_close = None
+
+        if self._connector is not None:
+            await self._connector.close()
+            self._connector = None
+
+    async def _async_close_on_stop(self, _event: Event) -> None:
+        """
+        Close all pooled connections when HA shuts down, which doesn't unload config entries
+        """
+
+        # listeners registered with async_listen_once are removed once they fire
+        self._unsub_close = None
+        await self.async_close()
+
+    def connection_stats(self) -> dict:
+        """
+        Number of open connections in the pool, to confirm steady state resource use over time
+        """
+
+        if self._connector is None or self._connector.closed:
+            return {"active": 0, "idle": 0, "limit_per_host": CONNECTION_POOL_LIMIT}
+
+        # aiohttp does not expose these counters publicly, so they're left out if its internals change
+        acquired = getattr(self._connector, "_acquired", None)
+        conns = getattr(self._connector, "_conns", None)
+
+        try:
+            active = len(acquired)
+        except TypeError:
+            active = None
+
+        try:
+            idle = sum(len(connections) for connections in conns.values())
+        except (AttributeError, TypeError):
+            idle = None
+
+        return {
+            "active": active,
+            "idle": idle,
+            "limit_per_host": self._connector.limit_per_host,
+        }
+
+    async def async_get(self) -> aiohttp.ClientSession:
+        """
+        Returns a HTTP Session containing all required Cookies for a making authenticated
+        api requests to the Nordnet API
+        """
+
+        if self._has_valid_session():
+            _LOGGER.debug("[session] Returning existing HTTP session")
+            return self._session
+
+        # after a restart, try to reuse the session persisted by the previous run
+        if not self._restored:
+            self._restored = True
+            await self._async_restore()
+
+            if self._has_valid_session():
+                _LOGGER.debug("[session] Returning HTTP session restored from storage")
+                return self._session
+
+        return await self._async_login_once()
+
+    async def async_get_feed_details(self) -> dict:
+        """
+        Returns the session key and public feed address ('hostname', 'port' and 'encrypted')
+        of the current session, logging in if needed
+        """
+
+        await self.async_get()
+
+        # sessions persisted by older versions don't have the feed details
+        if self._feed_details is None:
+            await self._async_login_once()
+
+        return self._feed_details
+
+    async def _async_login_once(self) -> aiohttp.ClientSession:
+        """
+        Collapse concurrent logins into a single in-flight login that all callers wait for
+        """
+
+        if self._login_task is None:
+            self._login_task = self._hass.async_create_task(self._async_login())
+            self._login_task.add_done_callback(self._login_done)
+        else:
+            _LOGGER.debug("[session] Waiting for in-flight login")
+
+        task = self._login_task
+        generation = self._generation
+
+        try:
+            # shield the shared login from cancellation of any single caller (e.g. timeouts)
+            return await asyncio.shield(task)
+
+        except asyncio.CancelledError:
+            # the login was cancelled by invalidate(), e.g. as the credentials changed, so log in again.
+            # Cancellation of this caller, or of the login by async_close(), is passed on
+            if task.cancelled() and generation != self._generation:
+                return await self._async_login_once()
+
+            raise
+
+    @callback
+    def _login_done(self, task: asyncio.Task) -> None:
+        # invalidate() may already have started over with a new login
+        if self._login_task is task:
+            self._login_task = None
+
+    async def _async_login(self) -> aiohttp.ClientSession:
+        """
+        Perform the two step login to Nordnet
+        """
+
+        _LOGGER.debug("[session] Creating new HTTP session")
+
+        session = self._create_session()
+
+        try:
+            with self._metrics.login_timer():
+                feed_details = await self._async_login_requests(session)
+
+        except BaseException:
+            # don't leak the half logged in session
+            await session.close()
+            raise
+
+        self._replace_session(session)
+        self._session_created_at = dt.utcnow()
+        self._feed_details = feed_details
+
+        self._schedule_renewal()
+        await self._async_persist()
+
+        _LOGGER.debug("[session] Returning the new HTTP session")
+        return self._session
+
+    async def _async_login_requests(self, session: aiohttp.ClientSession) -> dict:
+        """
+        The two step login, setting the login cookies on the session
+
+        Returns the session key and public feed address from the login response
+        """
+
+        # Setting cookies prior to login by visiting login page
+        _LOGGER.debug("[session] requesting website login page")
+        await self._limiter.acquire()
+        async with session.get(f"{self._base_url}/logind") as response:
+            _LOGGER.debug("[session] checking website login response")
+            response.raise_for_status()
+
+            # read the resposne but discard it
+            await response.text()
+            _LOGGER.debug("[session] website login OK")
+
+        # Actual login
+        _LOGGER.debug("[session] requesting API bastic auth login")
+        await self._limiter.acquire()
+        async with session.post(f"{self._base_url}/api/2/authentication/basic/login",
+                                data={'username': self._username, 'password': self._password},
+                                headers=DEFAULT_HEADERS) as response:
+            _LOGGER.debug("[session] checking API basic auth login reaponse")
+            response.raise_for_status()
+
+            login = await response.json(content_type=None)
+            _LOGGER.debug("[session] API bastic auth login OK")
+
+        if not isinstance(login, dict):
+            login = {}
+
+        return {"session_key": login.get("session_key"), "public_feed": login.get("public_feed")}
+
+    async def _async_renew(self, _now: datetime) -> None:
+        """
+        Log in again before the current session expires
+        """
+
+        self._unsub_renewal = None
+
+        # a login every session lifetime isn't needed while e.g. markets are closed, the next refresh logs in on demand
+        if self._next_request_at is not None:
+            next_request_at = self._next_request_at()
+            if next_request_at is None or next_request_at >= self._session_created_at + self._session_lifetime:
+                _LOGGER.debug("[session] No refresh due before the HTTP session expires, not renewing it")
+                return
+
+        _LOGGER.debug("[session] Renewing HTTP session ahead of expiry")
+
+        try:
+            await self._async_login_once()
+        except Exception as ex:
+            # the refresh path will log in on demand once the session expires
+            _LOGGER.warning(f"[session] Background renewal of HTTP session failed: {ex!r}")
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        """
+        Create a HTTP session with its own cookie jar on top of the shared connection pool
+        """
+
+        if self._connector is None or self._connector.closed:
+            self._connector = aiohttp.TCPConnector(
+                limit_per_host=CONNECTION_POOL_LIMIT,
+                keepalive_timeout=CONNECTION_KEEPALIVE_TIMEOUT,
+                ssl=client_context(),
+            )
+
+            # like the sessions of homeassistant.helpers.aiohttp_client, HA doesn't unload entries on shutdown
+            if self._unsub_close is None:
+                self._unsub_close = self._hass.bus.async_listen_once(EVENT_HOMEASSISTANT_CLOSE, self._async_close_on_stop)
+
+        # the session must not close the shared connector, it's closed in async_close()
+        return aiohttp.ClientSession(connector=self._connector, connector_owner=False)
+
+    @callback
+    def _replace_session(self, session: aiohttp.ClientSession) -> None:
+        """
+        Swap in a new session and close the superseded one
+        """
+
+        old, self._session = self._session, session
+
+        if old is not None and old is not session and not old.closed:
+            # requests already in flight on the old session keep using the shared
+            # connector, closing the session only releases its cookie jar
+            self._hass.async_create_task(old.close())
+
+    @callback
+    def _schedule_renewal(self) -> None:
+        self._cancel_renewal()
+
+        renew_at = self._session_created_at + self._session_lifetime - SESSION_RENEW_AHEAD
+        self._unsub_renewal = async_track_point_in_utc_time(self._hass, self._async_renew, renew_at)
+
+    @callback
+    def _cancel_renewal(self) -> None:
+        if self._unsub_renewal is not None:
+            self._unsub_renewal()
+            self._unsub_renewal = None
+
+    async def _async_persist(self) -> None:
+        """
+        Save the session cookies so the session can be reused after a restart
+        """
+
+        if self._store is None:
+            return
+
+        cookies = [
+            {"name": morsel.key, "value": morsel.value, "domain": morsel["domain"], "path": morsel["path"]}
+            for morsel in self._session.cookie_jar
+        ]
+
+        await self._store.async_save({
+            "base_url": self._base_url,
+            "username": self._username,
+            "created_at": self._session_created_at.isoformat(),
+            "cookies": cookies,
+            "feed": self._feed_details,
+        })
+
+    async def _async_restore(self) -> None:
+        """
+        Load a session persisted by a previous run, if it belongs to the same user and hasn't expired
+        """
+
+        if self._store is None:
+            return
+
+        data = await self._store.async_load()
+        if data is None or data.get("username") != self._username or data.get("base_url") != self._base_url:
+            return
+
+        created_at = dt.parse_datetime(data["created_at"])
+        if created_at is None or dt.utcnow() - created_at >= self._session_lifetime:
+            _LOGGER.debug("[session] Persisted HTTP session has expired")
+            return
+
+        cookies = SimpleCookie()
+        for item in data["cookies"]:
+            cookies[item["name"]] = item["value"]
+            cookies[item["name"]]["domain"] = item["domain"]
+            cookies[item["name"]]["path"] = item["path"]
+
+        session = self._create_session()
+        session.cookie_jar.update_cookies(cookies, URL(self._base_url))
+
+        self._replace_session(session)
+        self._session_created_at = created_at
+        self._feed_details = data.get("feed")
+        self._schedule_renewal()
+
+    def _has_valid_session(self) -> bool:
+        """
+        Check if the HTTP session has expired and needs renewal
+        """
+
+        # if we don't have a session, force creation of a new one
+        if self._session is None:
+            return False
+
+        # check the age of the session and compare with our session max age
+        age = dt.utcnow() - self._session_created_at
+        return age < self._session_lifetime
@@ -0,0 +1,80 @@
+"""
+Immutable snapshot of the holdings returned by a single fetch from the Nordnet API
+"""
+
+from datetime import datetime
+from types import MappingProxyType
+from typing import Iterable, Mapping
+
+from .position import Position
+
+
+class HoldingsSnapshot:
+    """
+    All positions from a single Nordnet API fetch, indexed once by position key
+    (account id, instrument id) and trading symbol so entities can look up their
+    position in constant time instead of scanning the raw response on every refresh
+
+    Symbols are not unique across markets or accounts, so entities should prefer the
+    position key lookup and only use the symbol index for display purposes
+
+    A stale snapshot is loaded from the HA storage cache on startup, and is
+    replaced as soon as the first live fetch from Nordnet API succeeds
+    """
+
+    __slots__ = ("positions", "by_key", "by_symbol", "mics", "fetched_at", "stale")
+
+    def __init__(self, positions: Iterable[Position], fetched_at: datetime, stale: bool = False):
+        positions = tuple(positions)
+        by_key = {}
+        by_symbol = {}
+        mics = set()
+
+        for position in positions:
+            by_key[position.key] = position
+
+            # first position wins, same as the old linear scan did
+            by_symbol.setdefault(position.symbol, position)
+
+            # the markets we hold positions in, used for scheduling refreshes
+            if position.mic is not None:
+                mics.add(position.mic)
+
+        self.positions: tuple = positions
+        self.by_key: Mapping[tuple, Position] = MappingProxyType(by_key)
+        self.by_symbol: Mapping[str, Position] = MappingProxyType(by_symbol)
+        self.mics: frozenset = frozenset(mics)
+        self.fetched_at: datetime = fetched_at
+        self.stale: bool = stale
+
+    def changed_keys(self, previous: "HoldingsSnapshot") -> frozenset:
+        """
+        Return the keys of all positions that differ from the previous snapshot,
+        including positions that was added or removed between the two
+        """
+
+        old = previous.by_key
+        new = self.by_key
+
+        # positions of unchanged accounts are reused between snapshots, so most of them are
+        # the very same object and don't need comparing field by field
+        changed = set()
+        for key, position in new.items():
+            previous_position = old.get(key)
+            if previous_position is not position and previous_position != position:
+                changed.add(key)
+
+        changed.update(key for key in old if key not in new)
+
+        return frozenset(changed)
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def __setattr__(self, name, value):
+        # allow assignments from __init__ only, the snapshot is shared between
+        # all entities and must never change after it has been created
+        if hasattr(self, name):
+            raise AttributeError(f"HoldingsSnapshot is immutable, can't change '{name}'")
+
+        super().__setattr__(name, value)
@@ -0,0 +1,153 @@
+"""
+Process-wide protection of the Nordnet API, shared by all coordinators
+
+* a token bucket spreading requests from all config entries over time
+* exponential backoff with jitter for transient errors
+* a circuit breaker that stops sending requests while Nordnet is down
+"""
+
+import asyncio
+import random
+from time import monotonic
+
+import aiohttp
+from homeassistant.core import HomeAssistant
+
+from .const import (BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT,
+                    CIRCUIT_BREAKER_KEY, RATE_LIMIT_BURST,
+                    RATE_LIMIT_PER_SECOND, RATE_LIMITER_KEY,
+                    RETRY_BACKOFF_BASE, RETRY_BACKOFF_MAX)
+
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half_open"
+
+
+class TokenBucket:
+    """
+    Allows bursts of up to `capacity` requests, refilled at `rate` requests per second
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self._rate: float = rate
+        self._capacity: int = capacity
+        self._tokens: float = capacity
+        self._updated_at: float = monotonic()
+        self._lock: asyncio.Lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """
+        Wait until a request may be sent, waiters are served in order
+        """
+
+        async with self._lock:
+            self._refill()
+
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+                self._refill()
+
+            self._tokens -= 1
+
+    def _refill(self) -> None:
+        now = monotonic()
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated_at) * self._rate)
+        self._updated_at = now
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive transient failures, and stays open for
+    `reset_timeout` seconds. After that a single probe request is let through (half open),
+    closing the breaker again if it succeeds
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self._failure_threshold: int = failure_threshold
+        self._reset_timeout: float = reset_timeout
+        self._failures: int = 0
+        self._opened_at: float = None
+        self._probing: bool = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return BREAKER_CLOSED
+
+        if self._probing or monotonic() - self._opened_at >= self._reset_timeout:
+            return BREAKER_HALF_OPEN
+
+        return BREAKER_OPEN
+
+    def allow_request(self) -> bool:
+        state = self.state
+
+        if state == BREAKER_CLOSED:
+            return True
+
+        # let a single probe through to check if Nordnet is back
+        if state == BREAKER_HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+
+        return False
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def release_probe(self) -> None:
+        """
+        The probe ended without telling if Nordnet is back, e.g. it was cancelled,
+        so let the next request probe instead of blocking requests for good
+        """
+
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        self._probing = False
+
+        if self._failures >= self._failure_threshold:
+            self._opened_at = monotonic()
+
+
+def get_rate_limiter(hass: HomeAssistant) -> TokenBucket:
+    """
+    The token bucket shared by all Nordnet coordinators and sessions
+    """
+
+    return hass.data.setdefault(RATE_LIMITER_KEY, TokenBucket(RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST))
+
+
+def get_circuit_breaker(hass: HomeAssistant) -> CircuitBreaker:
+    """
+    The circuit breaker shared by all Nordnet coordinators
+    """
+
+    return hass.data.setdefault(CIRCUIT_BREAKER_KEY, CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT.total_seconds()))
+
+
+def is_transient(ex: Exception) -> bool:
+    """
+    Errors worth retrying, and that indicate Nordnet is struggling rather than e.g. bad credentials
+    """
+
+    if isinstance(ex, aiohttp.ClientResponseError):
+        return ex.status == 429 or ex.status >= 500
+
+    return isinstance(ex, (asyncio.TimeoutError, aiohttp.ClientConnectionError))
+
+
+def backoff_delay(attempt: int, ex: Exception = None) -> float:
+    """
+    Exponential backoff with full jitter, honoring Retry-After on 429 responses
+    """
+
+    if isinstance(ex, aiohttp.ClientResponseError) and ex.status == 429 and ex.headers:
+        retry_after = ex.headers.get("Retry-After")
+        if retry_after is not None and retry_after.isdigit():
+            return min(float(retry_after), RETRY_BACKOFF_MAX)
+
+    return random.uniform(0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * 2 ** attempt))
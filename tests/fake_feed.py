@@ -0,0 +1,131 @@
+"""
+Local stand-in of Nordnet's public price feed, to run the price feed of the integration against
+
+    python tests/fake_feed.py --port 9000 --tick 1 --drop-rate 0.01
+
+and set the price feed address of the integration to 'tcp://localhost:9000'. Speaks the same
+newline delimited JSON as the real feed: after a 'login' command, 'price' messages are pushed
+for every subscribed instrument, as a random walk starting at 100
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+
+_LOGGER = logging.getLogger("fake_feed")
+
+
+class FakeFeed:
+    """
+    Serves any number of connections, each with its own subscriptions
+
+    * tick: seconds between price messages of each subscription
+    * drop_rate: chance per tick that the connection is closed, to test reconnects
+    * garbage_rate: chance per tick that a malformed message is sent instead of a price
+    * reject_login: answer every login with an error, like an expired session key
+    """
+
+    def __init__(self, tick: float = 1.0, drop_rate: float = 0.0, garbage_rate: float = 0.0, reject_login: bool = False):
+        self.tick: float = tick
+        self.drop_rate: float = drop_rate
+        self.garbage_rate: float = garbage_rate
+        self.reject_login: bool = reject_login
+
+        # last price per (market id, identifier), shared by all connections
+        self.prices: dict = {}
+
+        self.logins: int = 0
+        self.connections: int = 0
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> asyncio.AbstractServer:
+        return await asyncio.start_server(self._handle, host, port)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        subscriptions = set()
+        ticker = None
+
+        try:
+            while line := await reader.readline():
+                command = json.loads(line)
+                args = command.get("args", {})
+
+                if command["cmd"] == "login":
+                    self.logins += 1
+
+                    if self.reject_login or not args.get("session_key"):
+                        self._send(writer, "err", {"msg": "NEXT_INVALID_SESSION"})
+                        await writer.drain()
+                        break
+
+                    self._send(writer, "heartbeat", {})
+                    ticker = asyncio.create_task(self._tick(writer, subscriptions))
+
+                elif command["cmd"] == "subscribe":
+                    subscriptions.add((args["m"], str(args["i"])))
+
+                elif command["cmd"] == "unsubscribe":
+                    subscriptions.discard((args["m"], str(args["i"])))
+
+        except (ConnectionError, ValueError, KeyError) as ex:
+            _LOGGER.info(f"Connection closed: {ex!r}")
+
+        finally:
+            if ticker is not None:
+                ticker.cancel()
+
+            writer.close()
+
+    async def _tick(self, writer: asyncio.StreamWriter, subscriptions: set) -> None:
+        while True:
+            await asyncio.sleep(self.tick)
+
+            if random.random() < self.drop_rate:
+                _LOGGER.info("Dropping connection")
+                writer.close()
+                return
+
+            if not subscriptions:
+                self._send(writer, "heartbeat", {})
+
+            for market_id, identifier in list(subscriptions):
+                if random.random() < self.garbage_rate:
+                    writer.write(b'["not", "a", "message"]\n')
+                    continue
+
+                price = self.prices.get((market_id, identifier), 100.0) * (1 + random.gauss(0, 0.001))
+                self.prices[(market_id, identifier)] = price
+
+                self._send(writer, "price", {"m": market_id, "i": identifier, "last": round(price, 4)})
+
+            await writer.drain()
+
+    @staticmethod
+    def _send(writer: asyncio.StreamWriter, message_type: str, data: dict) -> None:
+        writer.write(json.dumps({"type": message_type, "data": data}).encode() + b"\n")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--tick", type=float, default=1.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--garbage-rate", type=float, default=0.0)
+    parser.add_argument("--reject-login", action="store_true")
+    args = parser.parse_args()
+
+    feed = FakeFeed(args.tick, args.drop_rate, args.garbage_rate, args.reject_login)
+    server = await feed.start(args.host, args.port)
+
+    _LOGGER.info(f"Fake price feed listening on tcp://{args.host}:{args.port}")
+
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,282 @@
+"""
+Local stand-in of the Nordnet API, serving synthetic portfolios of any size
+
+    python tests/fake_nordnet.py --port 8080 --positions 500 --accounts 2 --latency 0.05 --error-rate 0.01
+
+and set the Nordnet website URL of the integration to 'http://localhost:8080'. Implements the
+login ('/logind' and '/api/2/authentication/basic/login'), and per account '/info', '/positions'
+(with ETag support), '/transactions' and '/orders', plus '/instruments/price/{ids}' and the daily
+prices of '/instruments/historical/prices/{id}'. Used by the benchmarks in benchmarks/ too
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import secrets
+from datetime import date, datetime, timedelta, timezone
+
+from aiohttp import web
+
+# markets known by the trading calendar of the integration, with the currency traded there
+MARKETS = (
+    ("XCSE", 11, "DKK"),
+    ("XSTO", 30, "SEK"),
+    ("XOSL", 15, "NOK"),
+    ("XHEL", 24, "EUR"),
+    ("XETR", 18, "EUR"),
+    ("XNAS", 19, "USD"),
+    ("XNYS", 20, "USD"),
+)
+
+# units of the account currency (DKK) per unit of each currency
+EXCHANGE_RATES = {"DKK": 1.0, "SEK": 0.65, "NOK": 0.64, "EUR": 7.46, "USD": 6.85}
+
+INSTRUMENT_TYPES = ("ESH", "FND", "ETF", "BND")
+
+
+def make_positions(count: int, accounts: int = 1, seed: int = 0) -> dict:
+    """
+    Synthetic positions in the raw Nordnet API format, spread over `accounts` accounts, keyed by account id
+    """
+
+    rng = random.Random(seed)
+    positions = {account_id: [] for account_id in range(1, accounts + 1)}
+
+    for i in range(count):
+        account_id = i % accounts + 1
+        mic, market_id, currency = MARKETS[i % len(MARKETS)]
+        instrument_id = 16000000 + i
+
+        price = round(rng.uniform(5, 500), 2)
+        acquisition_price = round(price * rng.uniform(0.5, 1.5), 2)
+        quantity = rng.randint(1, 500)
+        rate = EXCHANGE_RATES[currency]
+
+        positions[account_id].append({
+            "accid": account_id,
+            "accno": 10000000 + account_id,
+            "instrument": {
+                "instrument_id": instrument_id,
+                "symbol": f"SYM{i}",
+                "name": f"Instrument {i}",
+                "isin_code": f"DK{instrument_id:010d}",
+                "instrument_type": INSTRUMENT_TYPES[i % len(INSTRUMENT_TYPES)],
+                "currency": currency,
+                "tradables": [{"market_id": market_id, "identifier": str(instrument_id), "mic": mic, "tick_size_id": 1}],
+            },
+            "qty": quantity,
+            "main_market_price": {"currency": currency, "value": price},
+            "morning_price": {"currency": currency, "value": price},
+            "market_value": {"currency": currency, "value": round(price * quantity, 2)},
+            "acq_price": {"currency": currency, "value": acquisition_price},
+            "market_value_acc": {"currency": "DKK", "value": round(price * quantity * rate, 2)},
+            "acq_price_acc": {"currency": "DKK", "value": round(acquisition_price * rate, 2)},
+            "is_custom_gav": False,
+            "margin_percent": 0,
+            "pawn_percent": 0,
+        })
+
+    return positions
+
+
+def make_price_history(instrument_id: int, start: date, end: date) -> list:
+    """
+    Daily prices of an instrument on the weekdays between two days, a random walk seeded by the instrument id
+    """
+
+    rng = random.Random(instrument_id)
+    price = rng.uniform(10, 1000)
+    prices = []
+
+    day = start
+    while day <= end:
+        if day.weekday() < 5:
+            price = round(price * (1 + rng.gauss(0, 0.015)), 2)
+            time = int(datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp() * 1000)
+            prices.append({"time": time, "open": price, "high": price, "low": price, "last": price})
+
+        day += timedelta(days=1)
+
+    return prices
+
+
+class FakeNordnet:
+    """
+    Fake Nordnet API with adjustable portfolio size, latency and error rate
+
+    * positions: total number of positions, spread over `accounts` accounts
+    * latency: seconds added to every request, with up to 20% jitter
+    * error_rate: chance that a request fails with a 503 (or 429 every other time)
+    * change_rate: fraction of positions whose price moves between two positions requests
+    * feed: (hostname, port) of a price feed returned by the login, see fake_feed.py
+    """
+
+    def __init__(self, positions: int = 100, accounts: int = 1, latency: float = 0.0, error_rate: float = 0.0,
+                 change_rate: float = 1.0, feed: tuple = None, seed: int = 0):
+        self.latency: float = latency
+        self.error_rate: float = error_rate
+        self.change_rate: float = change_rate
+        self.feed: tuple = feed
+
+        self.positions: dict = make_positions(positions, accounts, seed)
+        self.sessions: set = set()
+
+        # requests served per path pattern, and number of logins
+        self.requests: dict = {}
+        self.logins: int = 0
+
+        self._rng: random.Random = random.Random(seed)
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_get("/logind", self._logind)
+        app.router.add_post("/api/2/authentication/basic/login", self._login)
+        app.router.add_get("/api/2/accounts/{account_id}/info", self._info)
+        app.router.add_get("/api/2/accounts/{account_id}/positions", self._positions)
+        app.router.add_get("/api/2/accounts/{account_id}/transactions", self._empty_list)
+        app.router.add_get("/api/2/accounts/{account_id}/orders", self._empty_list)
+        app.router.add_get("/api/2/instruments/price/{instrument_ids}", self._prices)
+        app.router.add_get("/api/2/instruments/historical/prices/{instrument_id}", self._historical_prices)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> tuple:
+        """
+        Start serving, returns the runner (to clean up) and the base URL
+        """
+
+        runner = web.AppRunner(self.app())
+        await runner.setup()
+
+        site = web.TCPSite(runner, host, port)
+        await site.start()
+
+        # the cookie jar of aiohttp ignores cookies of IP addresses, and the login relies on cookies
+        port = site._server.sockets[0].getsockname()[1]
+        return runner, f"http://{'localhost' if host == '127.0.0.1' else host}:{port}"
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler):
+        pattern = request.match_info.route.resource.canonical if request.match_info.route.resource else request.path
+        self.requests[pattern] = self.requests.get(pattern, 0) + 1
+
+        if self.latency:
+            await asyncio.sleep(self.latency * self._rng.uniform(0.8, 1.2))
+
+        if self.error_rate and self._rng.random() < self.error_rate:
+            status = 429 if self._rng.random() < 0.5 else 503
+            return web.Response(status=status, headers={"Retry-After": "1"} if status == 429 else None)
+
+        # everything but the login requires a logged in session
+        if request.path.startswith("/api/2/accounts") or request.path.startswith("/api/2/instruments"):
+            if request.cookies.get("NOW") not in self.sessions:
+                return web.json_response({"code": "NEXT_INVALID_SESSION"}, status=401)
+
+        return await handler(request)
+
+    async def _logind(self, request: web.Request) -> web.Response:
+        response = web.Response(text="<html>login</html>", content_type="text/html")
+        response.set_cookie("LOL", secrets.token_hex(8))
+        return response
+
+    async def _login(self, request: web.Request) -> web.Response:
+        form = await request.post()
+        if not form.get("username") or not form.get("password"):
+            return web.json_response({"code": "NEXT_LOGIN_INVALID_LOGIN_PARAMETER"}, status=401)
+
+        self.logins += 1
+        session_key = secrets.token_hex(16)
+        self.sessions.add(session_key)
+
+        body = {"logged_in": True, "session_key": session_key, "expires_in": 3600}
+        if self.feed is not None:
+            body["public_feed"] = {"hostname": self.feed[0], "port": self.feed[1], "encrypted": False}
+
+        response = web.json_response(body)
+        response.set_cookie("NOW", session_key)
+        return response
+
+    async def _info(self, request: web.Request) -> web.Response:
+        account_id = int(request.match_info["account_id"])
+        if account_id not in self.positions:
+            return web.json_response({"code": "NEXT_INVALID_ACCOUNT"}, status=404)
+
+        return web.json_response([{"accid": account_id, "account_currency": "DKK", "account_sum": {"currency": "DKK", "value": 0}}])
+
+    async def _positions(self, request: web.Request) -> web.Response:
+        account_id = int(request.match_info["account_id"])
+        positions = self.positions.get(account_id)
+        if positions is None:
+            return web.json_response({"code": "NEXT_INVALID_ACCOUNT"}, status=404)
+
+        self._move_prices(positions)
+
+        body = json.dumps(positions).encode()
+        etag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+
+        return web.Response(body=body, content_type="application/json", headers={"ETag": etag})
+
+    async def _empty_list(self, request: web.Request) -> web.Response:
+        return web.json_response([])
+
+    async def _prices(self, request: web.Request) -> web.Response:
+        instrument_ids = {int(instrument_id) for instrument_id in request.match_info["instrument_ids"].split(",")}
+
+        return web.json_response([
+            {"instrument_id": position["instrument"]["instrument_id"], "last": {"price": position["main_market_price"]["value"]}}
+            for positions in self.positions.values()
+            for position in positions
+            if position["instrument"]["instrument_id"] in instrument_ids
+        ])
+
+    async def _historical_prices(self, request: web.Request) -> web.Response:
+        prices = make_price_history(int(request.match_info["instrument_id"]), date.fromisoformat(request.query["from"]), date.fromisoformat(request.query["to"]))
+        return web.json_response([{"prices": prices}])
+
+    def _move_prices(self, positions: list) -> None:
+        for position in positions:
+            if self._rng.random() >= self.change_rate:
+                continue
+
+            price = round(position["main_market_price"]["value"] * (1 + self._rng.gauss(0, 0.002)), 2)
+            rate = EXCHANGE_RATES[position["main_market_price"]["currency"]]
+
+            position["main_market_price"]["value"] = price
+            position["market_value"]["value"] = round(price * position["qty"], 2)
+            position["market_value_acc"]["value"] = round(price * position["qty"] * rate, 2)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--positions", type=int, default=100)
+    parser.add_argument("--accounts", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--change-rate", type=float, default=1.0)
+    parser.add_argument("--feed", help="price feed returned by the login, e.g. localhost:9000 (see fake_feed.py)")
+    args = parser.parse_args()
+
+    feed = None
+    if args.feed:
+        host, port = args.feed.rsplit(":", 1)
+        feed = (host, int(port))
+
+    fake = FakeNordnet(args.positions, args.accounts, args.latency, args.error_rate, args.change_rate, feed)
+    runner, url = await fake.start(args.host, args.port)
+
+    print(f"Fake Nordnet API with {args.positions} positions in accounts {sorted(fake.positions)} listening on {url}")
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,238 @@
+"""
+Incremental sync of transactions and orders by ActivitySync
+"""
+
+import asyncio
+from datetime import date, timedelta
+
+import aiohttp
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt
+
+from custom_components.nordnet.activity import ActivitySync
+from custom_components.nordnet.const import EVENT_ORDER, EVENT_TRANSACTION
+
+
+class FakeCoordinator:
+    """
+    Serves transactions and orders per account, like the Nordnet API calls of the coordinator
+    """
+
+    def __init__(self, accounts: tuple = (1,)):
+        self.transactions: dict = {account_id: [] for account_id in accounts}
+        self.orders: dict = {account_id: [] for account_id in accounts}
+        self.requested_from: dict = {}
+        self.failing: set = set()
+
+    def account_ids(self) -> list:
+        return list(self.transactions)
+
+    async def async_get_transactions(self, account_id: int, start: date, end: date) -> list:
+        if account_id in self.failing:
+            raise aiohttp.ClientResponseError(None, (), status=503)
+
+        self.requested_from[account_id] = start
+        # malformed transactions without a date are passed on, to be handled by the sync
+        return [transaction for transaction in self.transactions[account_id] if start.isoformat() <= transaction.get("accounting_date", start.isoformat())]
+
+    async def async_get_orders(self, account_id: int) -> list:
+        return self.orders[account_id]
+
+    def async_update_activity_listeners(self) -> None:
+        pass
+
+
+def transaction(transaction_id: int, day: date) -> dict:
+    return {
+        "transaction_id": transaction_id,
+        "accounting_date": day.isoformat(),
+        "transaction_type_code": "KÖPT",
+        "instrument": {"symbol": "SYM1", "instrument_id": 16000001},
+        "quantity": 1,
+        "price": {"currency": "DKK", "value": 100.0},
+        "amount": {"currency": "DKK", "value": -100.0},
+    }
+
+
+def order(order_id: int, state: str, traded_volume: int = 0) -> dict:
+    return {"order_id": order_id, "order_state": state, "side": "BUY", "volume": 10, "traded_volume": traded_volume}
+
+
+def run(config_dir, test) -> None:
+    """
+    Run a test coroutine with a Home Assistant instance, and the events it fires
+    """
+
+    async def main() -> None:
+        hass = HomeAssistant(str(config_dir))
+        events = []
+
+        hass.bus.async_listen(EVENT_TRANSACTION, lambda event: events.append(event.data))
+        hass.bus.async_listen(EVENT_ORDER, lambda event: events.append(event.data))
+
+        try:
+            await test(hass, events)
+        finally:
+            await hass.async_stop(force=True)
+
+    asyncio.run(main())
+
+
+def test_first_sync_does_not_emit_the_history(tmp_path):
+    async def test(hass: HomeAssistant, events: list) -> None:
+        today = dt.now().date()
+        coordinator = FakeCoordinator()
+        coordinator.transactions[1] = [transaction(1, today)]
+
+        sync = ActivitySync(hass, coordinator, "entry")
+        await sync._async_sync()
+        await hass.async_block_till_done()
+
+        assert events == []
+        assert sync._cursors[1] == {"date": today.isoformat(), "ids": [1]}
+
+    run(tmp_path, test)
+
+
+def test_new_transactions_are_emitted_once(tmp_path):
+    async def test(hass: HomeAssistant, events: list) -> None:
+        today = dt.now().date()
+        coordinator = FakeCoordinator()
+        coordinator.transactions[1] = [transaction(1, today)]
+
+        sync = ActivitySync(hass, coordinator, "entry")
+        await sync._async_sync()
+
+        coordinator.transactions[1].append(transaction(2, today))
+        await sync._async_sync()
+        await sync._async_sync()
+        await hass.async_block_till_done()
+
+        assert [event["transaction_id"] for event in events] == [2]
+        assert events[0]["account_id"] == 1
+        assert events[0]["amount"] == -100.0
+        assert sync._cursors[1] == {"date": today.isoformat(), "ids": [1, 2]}
+
+    run(tmp_path, test)
+
+
+def test_cursor_moves_to_the_latest_accounting_date(tmp_path):
+    async def test(hass: HomeAssistant, events: list) -> None:
+        today = dt.now().date()
+        later = today + timedelta(days=3)
+        coordinator = FakeCoordinator()
+
+        sync = ActivitySync(hass, coordinator, "entry")
+        await sync._async_sync()
+
+        coordinator.transactions[1] = [transaction(3, later), transaction(2, today)]
+        await sync._async_sync()
+        await hass.async_block_till_done()
+
+        # emitted in accounting order, and only the ids of the latest date are kept
+        assert [event["transaction_id"] for event in events] == [2, 3]
+        assert sync._cursors[1] == {"date": later.isoformat(), "ids": [3]}
+
+        await sync._async_sync()
+        assert coordinator.requested_from[1] == later
+
+    run(tmp_path, test)
+
+
+def test_cursor_is_persisted(tmp_path):
+    async def test(hass: HomeAssistant, events: list) -> None:
+        today = dt.now().date()
+        coordinator = FakeCoordinator()
+        coordinator.transactions[1] = [transaction(1, today)]
+
+        await ActivitySync(hass, coordinator, "entry")._async_sync()
+
+        # made while HA was down, and emitted by the first sync after a restart
+        coordinator.transactions[1].append(transaction(2, today))
+
+        await ActivitySync(hass, coordinator, "entry")._async_sync()
+        await hass.async_block_till_done()
+
+        assert [event["transaction_id"] for event in events] == [2]
+
+    run(tmp_path, test)
+
+
+def test_order_changes(tmp_path):
+    async def test(hass: HomeAssistant, events: list) -> None:
+        coordinator = FakeCoordinator()
+        coordinator.orders[1] = [order(1, "LOCAL"), order(2, "FILLED")]
+
+        sync = ActivitySync(hass, coordinator, "entry")
+        await sync._async_sync()
+
+        # the first sync is the baseline, and closed orders aren't kept
+        assert [order["order_id"] for order in sync.open_orders(1)] == [1]
+
+        coordinator.orders[1] = [order(1, "LOCAL", traded_volume=5), order(3, "LOCAL"), order(4, "DELETED")]
+        await sync._async_sync()
+
+        coordinator.orders[1] = [order(3, "LOCAL")]
+        await sync._async_sync()
+        await hass.async_block_till_done()
+
+        assert [(event["order_id"], event["change"]) for event in events] == [(1, "updated"), (3, "new"), (1, "removed")]
+        assert [order["order_id"] for order in sync.open_orders(1)] == [3]
+
+    run(tmp_path, test)
+
+
+def test_failing_account_does_not_hold_back_the_others(tmp_path):
+    async def test(hass: HomeAssistant, events: list) -> None:
+        today = dt.now().date()
+        coordinator = FakeCoordinator(accounts=(1, 2))
+
+        sync = ActivitySync(hass, coordinator, "entry")
+        await sync._async_sync()
+
+        coordinator.failing.add(1)
+        coordinator.transactions[1].append(transaction(1, today))
+        coordinator.transactions[2].append(transaction(2, today))
+        await sync._async_sync()
+        await hass.async_block_till_done()
+
+        assert [event["transaction_id"] for event in events] == [2]
+        assert sync._cursors[1] == {"date": today.isoformat(), "ids": []}
+
+        # the failed account catches up on the next sync
+        coordinator.failing.clear()
+        await sync._async_sync()
+        await hass.async_block_till_done()
+
+        assert [event["transaction_id"] for event in events] == [2, 1]
+
+    run(tmp_path, test)
+
+
+def test_malformed_transaction_keeps_the_cursor(tmp_path):
+    async def test(hass: HomeAssistant, events: list) -> None:
+        today = dt.now().date()
+        coordinator = FakeCoordinator(accounts=(1, 2))
+
+        sync = ActivitySync(hass, coordinator, "entry")
+        await sync._async_sync()
+
+        malformed = transaction(2, today)
+        del malformed["accounting_date"]
+
+        coordinator.transactions[1] = [transaction(1, today), malformed]
+        coordinator.transactions[2] = [transaction(3, today)]
+        await sync._async_sync()
+        await hass.async_block_till_done()
+
+        # nothing of the broken account is emitted, so nothing is emitted twice once it's fixed
+        assert [event["transaction_id"] for event in events] == [3]
+        assert sync._cursors[1] == {"date": today.isoformat(), "ids": []}
+
+        malformed["accounting_date"] = today.isoformat()
+        await sync._async_sync()
+        await hass.async_block_till_done()
+
+        assert [event["transaction_id"] for event in events] == [3, 1, 2]
+
+    run(tmp_path, test)
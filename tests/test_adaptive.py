@@ -0,0 +1,86 @@
+"""
+Positions update interval of AdaptiveInterval
+"""
+
+from datetime import timedelta
+
+from custom_components.nordnet.adaptive import AdaptiveInterval
+from custom_components.nordnet.const import ADAPTIVE_WINDOW
+
+MINIMUM = timedelta(seconds=30)
+MAXIMUM = timedelta(minutes=5)
+
+
+def test_starts_at_the_fastest_interval():
+    adaptive = AdaptiveInterval(MINIMUM, MAXIMUM)
+
+    assert adaptive.interval == MINIMUM
+    assert adaptive.change_rate is None
+    assert adaptive.enabled
+
+
+def test_backs_off_only_after_a_quiet_window():
+    adaptive = AdaptiveInterval(MINIMUM, MAXIMUM)
+
+    for _ in range(ADAPTIVE_WINDOW - 1):
+        assert adaptive.record(0, 100) == MINIMUM
+
+    assert adaptive.record(0, 100) == timedelta(seconds=45)
+
+
+def test_backs_off_up_to_the_maximum():
+    adaptive = AdaptiveInterval(MINIMUM, MAXIMUM)
+    intervals = [adaptive.record(1, 100) for _ in range(20)]
+
+    assert intervals == sorted(intervals)
+    assert intervals[-1] == MAXIMUM
+
+
+def test_tightens_on_a_single_busy_refresh():
+    adaptive = AdaptiveInterval(MINIMUM, MAXIMUM)
+
+    for _ in range(20):
+        adaptive.record(0, 100)
+
+    assert adaptive.record(100, 100) == MAXIMUM / 2
+
+    # the busy refresh keeps the average of the window at the active rate
+    assert adaptive.record(0, 100) == MAXIMUM / 4
+
+    # and keeps halving it until the busy refresh leaves the window
+    for _ in range(ADAPTIVE_WINDOW - 2):
+        adaptive.record(0, 100)
+
+    assert adaptive.interval == MINIMUM
+    assert adaptive.record(0, 100) > MINIMUM
+
+
+def test_change_rate_is_capped():
+    adaptive = AdaptiveInterval(MINIMUM, MAXIMUM)
+
+    # removed positions count as changed, so more can change than are left
+    adaptive.record(20, 10)
+    adaptive.record(0, 0)
+
+    assert adaptive.change_rate == 0.5
+
+
+def test_disabled_when_the_bounds_are_equal():
+    adaptive = AdaptiveInterval(MINIMUM, MINIMUM)
+
+    for _ in range(20):
+        assert adaptive.record(0, 100) == MINIMUM
+
+    assert not adaptive.enabled
+
+
+def test_reset():
+    adaptive = AdaptiveInterval(MINIMUM, MAXIMUM)
+
+    for _ in range(20):
+        adaptive.record(0, 100)
+
+    adaptive.reset()
+
+    assert adaptive.interval == MINIMUM
+    assert adaptive.change_rate is None
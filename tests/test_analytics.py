@@ -0,0 +1,120 @@
+"""
+Allocation, concentration, volatility and beta of PortfolioAnalytics
+"""
+
+import math
+import statistics
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from custom_components.nordnet.analytics import PortfolioAnalytics
+from custom_components.nordnet.const import HISTORY_TRADING_DAYS_PER_YEAR
+from custom_components.nordnet.position import Position
+from custom_components.nordnet.snapshot import HoldingsSnapshot
+from tests.fake_nordnet import make_positions
+
+FETCHED_AT = datetime(2024, 5, 13, 10, 0, tzinfo=timezone.utc)
+
+FIRST_DAY = date(2024, 3, 1)
+
+
+def positions(count: int, accounts: int = 1) -> list:
+    return [Position(raw, "dkk") for account in make_positions(count, accounts).values() for raw in account]
+
+
+def closes(*values, skip: tuple = ()) -> tuple:
+    """
+    Arrays of days and closes like PriceHistory keeps them, one close per day from FIRST_DAY, without the skipped days
+    """
+
+    days = [(FIRST_DAY + timedelta(days=i)).toordinal() for i in range(len(values)) if i not in skip]
+    return np.array(days, np.int64), np.array([value for i, value in enumerate(values) if i not in skip], np.float64)
+
+
+def test_allocation_and_concentration():
+    held = positions(8, accounts=2)
+    analytics = PortfolioAnalytics()
+    analytics.update(HoldingsSnapshot(held, FETCHED_AT))
+
+    for account_id in (1, 2):
+        values = [position.account_market_value for position in held if position.account_id == account_id]
+        weights = [value / sum(values) for value in values]
+        results = analytics.results[account_id]
+
+        assert results["hhi"] == pytest.approx(sum(weight * weight for weight in weights))
+        assert sum(results["allocation_by_currency"].values()) == pytest.approx(100)
+        assert sum(results["allocation_by_instrument_type"].values()) == pytest.approx(100)
+
+    # no price history yet
+    assert analytics.results[1]["volatility"] is None
+    assert analytics.results[1]["beta"] is None
+
+
+def test_volatility_of_daily_returns():
+    held = positions(1)
+    prices = [100 * (1 + 0.01 * math.sin(i)) for i in range(30)]
+
+    analytics = PortfolioAnalytics()
+    analytics.update_history({held[0].instrument_id: closes(*prices)}, held[0].instrument_id)
+    analytics.update(HoldingsSnapshot(held, FETCHED_AT))
+
+    returns = [current / previous - 1 for previous, current in zip(prices, prices[1:])]
+
+    assert analytics.results[1]["volatility"] == pytest.approx(statistics.stdev(returns) * math.sqrt(HISTORY_TRADING_DAYS_PER_YEAR) * 100)
+
+    # an account holding only the benchmark moves with it
+    assert analytics.results[1]["beta"] == pytest.approx(1)
+
+
+def test_beta_against_benchmark():
+    held = positions(2)
+    benchmark = [100 * (1 + 0.01 * math.sin(i)) for i in range(30)]
+
+    # the first position moves twice as much as the benchmark, the second doesn't move
+    leveraged = [100 * (1 + 0.02 * math.sin(i)) for i in range(30)]
+
+    analytics = PortfolioAnalytics()
+    analytics.update_history({
+        held[0].instrument_id: closes(*leveraged),
+        held[1].instrument_id: closes(*[50] * 30),
+        1: closes(*benchmark),
+    }, 1)
+    analytics.update(HoldingsSnapshot(held, FETCHED_AT))
+
+    weight = held[0].account_market_value / (held[0].account_market_value + held[1].account_market_value)
+
+    assert analytics.results[1]["beta"] == pytest.approx(2 * weight, rel=0.05)
+
+
+def test_days_without_close_keep_the_previous_close():
+    held = positions(2)
+    prices = [100 + i for i in range(30)]
+
+    # the second instrument didn't trade on day 10, so it has no return that day and the whole move the next
+    analytics = PortfolioAnalytics()
+    analytics.update_history({
+        held[0].instrument_id: closes(*prices),
+        held[1].instrument_id: closes(*prices, skip=(10,)),
+    })
+
+    returns = analytics._returns
+    second = analytics._columns[held[1].instrument_id]
+
+    assert returns[9, second] == 0
+    assert returns[10, second] == pytest.approx(111 / 109 - 1)
+
+
+def test_history_follows_added_positions():
+    held = positions(3)
+
+    analytics = PortfolioAnalytics()
+    analytics.update_history({held[0].instrument_id: closes(*[100 + i for i in range(30)])})
+    analytics.update(HoldingsSnapshot(held[:1], FETCHED_AT))
+    alone = analytics.results[1]["volatility"]
+
+    # positions without history count as if their price didn't move, diluting the volatility
+    analytics.update(HoldingsSnapshot(held, FETCHED_AT))
+
+    assert 0 < analytics.results[1]["volatility"] < alone
@@ -0,0 +1,75 @@
+"""
+Rolling intraday statistics of IntradayStats
+"""
+
+import math
+import statistics
+from datetime import date
+
+from custom_components.nordnet.intraday import IntradayStats
+
+DAY = date(2024, 5, 13)
+
+
+def test_day_statistics():
+    stats = IntradayStats(size=3)
+
+    for price in (100.0, 104.0, 98.0, 101.0, 102.0):
+        stats.add(price, DAY)
+
+    assert stats.high == 104.0
+    assert stats.low == 98.0
+    assert stats.last == 102.0
+    assert math.isclose(stats.average, statistics.fmean((100.0, 104.0, 98.0, 101.0, 102.0)))
+
+
+def test_window_evicts_the_oldest_samples():
+    stats = IntradayStats(size=3)
+    prices = (100.0, 104.0, 98.0, 101.0, 102.0)
+
+    for price in prices:
+        stats.add(price, DAY)
+
+    returns = [(new - old) / old for old, new in zip(prices, prices[1:])]
+
+    assert len(stats) == 3
+    assert math.isclose(stats.window_average, statistics.fmean(prices[-3:]))
+    assert math.isclose(stats.volatility, statistics.pstdev(returns[-3:]) * 100)
+
+
+def test_volatility_needs_two_samples():
+    stats = IntradayStats(size=3)
+    assert stats.volatility is None
+    assert stats.average is None
+    assert stats.window_average is None
+
+    stats.add(100.0, DAY)
+    assert stats.volatility is None
+
+    stats.add(100.0, DAY)
+    assert stats.volatility == 0.0
+
+
+def test_new_day_starts_over():
+    stats = IntradayStats(size=3)
+    stats.add(100.0, DAY)
+    stats.add(110.0, DAY)
+
+    stats.add(90.0, date(2024, 5, 14))
+
+    assert len(stats) == 1
+    assert stats.high == stats.low == stats.average == 90.0
+    assert stats.volatility is None
+
+
+def test_attributes():
+    stats = IntradayStats(size=3)
+    stats.add(100.0, DAY)
+    stats.add(105.0, DAY)
+
+    attributes = stats.attributes(morning_price=100.0)
+
+    assert attributes["intraday_high"] == 105.0
+    assert attributes["intraday_low"] == 100.0
+    assert math.isclose(attributes["intraday_change_percent"], 5.0)
+    assert stats.attributes(morning_price=0)["intraday_change_percent"] is None
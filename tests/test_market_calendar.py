@@ -0,0 +1,130 @@
+"""
+Trading sessions, holidays and half days of TradingCalendar
+"""
+
+from datetime import date, datetime, time
+
+import pytest
+from homeassistant.util import dt
+
+from custom_components.nordnet.market_calendar import MARKETS, TradingCalendar
+
+COPENHAGEN = dt.get_time_zone("Europe/Copenhagen")
+NEW_YORK = dt.get_time_zone("America/New_York")
+
+
+@pytest.fixture
+def calendar() -> TradingCalendar:
+    return TradingCalendar(time(9, 0), time(17, 0))
+
+
+def session(calendar: TradingCalendar, mic: str, day: date) -> tuple:
+    return calendar._session(MARKETS[mic], day)
+
+
+def test_is_open_within_the_session(calendar):
+    assert calendar.is_open(["XCSE"], datetime(2024, 5, 13, 10, 0, tzinfo=COPENHAGEN))
+    assert not calendar.is_open(["XCSE"], datetime(2024, 5, 13, 8, 59, tzinfo=COPENHAGEN))
+    assert not calendar.is_open(["XCSE"], datetime(2024, 5, 13, 17, 0, tzinfo=COPENHAGEN))
+    assert not calendar.is_open(["XCSE"], datetime(2024, 5, 11, 12, 0, tzinfo=COPENHAGEN))
+
+
+def test_is_open_if_any_market_is(calendar):
+    # 17:00 in Copenhagen is 11:00 in New York
+    now = datetime(2024, 5, 13, 17, 30, tzinfo=COPENHAGEN)
+
+    assert not calendar.is_open(["XCSE"], now)
+    assert calendar.is_open(["XCSE", "XNAS"], now)
+
+
+@pytest.mark.parametrize("day", [
+    date(2024, 3, 28),  # Maundy Thursday
+    date(2024, 3, 29),  # Good Friday
+    date(2024, 4, 1),  # Easter Monday
+    date(2024, 5, 10),  # the day after Ascension Day
+    date(2024, 6, 5),  # Constitution Day
+    date(2024, 12, 24),
+    date(2024, 12, 31),
+])
+def test_copenhagen_closures(calendar, day):
+    assert session(calendar, "XCSE", day) is None
+
+
+@pytest.mark.parametrize("day", [
+    date(2024, 5, 9),  # Ascension Day
+    date(2024, 5, 20),  # Whit Monday
+    date(2024, 10, 3),  # Day of German Unity
+])
+def test_xetra_trades_on_national_holidays(calendar, day):
+    assert session(calendar, "XETR", day) is not None
+
+
+@pytest.mark.parametrize("day", [date(2024, 3, 29), date(2024, 4, 1), date(2024, 12, 24), date(2024, 12, 31)])
+def test_xetra_closures(calendar, day):
+    assert session(calendar, "XETR", day) is None
+
+
+def test_helsinki_closures(calendar):
+    # trades on Epiphany and Ascension Day, closes on Midsummer Eve and Independence Day
+    assert session(calendar, "XHEL", date(2025, 1, 6)) is not None
+    assert session(calendar, "XHEL", date(2024, 5, 9)) is not None
+    assert session(calendar, "XHEL", date(2024, 6, 21)) is None
+    assert session(calendar, "XHEL", date(2024, 12, 6)) is None
+
+
+def test_half_days(calendar):
+    # Nasdaq Stockholm closes early on Maundy Thursday
+    assert session(calendar, "XSTO", date(2024, 3, 28))[1].time() == time(13, 0)
+
+    # the US extended session closes early the day after Thanksgiving
+    assert session(calendar, "XNYS", date(2024, 11, 28)) is None
+    assert session(calendar, "XNYS", date(2024, 11, 29))[1].time() == time(17, 0)
+
+
+def test_july_3rd_is_closed_when_independence_day_is_observed_on_it(calendar):
+    assert session(calendar, "XNYS", date(2024, 7, 3))[1].time() == time(17, 0)
+    assert session(calendar, "XNYS", date(2026, 7, 3)) is None
+
+
+def test_next_open_skips_closures(calendar):
+    # Easter closes Copenhagen from Maundy Thursday to Easter Monday
+    now = datetime(2024, 3, 27, 18, 0, tzinfo=COPENHAGEN)
+
+    assert calendar.next_open(["XCSE"], now) == datetime(2024, 4, 2, 9, 0, tzinfo=COPENHAGEN)
+
+
+def test_next_open_is_now_while_open(calendar):
+    now = datetime(2024, 5, 13, 10, 0, tzinfo=COPENHAGEN)
+
+    assert calendar.next_open(["XCSE"], now) == now
+
+
+def test_next_open_takes_the_earliest_market(calendar):
+    # Copenhagen opens at 03:00 New York time, before the US pre-market at 04:00
+    now = datetime(2024, 5, 13, 20, 30, tzinfo=NEW_YORK)
+
+    assert calendar.next_open(["XCSE", "XNAS"], now) == datetime(2024, 5, 14, 9, 0, tzinfo=COPENHAGEN)
+
+    # on a Danish holiday, New York opens first
+    now = datetime(2024, 5, 9, 20, 30, tzinfo=NEW_YORK)
+
+    assert calendar.next_open(["XCSE", "XNAS"], now) == datetime(2024, 5, 10, 4, 0, tzinfo=NEW_YORK)
+
+
+def test_closed_between(calendar):
+    start = datetime(2024, 5, 13, 16, 55, tzinfo=COPENHAGEN)
+    end = datetime(2024, 5, 13, 17, 5, tzinfo=COPENHAGEN)
+
+    assert calendar.closed_between(["XCSE"], start, end)
+    assert not calendar.closed_between(["XCSE"], end, datetime(2024, 5, 13, 18, 0, tzinfo=COPENHAGEN))
+
+
+def test_unknown_markets_use_the_configured_window(calendar):
+    tz = dt.DEFAULT_TIME_ZONE
+
+    assert calendar.is_open(["UNKNOWN"], datetime(2024, 5, 13, 12, 0, tzinfo=tz))
+    assert not calendar.is_open(["UNKNOWN"], datetime(2024, 5, 13, 17, 30, tzinfo=tz))
+    assert not calendar.is_open(["UNKNOWN"], datetime(2024, 5, 11, 12, 0, tzinfo=tz))
+
+    # no positions at all use the configured window too
+    assert calendar.is_open([], datetime(2024, 5, 13, 12, 0, tzinfo=tz))
@@ -0,0 +1,137 @@
+"""
+Incremental account totals of PortfolioTotals, compared to summing every position
+"""
+
+import math
+import random
+
+from custom_components.nordnet import portfolio
+from custom_components.nordnet.portfolio import PortfolioTotals
+from custom_components.nordnet.position import Position
+from tests.fake_nordnet import make_positions
+
+
+def positions(count: int) -> list:
+    return [Position(raw, "dkk") for raw in make_positions(count)[1]]
+
+
+def totals_of(held: dict) -> tuple:
+    """
+    Market value, cost and currency exposure summed from scratch
+    """
+
+    exposure = {}
+    for position in held.values():
+        exposure.setdefault(position.position_currency, []).append(position.account_market_value)
+
+    return (
+        math.fsum(position.account_market_value for position in held.values()),
+        math.fsum(position.quantity * position.account_acquisition_price for position in held.values()),
+        {currency: math.fsum(values) for currency, values in exposure.items()},
+    )
+
+
+def assert_totals(totals: PortfolioTotals, held: dict) -> None:
+    market_value, cost, exposure = totals_of(held)
+
+    assert math.isclose(totals.market_value, market_value, rel_tol=1e-12, abs_tol=1e-6)
+    assert math.isclose(totals.cost, cost, rel_tol=1e-12, abs_tol=1e-6)
+    assert totals.currency_exposure.keys() == exposure.keys()
+
+    for currency, value in exposure.items():
+        assert math.isclose(totals.currency_exposure[currency], value, rel_tol=1e-12, abs_tol=1e-6)
+
+
+def test_added_positions():
+    totals = PortfolioTotals(1, "dkk")
+    held = {position.instrument_id: position for position in positions(20)}
+
+    for position in held.values():
+        totals.apply(None, position)
+
+    assert len(totals) == 20
+    assert_totals(totals, held)
+    assert math.isclose(totals.roi, totals.market_value - totals.cost)
+    assert math.isclose(totals.roi_percent, totals.roi / totals.cost * 100)
+
+
+def test_incremental_updates_match_summing_every_position():
+    rng = random.Random(1)
+    totals = PortfolioTotals(1, "dkk")
+    held = {position.instrument_id: position for position in positions(50)}
+
+    for position in held.values():
+        totals.apply(None, position)
+
+    # enough price updates to pass PORTFOLIO_RECOMPUTE_UPDATES a few times
+    for _ in range(2500):
+        old = held[rng.choice(list(held))]
+        new = held[old.instrument_id] = old.with_market_price(old.position_market_price * rng.uniform(0.9, 1.1))
+        totals.apply(old, new)
+
+    assert_totals(totals, held)
+
+
+def test_removed_positions_drop_their_currency():
+    totals = PortfolioTotals(1, "dkk")
+    held = {position.instrument_id: position for position in positions(7)}
+
+    for position in held.values():
+        totals.apply(None, position)
+
+    # make_positions puts the n-th position on the n-th market, so the first is the only DKK one
+    first = next(iter(held.values()))
+    assert first.position_currency == "dkk"
+
+    totals.apply(held.pop(first.instrument_id), None)
+
+    assert "dkk" not in totals.currency_exposure
+    assert_totals(totals, held)
+
+
+def test_removing_every_position_recomputes_to_zero():
+    totals = PortfolioTotals(1, "dkk")
+    held = positions(10)
+
+    for position in held:
+        totals.apply(None, position)
+
+    for position in held:
+        totals.apply(position, None)
+
+    assert len(totals) == 0
+    assert totals.market_value == 0.0
+    assert totals.cost == 0.0
+    assert totals.currency_exposure == {}
+    assert totals.roi_percent is None
+    assert totals.weights() == {}
+
+
+def test_recompute_is_exact(monkeypatch):
+    monkeypatch.setattr(portfolio, "PORTFOLIO_RECOMPUTE_UPDATES", 1)
+
+    totals = PortfolioTotals(1, "dkk")
+    held = {position.instrument_id: position for position in positions(10)}
+
+    for position in held.values():
+        totals.apply(None, position)
+
+    market_value, cost, exposure = totals_of(held)
+
+    assert totals.market_value == market_value
+    assert totals.cost == cost
+    assert totals.currency_exposure == exposure
+
+
+def test_weights_by_instrument_id():
+    totals = PortfolioTotals(1, "dkk")
+    held = positions(10)
+
+    for position in held:
+        totals.apply(None, position)
+
+    weights = totals.weights()
+
+    assert weights.keys() == {position.instrument_id for position in held}
+    assert math.isclose(sum(weights.values()), 100)
+    assert math.isclose(weights[held[0].instrument_id], held[0].account_market_value / totals.market_value * 100)
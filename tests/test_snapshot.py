@@ -0,0 +1,57 @@
+"""
+Lookups and change detection of HoldingsSnapshot
+"""
+
+from datetime import datetime, timezone
+
+import pytest
+
+from custom_components.nordnet.position import Position
+from custom_components.nordnet.snapshot import HoldingsSnapshot
+from tests.fake_nordnet import make_positions
+
+FETCHED_AT = datetime(2024, 5, 13, 10, 0, tzinfo=timezone.utc)
+
+
+def positions(count: int, accounts: int = 1) -> list:
+    return [Position(raw, "dkk") for account in make_positions(count, accounts).values() for raw in account]
+
+
+def test_lookups():
+    held = positions(10, accounts=2)
+    snapshot = HoldingsSnapshot(held, FETCHED_AT)
+
+    assert len(snapshot) == 10
+    assert snapshot.by_key[held[3].key] is held[3]
+    assert snapshot.by_symbol[held[3].symbol] is held[3]
+    assert snapshot.mics == {position.mic for position in held}
+
+
+def test_immutable():
+    snapshot = HoldingsSnapshot(positions(1), FETCHED_AT)
+
+    with pytest.raises(AttributeError):
+        snapshot.stale = True
+
+    with pytest.raises(TypeError):
+        snapshot.by_key[(1, 1)] = None
+
+
+def test_unchanged_positions():
+    held = positions(10)
+    previous = HoldingsSnapshot(held, FETCHED_AT)
+
+    # the same Position objects, and equal copies from a new fetch
+    assert HoldingsSnapshot(held, FETCHED_AT).changed_keys(previous) == frozenset()
+    assert HoldingsSnapshot(positions(10), FETCHED_AT).changed_keys(previous) == frozenset()
+
+
+def test_changed_added_and_removed_positions():
+    held = positions(10)
+    previous = HoldingsSnapshot(held[:9], FETCHED_AT)
+
+    moved = held[2].with_market_price(held[2].position_market_price * 1.01)
+    current = HoldingsSnapshot([held[0], held[1], moved, *held[4:]], FETCHED_AT)
+
+    # 2 moved, 3 was sold and 9 was bought
+    assert current.changed_keys(previous) == {held[2].key, held[3].key, held[9].key}
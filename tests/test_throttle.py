@@ -0,0 +1,149 @@
+"""
+Rate limiting, backoff and circuit breaking of requests to Nordnet API
+"""
+
+import asyncio
+from time import monotonic
+
+import aiohttp
+import pytest
+
+from custom_components.nordnet import throttle
+from custom_components.nordnet.const import (RETRY_BACKOFF_BASE,
+                                             RETRY_BACKOFF_MAX)
+from custom_components.nordnet.throttle import (BREAKER_CLOSED,
+                                                BREAKER_HALF_OPEN,
+                                                BREAKER_OPEN, CircuitBreaker,
+                                                TokenBucket, backoff_delay,
+                                                is_transient)
+
+
+class Clock:
+    """
+    Replaces the monotonic clock of the throttle module
+    """
+
+    def __init__(self):
+        self.now: float = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(throttle, "monotonic", clock)
+    return clock
+
+
+def response_error(status: int, headers: dict = None) -> aiohttp.ClientResponseError:
+    return aiohttp.ClientResponseError(None, (), status=status, headers=headers)
+
+
+def test_token_bucket_allows_bursts_then_waits():
+    async def acquire(bucket: TokenBucket, count: int) -> float:
+        start = monotonic()
+        for _ in range(count):
+            await bucket.acquire()
+        return monotonic() - start
+
+    async def run() -> tuple:
+        bucket = TokenBucket(rate=20, capacity=3)
+        return await acquire(bucket, 3), await acquire(bucket, 2)
+
+    burst, throttled = asyncio.run(run())
+
+    assert burst < 0.04
+
+    # two more requests have to wait for their tokens, 1/20 s each
+    assert throttled >= 0.09
+
+
+def test_circuit_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+
+    assert breaker.state == BREAKER_CLOSED
+    assert breaker.allow_request()
+
+    breaker.record_failure()
+
+    assert breaker.state == BREAKER_OPEN
+    assert not breaker.allow_request()
+
+
+def test_circuit_breaker_lets_a_single_probe_through(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+
+    clock.now += 59
+    assert not breaker.allow_request()
+
+    clock.now += 1
+    assert breaker.state == BREAKER_HALF_OPEN
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+
+    breaker.record_success()
+
+    assert breaker.state == BREAKER_CLOSED
+    assert breaker.allow_request()
+
+
+def test_circuit_breaker_reopens_when_the_probe_fails(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+
+    clock.now += 60
+    assert breaker.allow_request()
+
+    breaker.record_failure()
+
+    assert breaker.state == BREAKER_OPEN
+    assert not breaker.allow_request()
+
+
+def test_circuit_breaker_released_probe(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+
+    clock.now += 60
+    assert breaker.allow_request()
+
+    # e.g. the probing refresh was cancelled
+    breaker.release_probe()
+
+    assert breaker.state == BREAKER_HALF_OPEN
+    assert breaker.allow_request()
+
+
+@pytest.mark.parametrize("ex, transient", [
+    (response_error(429), True),
+    (response_error(503), True),
+    (response_error(401), False),
+    (response_error(404), False),
+    (asyncio.TimeoutError(), True),
+    (aiohttp.ClientConnectionError(), True),
+    (ValueError(), False),
+])
+def test_is_transient(ex, transient):
+    assert is_transient(ex) == transient
+
+
+def test_backoff_delay_honors_retry_after():
+    assert backoff_delay(0, response_error(429, {"Retry-After": "7"})) == 7.0
+    assert backoff_delay(0, response_error(429, {"Retry-After": "3600"})) == RETRY_BACKOFF_MAX
+
+
+def test_backoff_delay_grows_exponentially_with_jitter():
+    for attempt in range(8):
+        delays = [backoff_delay(attempt, response_error(503)) for _ in range(100)]
+
+        assert all(0 <= delay <= min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * 2 ** attempt) for delay in delays)
+        assert len(set(delays)) > 1